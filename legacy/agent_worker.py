@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+OpenBotMan agent worker node
+
+Pulls call_agent jobs from the shared state backend and runs them with the
+locally installed CLIs. Start one or more per machine:
+
+Usage:
+    python agent_worker.py [--config config.yaml] [--agents claude_code,gemini]
+
+The API server dispatches to workers when config.yaml contains:
+
+    state:
+      backend: sqlite
+      options:
+        path: data/openbotman_state.db
+      remote_agents: true
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+from src.config import load_config
+from src.state import create_state_backend
+from src.workers import AgentWorker
+
+
+def main():
+    """Worker entry point"""
+
+    parser = argparse.ArgumentParser(description="OpenBotMan agent worker node")
+    parser.add_argument("--config", default="config.yaml", help="Path to config.yaml")
+    parser.add_argument("--agents", help="Comma-separated agent IDs to serve (default: all)")
+    parser.add_argument("--worker-id", help="Worker ID (default: hostname-pid)")
+    parser.add_argument("--poll-interval", type=float, default=0.2)
+    parser.add_argument(
+        "--exit-when-idle", type=float,
+        help="Exit after this many seconds without jobs"
+    )
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    backend = create_state_backend(config)
+    if not backend.shared:
+        print("❌ Error: agent workers need a shared state backend (state.backend: sqlite)")
+        sys.exit(1)
+
+    worker = AgentWorker(
+        config,
+        backend,
+        worker_id=args.worker_id,
+        agents=args.agents.split(",") if args.agents else None
+    )
+
+    print(f"✓ Worker {worker.worker_id} serving: {', '.join(worker.agents)}")
+
+    try:
+        worker.run_forever(
+            poll_interval=args.poll_interval,
+            exit_when_idle=args.exit_when_idle
+        )
+    except KeyboardInterrupt:
+        pass
+
+    print(f"👋 Worker {worker.worker_id} stopped after {worker.completed} job(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -13,16 +13,34 @@ Then make requests:
 
 import sys
 import os
+import asyncio
+import contextlib
+import functools
+import time
+import uuid
 from pathlib import Path
+from typing import Optional
 
 # Add src to path
 sys.path.insert(0, str(Path(__file__).parent / "src"))
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-import uvicorn
+from src.cancellation import CancellationToken, OperationCancelled, cancellation_stats
+from src.cascade import cascade_stats
+from src.config import load_config
+from src.estimator import shared_estimator
 from src.orchestrator import MultiAgentOrchestrator
+from src.profiling import ProfilerBusy, TurnProfiler, format_summary
+from src.scheduler import (
+    PRIORITY_CLASSES, AgentScheduler, RateLimiter, SchedulerBusy, retry_after_header
+)
+from src.state import StateBackend, create_state_backend
+from src.singleflight import single_flight
+from src.speculation import speculation_stats
+from src.tokens import token_estimator
+from src.workers import node_id
 
 app = FastAPI(
     title="OpenBotMan API",
@@ -39,18 +57,52 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Session storage
+# Session storage (a local cache when the state backend is shared)
 orchestrators = {}
 
+# session_id -> token of the chat turn currently running for it
+active_turns = {}
+
+# session_id -> lock held while a chat turn runs
+session_locks = {}
+
+# Shared across all sessions so CLI concurrency is capped process-wide
+scheduler = None
+rate_limiter = None
+state_backend = None
+session_lease_seconds = 60
+
+NODE_ID = node_id()
+
+
+def get_scheduler() -> AgentScheduler:
+    """Create the global scheduler, rate limiter and state backend on first use"""
+    global scheduler, rate_limiter, state_backend, session_lease_seconds
+    if scheduler is None:
+        config = load_config()
+        rate_limiter = RateLimiter.from_config(config)
+        state_backend = create_state_backend(config)
+        session_lease_seconds = (config.get('state', {}) or {}).get('session_lease_seconds', 60)
+        scheduler = AgentScheduler.from_config(config)
+    return scheduler
+
+
+def get_state_backend() -> StateBackend:
+    get_scheduler()
+    return state_backend
+
 
 class ChatRequest(BaseModel):
     session_id: str
     message: str
+    priority: str = "interactive"
+    profile: bool = False
 
 
 class ChatResponse(BaseModel):
     response: str
     history: list
+    profile: Optional[dict] = None
 
 
 class StatusResponse(BaseModel):
@@ -64,46 +116,195 @@ class StatusResponse(BaseModel):
 async def root():
     """API status"""
     try:
-        # Create temporary orchestrator to get config
-        orch = MultiAgentOrchestrator()
+        config = load_config()
         return StatusResponse(
             status="ok",
             version="0.1.0",
-            agents=list(orch.config['agents'].keys()),
-            workflows=list(orch.config.get('workflows', {}).keys())
+            agents=list(config['agents'].keys()),
+            workflows=list(config.get('workflows', {}).keys())
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, http_request: Request, http_response: Response):
     """Process chat message"""
 
+    if request.priority not in PRIORITY_CLASSES:
+        raise HTTPException(status_code=400, detail=f"Unknown priority: {request.priority}")
+
+    # One turn at a time per session: concurrent turns would interleave the
+    # conversation (tool_use blocks without their tool_result)
+    lock = session_locks.setdefault(request.session_id, asyncio.Lock())
+    if lock.locked():
+        raise HTTPException(status_code=409, detail="A turn is already running for this session")
+
+    # Admission control: refuse early instead of queueing unbounded work
+    try:
+        agent_scheduler = get_scheduler()
+        if rate_limiter is not None:
+            rate_limiter.check()
+        agent_scheduler.admit()
+    except SchedulerBusy as e:
+        raise HTTPException(status_code=429, detail=str(e), headers=retry_after_header(e))
+
+    backend = get_state_backend()
+
+    async with lock, session_lease(backend, request.session_id) as lease:
+        try:
+            # Get or create orchestrator for session
+            if request.session_id not in orchestrators:
+                orchestrators[request.session_id] = MultiAgentOrchestrator(
+                    scheduler=agent_scheduler,
+                    session_id=request.session_id,
+                    state_backend=backend
+                )
+
+            orch = orchestrators[request.session_id]
+
+            # Stateless workers: another node may have advanced this session
+            if backend.shared:
+                orch.import_state(backend.get("sessions", request.session_id) or {})
+
+            # Process message in a worker thread so other sessions keep running
+            cancel_token = CancellationToken()
+            active_turns[request.session_id] = cancel_token
+            turn = functools.partial(orch.chat, priority=request.priority)
+            profiler = None
+            if request.profile:
+                # TurnProfiler makes the client's session id safe as a file name
+                profiler = TurnProfiler(
+                    name=f"{request.session_id}-{time.strftime('%Y%m%d-%H%M%S')}",
+                    output_dir=(orch.config.get('profiling', {}) or {}).get('output_dir', "data/profiles")
+                )
+                turn = profiled(turn, profiler)
+            try:
+                response = await run_cancellable(turn, request.message, cancel_token, http_request)
+            finally:
+                if active_turns.get(request.session_id) is cancel_token:
+                    del active_turns[request.session_id]
+
+            if backend.shared:
+                # A stalled turn may have lost its lease: never overwrite the other node's turn
+                if not lease.renew():
+                    raise SessionConflict("Session was taken over by another node; this turn was not saved")
+                backend.put("sessions", request.session_id, orch.export_state())
+                backend.put("affinity", request.session_id, NODE_ID)
+
+            # Sticky routing hint: this node has the session warm in memory
+            http_response.headers["X-OpenBotMan-Node"] = NODE_ID
+
+            return ChatResponse(
+                response=response,
+                history=orch.get_history(),
+                profile=profiler.summary if profiler else None
+            )
+
+        except OperationCancelled as e:
+            raise HTTPException(status_code=409, detail=f"Cancelled: {e}")
+        except SessionConflict as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        except ProfilerBusy as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+
+class SessionConflict(RuntimeError):
+    """Another API node holds the session"""
+
+
+class SessionLease:
+    """Lease on a session in the shared state backend, held by one turn"""
+
+    def __init__(self, backend: StateBackend, session_id: str):
+        self.backend = backend
+        self.name = f"session:{session_id}"
+        self.holder = f"{NODE_ID}:{uuid.uuid4().hex}"
+
+    def acquire(self) -> bool:
+        """False if another turn has the session"""
+        return self.backend.acquire_lease(self.name, self.holder, session_lease_seconds)
+
+    def renew(self) -> bool:
+        """False if the lease ran out and another turn may have taken the session since"""
+        return self.backend.renew_lease(self.name, self.holder, session_lease_seconds)
+
+    def release(self):
+        self.backend.release_lease(self.name, self.holder)
+
+
+@contextlib.asynccontextmanager
+async def session_lease(backend: StateBackend, session_id: str):
+    """One turn per session across API nodes sharing the state backend (409 otherwise).
+
+    The in-process session lock covers this node; the lease covers the
+    others, and is renewed while the turn runs.
+    """
+    if not backend.shared:
+        yield None
+        return
+
+    lease = SessionLease(backend, session_id)
+    if not lease.acquire():
+        raise HTTPException(status_code=409, detail="A turn is already running for this session on another node")
+
+    async def keep_renewed():
+        while True:
+            await asyncio.sleep(session_lease_seconds / 3)
+            await asyncio.to_thread(lease.renew)
+
+    renewer = asyncio.ensure_future(keep_renewed())
     try:
-        # Get or create orchestrator for session
-        if request.session_id not in orchestrators:
-            orchestrators[request.session_id] = MultiAgentOrchestrator()
+        yield lease
+    finally:
+        renewer.cancel()
+        lease.release()
 
-        orch = orchestrators[request.session_id]
 
-        # Process message
-        response = orch.chat(request.message)
+async def run_cancellable(func, message: str, cancel_token: CancellationToken, http_request: Request):
+    """Run a chat turn in a thread; cancel it if the client disconnects"""
+    task = asyncio.ensure_future(asyncio.to_thread(func, message, cancel_token))
+    while True:
+        done, _ = await asyncio.wait({task}, timeout=0.5)
+        if done:
+            return task.result()
+        if await http_request.is_disconnected():
+            cancel_token.cancel("client disconnected")
 
-        return ChatResponse(
-            response=response,
-            history=orch.get_history()
-        )
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+def profiled(func, profiler: TurnProfiler):
+    """Wrap a chat turn so it is profiled in the thread that runs it"""
+    def run(message: str, cancel_token: CancellationToken):
+        try:
+            with profiler:
+                return func(message, cancel_token)
+        finally:
+            if profiler.summary:
+                print(format_summary(profiler.summary))
+    return run
+
+
+def cancel_turn(session_id: str, reason: str):
+    token = active_turns.pop(session_id, None)
+    if token is not None:
+        token.cancel(reason)
 
 
 @app.post("/reset/{session_id}")
 async def reset(session_id: str):
     """Reset session"""
+    cancel_turn(session_id, "session reset")
+    backend = get_state_backend()
+    found = session_id in orchestrators or (
+        backend.shared and backend.get("sessions", session_id) is not None
+    )
     if session_id in orchestrators:
         orchestrators[session_id].reset()
+    if found and backend.shared:
+        backend.delete("sessions", session_id)
+    if found:
         return {"status": "ok", "session_id": session_id}
     return {"status": "not_found", "session_id": session_id}
 
@@ -111,8 +312,19 @@ async def reset(session_id: str):
 @app.delete("/session/{session_id}")
 async def delete_session(session_id: str):
     """Delete session"""
-    if session_id in orchestrators:
-        del orchestrators[session_id]
+    cancel_turn(session_id, "session deleted")
+    backend = get_state_backend()
+    found = session_id in orchestrators or (
+        backend.shared and backend.get("sessions", session_id) is not None
+    )
+    orchestrators.pop(session_id, None)
+    lock = session_locks.get(session_id)
+    if lock is not None and not lock.locked():
+        del session_locks[session_id]
+    if backend.shared:
+        backend.delete("sessions", session_id)
+        backend.delete("affinity", session_id)
+    if found:
         return {"status": "deleted", "session_id": session_id}
     return {"status": "not_found", "session_id": session_id}
 
@@ -120,13 +332,57 @@ async def delete_session(session_id: str):
 @app.get("/sessions")
 async def list_sessions():
     """List active sessions"""
+    backend = get_state_backend()
+    sessions = backend.keys("sessions") if backend.shared else list(orchestrators.keys())
     return {
-        "sessions": list(orchestrators.keys()),
-        "count": len(orchestrators)
+        "sessions": sessions,
+        "count": len(sessions)
+    }
+
+
+@app.get("/session/{session_id}/affinity")
+async def session_affinity(session_id: str):
+    """Sticky routing hint: node that last served this session"""
+    backend = get_state_backend()
+    node = backend.get("affinity", session_id) if backend.shared else NODE_ID
+    return {"session_id": session_id, "node": node}
+
+
+@app.get("/estimate/workflow/{workflow_name}")
+async def estimate_workflow(workflow_name: str):
+    """Predicted p50/p95 duration, tokens and cost of a workflow from past runs"""
+    config = load_config()
+    try:
+        return shared_estimator(config).estimate_workflow(config, workflow_name)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@app.get("/estimate/consensus")
+async def estimate_consensus(agents: str):
+    """Predicted duration and cost of a consensus over comma-separated agents"""
+    config = load_config()
+    return shared_estimator(config).estimate_consensus(
+        [agent.strip() for agent in agents.split(",") if agent.strip()]
+    )
+
+
+@app.get("/stats")
+async def stats():
+    """Scheduler, model cascade, token estimate, coalescing and speculation statistics"""
+    return {
+        "scheduler": get_scheduler().get_stats(),
+        "cascade": cascade_stats.get_stats(),
+        "cancellation": cancellation_stats.get_stats(),
+        "tokens": token_estimator.get_stats(),
+        "single_flight": single_flight.get_stats(),
+        "speculation": speculation_stats.get_stats(),
     }
 
 
 if __name__ == "__main__":
+    import uvicorn
+
     host = os.getenv("API_HOST", "0.0.0.0")
     port = int(os.getenv("API_PORT", "8000"))
 
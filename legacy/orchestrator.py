@@ -3,10 +3,12 @@
 OpenBotMan CLI - Interactive mode
 
 Usage:
-    python orchestrator.py
+    python orchestrator.py [--profile] [--profile-dir DIR]
 """
 
+import argparse
 import sys
+import time
 from pathlib import Path
 
 # Add src to path
@@ -18,6 +20,14 @@ from src.orchestrator import MultiAgentOrchestrator
 def main():
     """CLI Interface"""
 
+    parser = argparse.ArgumentParser(description="OpenBotMan interactive orchestrator")
+    parser.add_argument(
+        "--profile", action="store_true",
+        help="profile each chat turn (CPU samples, allocations, flame-graph stacks)"
+    )
+    parser.add_argument("--profile-dir", default="data/profiles", help="where to write profiles")
+    args = parser.parse_args()
+
     print("=" * 60)
     print("🤖 OpenBotMan - Multi-Agent Orchestrator")
     print("=" * 60)
@@ -79,7 +89,20 @@ def main():
 
             # Process request
             print()
-            response = orchestrator.chat(user_input)
+            if args.profile:
+                from src.profiling import TurnProfiler, format_summary
+
+                profiler = TurnProfiler(
+                    name=f"cli-{time.strftime('%Y%m%d-%H%M%S')}", output_dir=args.profile_dir
+                )
+                try:
+                    with profiler:
+                        response = orchestrator.chat(user_input)
+                finally:
+                    if profiler.summary:
+                        print(format_summary(profiler.summary))
+            else:
+                response = orchestrator.chat(user_input)
             print(f"\n🤖 Orchestrator:\n{response}\n")
 
         except KeyboardInterrupt:
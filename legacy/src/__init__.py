@@ -3,12 +3,26 @@
 __version__ = "0.1.0"
 __author__ = "OpenBotMan Contributors"
 
-from .orchestrator import MultiAgentOrchestrator
-from .cli_runners import CLIRunner
-from .tools import OrchestratorTools
-
 __all__ = [
     "MultiAgentOrchestrator",
     "CLIRunner",
     "OrchestratorTools",
 ]
+
+# Submodules are imported on first attribute access so that `import src`
+# stays cheap; the orchestrator pulls in the Anthropic SDK.
+_exports = {
+    "MultiAgentOrchestrator": ".orchestrator",
+    "CLIRunner": ".cli_runners",
+    "OrchestratorTools": ".tools",
+}
+
+
+def __getattr__(name):
+    if name in _exports:
+        import importlib
+
+        value = getattr(importlib.import_module(_exports[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
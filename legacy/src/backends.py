@@ -0,0 +1,269 @@
+"""Agent backends: spawned CLIs (CLIRunner) or pooled keep-alive HTTP APIs"""
+
+import http.client
+import json
+import os
+import queue
+import socket
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+from .cancellation import CancellationToken, OperationCancelled, cancellation_stats, noop
+from .cli_runners import CLIRunner, CLIResponse, CLITimeout
+
+
+class AgentBackend(ABC):
+    """How a sub-agent call is executed.
+
+    Every backend takes the same arguments as ``CLIRunner.run_cli`` and
+    returns a ``CLIResponse``; the backend is chosen per agent with the
+    ``backend`` key in config.yaml (``cli`` by default).
+    """
+
+    @abstractmethod
+    def run_cli(
+        self,
+        agent_id: str,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        model: Optional[str] = None,
+        timeout: int = 120,
+        priority: Optional[str] = None,
+        cancel_token: Optional[CancellationToken] = None
+    ) -> CLIResponse:
+        ...
+
+    def reset_session(self, agent_id: str):
+        """Forget conversation state for an agent (no-op for stateless backends)"""
+
+
+# CLIRunner is the subprocess implementation (and routes to the others)
+AgentBackend.register(CLIRunner)
+
+
+class ConnectionPool:
+    """Bounded pool of keep-alive HTTP(S) connections to one host"""
+
+    def __init__(self, base_url: str, size: int = 4):
+        parts = urlsplit(base_url)
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port
+        self.base_path = parts.path.rstrip('/')
+        self.size = size
+        self._idle: "queue.LifoQueue[http.client.HTTPConnection]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self.connections_opened = 0
+
+    def _connect(self, timeout: float) -> http.client.HTTPConnection:
+        with self._lock:
+            self.connections_opened += 1
+        if self.scheme == 'https':
+            return http.client.HTTPSConnection(self.host, self.port, timeout=timeout)
+        return http.client.HTTPConnection(self.host, self.port, timeout=timeout)
+
+    def request(
+        self,
+        path: str,
+        body: Dict[str, Any],
+        headers: Dict[str, str],
+        timeout: float,
+        cancel_token: Optional[CancellationToken] = None
+    ) -> Tuple[int, bytes]:
+        """POST JSON and return (status, body).
+
+        Requests are not idempotent (each one is a paid model call), so only
+        a reused connection that the server had already closed is retried:
+        the connection broke and no response status came back. Timeouts and
+        failures while reading a response are never retried.
+        """
+        if not self._slots.acquire(timeout=timeout):
+            raise RuntimeError(f"HTTP backend timeout after {timeout}s waiting for a connection")
+
+        try:
+            payload = json.dumps(body).encode()
+            for attempt in range(2):
+                try:
+                    conn = self._idle.get_nowait()
+                    reused = True
+                except queue.Empty:
+                    conn = self._connect(timeout)
+                    reused = False
+                conn.timeout = timeout
+                if conn.sock is not None:
+                    # Already connected: the timeout has to go on the socket
+                    conn.sock.settimeout(timeout)
+
+                unregister = noop
+                if cancel_token is not None:
+                    unregister = cancel_token.on_cancel(lambda: _abort(conn))
+
+                response = None
+                try:
+                    conn.request(
+                        "POST", self.base_path + path, body=payload,
+                        headers={"Content-Type": "application/json", **headers}
+                    )
+                    response = conn.getresponse()
+                    data = response.read()
+                except (http.client.HTTPException, OSError) as e:
+                    conn.close()
+                    if cancel_token is not None and cancel_token.cancelled:
+                        raise OperationCancelled(cancel_token.reason or "cancelled")
+                    # The server closed the idle keep-alive connection under us
+                    stale = isinstance(e, ConnectionError) and response is None
+                    if reused and attempt == 0 and stale:
+                        continue
+                    raise
+                finally:
+                    unregister()
+
+                if response.will_close:
+                    conn.close()
+                else:
+                    self._idle.put(conn)
+                return response.status, data
+        finally:
+            self._slots.release()
+
+
+def _abort(conn: http.client.HTTPConnection):
+    """Interrupt a blocking request from another thread"""
+    if conn.sock is not None:
+        try:
+            conn.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+_pools: Dict[Tuple[str, int], ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def shared_pool(base_url: str, size: int) -> ConnectionPool:
+    """Process-wide pool per base URL so sessions share warm connections"""
+    with _pools_lock:
+        pool = _pools.get((base_url, size))
+        if pool is None:
+            pool = ConnectionPool(base_url, size)
+            _pools[(base_url, size)] = pool
+        return pool
+
+
+class HTTPAgentBackend(AgentBackend):
+    """Calls a provider's HTTP API directly instead of spawning a CLI.
+
+    Supports the Anthropic Messages API (``api: anthropic``) and
+    OpenAI-compatible chat completions (``api: openai``, also Ollama and
+    LM Studio). Calls are stateless; callers pass context in the prompt.
+    """
+
+    DEFAULT_URLS = {
+        'anthropic': "https://api.anthropic.com",
+        'openai': "https://api.openai.com",
+    }
+
+    def __init__(self, agent_config: Dict[str, Any]):
+        self.agent_config = agent_config
+        self.api = agent_config.get('api', 'anthropic')
+        if self.api not in self.DEFAULT_URLS:
+            raise ValueError(f"Unknown HTTP agent API: {self.api}")
+
+        base_url = agent_config.get('base_url', self.DEFAULT_URLS[self.api])
+        self.pool = shared_pool(base_url, agent_config.get('pool_size', 4))
+
+    def _api_key(self) -> Optional[str]:
+        env_name = self.agent_config.get(
+            'api_key_env',
+            'ANTHROPIC_API_KEY' if self.api == 'anthropic' else 'OPENAI_API_KEY'
+        )
+        return os.getenv(env_name)
+
+    def run_cli(
+        self,
+        agent_id: str,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        model: Optional[str] = None,
+        timeout: int = 120,
+        priority: Optional[str] = None,
+        cancel_token: Optional[CancellationToken] = None
+    ) -> CLIResponse:
+        """Send one request and map the reply onto CLIResponse"""
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+
+        model = model or self.agent_config.get('default_model')
+        max_tokens = self.agent_config.get('max_tokens', 4096)
+        api_key = self._api_key()
+
+        if self.api == 'anthropic':
+            path = "/v1/messages"
+            body: Dict[str, Any] = {
+                "model": model,
+                "max_tokens": max_tokens,
+                "messages": [{"role": "user", "content": prompt}],
+            }
+            if system_prompt:
+                body["system"] = system_prompt
+            headers = {"anthropic-version": "2023-06-01"}
+            if api_key:
+                headers["x-api-key"] = api_key
+        else:
+            path = "/v1/chat/completions"
+            messages = [{"role": "user", "content": prompt}]
+            if system_prompt:
+                messages.insert(0, {"role": "system", "content": system_prompt})
+            body = {"model": model, "max_tokens": max_tokens, "messages": messages}
+            headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+
+        print(f"[HTTP] {agent_id} -> {self.api} (prompt: {len(prompt)} chars)")
+
+        try:
+            status, data = self.pool.request(path, body, headers, timeout, cancel_token)
+        except socket.timeout:
+            raise CLITimeout(f"HTTP backend timeout after {timeout}s", timeout)
+        except OperationCancelled:
+            cancellation_stats.record_call(0.0)
+            raise
+
+        raw_output = data.decode('utf-8', errors='replace')
+        if status >= 400:
+            raise RuntimeError(f"HTTP backend failed: {status} {raw_output[:500]}")
+
+        return self._parse_response(raw_output)
+
+    def _parse_response(self, raw_output: str) -> CLIResponse:
+        data = json.loads(raw_output)
+
+        if self.api == 'anthropic':
+            text = "".join(
+                block.get('text', '') for block in data.get('content', [])
+                if block.get('type') == 'text'
+            )
+            usage = data.get('usage') or {}
+            usage = {
+                'input': usage.get('input_tokens', 0),
+                'output': usage.get('output_tokens', 0),
+            }
+        else:
+            choices = data.get('choices') or [{}]
+            text = (choices[0].get('message') or {}).get('content') or ''
+            usage = data.get('usage') or {}
+            usage = {
+                'input': usage.get('prompt_tokens', 0),
+                'output': usage.get('completion_tokens', 0),
+            }
+
+        return CLIResponse(text=text.strip(), usage=usage, raw_output=raw_output)
+
+
+def create_backend(agent_config: Dict[str, Any]) -> AgentBackend:
+    """Backend for a non-CLI agent (``backend: http``)"""
+    backend = agent_config.get('backend', 'cli')
+    if backend == 'http':
+        return HTTPAgentBackend(agent_config)
+    raise ValueError(f"Unknown agent backend: {backend}")
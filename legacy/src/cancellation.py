@@ -0,0 +1,143 @@
+"""Cancellation tokens for stopping in-flight chat turns and their CLI processes"""
+
+import itertools
+import os
+import signal
+import subprocess
+import threading
+from typing import Any, Callable, Dict, Optional
+
+
+class OperationCancelled(RuntimeError):
+    """Raised when work is abandoned because its cancellation token fired"""
+
+
+def noop():
+    """Unregister function for a callback that was never registered"""
+
+
+class CancellationToken:
+    """Thread-safe cancellation flag with callbacks.
+
+    Callbacks registered with ``on_cancel`` run once, in the thread that
+    calls ``cancel``; a callback registered after cancellation runs at once.
+    Child tokens are cancelled together with their parent until they are
+    detached.
+    """
+
+    def __init__(self, parent: Optional["CancellationToken"] = None):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: Dict[int, Callable[[], None]] = {}
+        self._ids = itertools.count()
+        self.reason: Optional[str] = None
+        self._detach = noop
+        if parent is not None:
+            self._detach = parent.on_cancel(lambda: self.cancel(parent.reason or "cancelled"))
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "cancelled"):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks = list(self._callbacks.values())
+            self._callbacks.clear()
+
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"[Cancel] Callback failed: {e}")
+
+    def on_cancel(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """Register ``callback``; returns a function that unregisters it"""
+        with self._lock:
+            if not self._event.is_set():
+                callback_id = next(self._ids)
+                self._callbacks[callback_id] = callback
+
+                def unregister():
+                    with self._lock:
+                        self._callbacks.pop(callback_id, None)
+                return unregister
+        callback()
+        return noop
+
+    def child(self) -> "CancellationToken":
+        return CancellationToken(parent=self)
+
+    def detach(self):
+        """Stop following the parent (call once the child's work is over)"""
+        self._detach()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._event.wait(timeout)
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise OperationCancelled(self.reason or "cancelled")
+
+
+class CancellationStats:
+    """How much work was thrown away because of cancellations"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.cancelled_calls = 0
+        self.cancelled_seconds = 0.0
+        self.cancelled_turns = 0
+
+    def record_call(self, elapsed: float):
+        with self._lock:
+            self.cancelled_calls += 1
+            self.cancelled_seconds += elapsed
+
+    def record_turn(self):
+        with self._lock:
+            self.cancelled_turns += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "cancelled_turns": self.cancelled_turns,
+                "cancelled_calls": self.cancelled_calls,
+                "cancelled_process_seconds": round(self.cancelled_seconds, 1),
+            }
+
+
+# Shared by every session in the process
+cancellation_stats = CancellationStats()
+
+
+def process_group_kwargs() -> Dict[str, Any]:
+    """Popen arguments that put the child (and its children) in a new process group"""
+    if os.name == 'nt':
+        return {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {'start_new_session': True}
+
+
+def kill_process_tree(proc: subprocess.Popen, grace: float = 2.0):
+    """Terminate a child started with process_group_kwargs and everything it spawned"""
+    if os.name == 'nt':
+        subprocess.run(
+            ["taskkill", "/F", "/T", "/PID", str(proc.pid)],
+            capture_output=True
+        )
+        return
+
+    def signal_group(sig):
+        try:
+            os.killpg(proc.pid, sig)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    signal_group(signal.SIGTERM)
+    # Grandchildren that ignore SIGTERM are killed after the grace period
+    timer = threading.Timer(grace, signal_group, args=(signal.SIGKILL,))
+    timer.daemon = True
+    timer.start()
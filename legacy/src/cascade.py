@@ -0,0 +1,171 @@
+"""Model cascade: try a fast model first and escalate only when the answer looks weak"""
+
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .cli_runners import CLIRunner, CLIResponse
+
+# Only the requested last line counts: code or config in the answer may say "confidence = 1"
+_EXPLICIT_CONFIDENCE = re.compile(
+    r"(?:^|\n)[ \t*_]*confidence\s*[:=][\s*_]*(\d+(?:\.\d+)?)\s*(%?)[^\n]*$", re.IGNORECASE
+)
+_CONFIDENCE_LINE = re.compile(r"\n[ \t*_]*confidence\s*[:=][^\n]*\s*$", re.IGNORECASE)
+
+# Appended to cascaded prompts (except votes, which are checked structurally)
+CONFIDENCE_PROMPT = (
+    "\n\nEnd your answer with a separate last line \"Confidence: NN%\" stating how "
+    "confident you are that the answer is correct and complete."
+)
+
+HEDGES = (
+    "not sure", "unsure", "unclear", "cannot determine", "can't determine",
+    "hard to say", "it depends", "i don't know", "insufficient information",
+    "nicht sicher", "unklar", "schwer zu sagen",
+)
+
+
+def score_confidence(text: str, role: str) -> float:
+    """0-1 confidence/structural validity score for an agent answer.
+
+    Uses the answer's "Confidence: NN%" line. Without one (the model ignored
+    the instruction) the score stays below the default threshold, lowered
+    further by hedging.
+    """
+    stripped = text.strip()
+    if not stripped:
+        return 0.0
+
+    # Votes must contain exactly one unambiguous decision
+    if role == "consensus":
+        upper = stripped.upper()
+        return 0.9 if ("APPROVE" in upper) != ("REJECT" in upper) else 0.1
+
+    explicit = _EXPLICIT_CONFIDENCE.search(stripped)
+    if explicit:
+        value = float(explicit.group(1))
+        if explicit.group(2) or value > 1:
+            value /= 100
+        return max(0.0, min(1.0, value))
+
+    score = 0.5 if len(stripped) >= 40 else 0.3
+    lower = stripped.lower()
+    score -= 0.2 * sum(1 for hedge in HEDGES if hedge in lower)
+    return max(0.0, score)
+
+
+class CascadeStats:
+    """Which tier settled each request and how much latency that saved"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.settled: Dict[str, Dict[int, int]] = {}   # role -> tier -> count
+        self.saved_seconds = 0.0
+        self._latency: Dict[Tuple[str, str], float] = {}  # (agent, model) -> EWMA seconds
+
+    def record_latency(self, agent_id: str, model: str, seconds: float):
+        with self._lock:
+            previous = self._latency.get((agent_id, model))
+            self._latency[(agent_id, model)] = (
+                seconds if previous is None else 0.8 * previous + 0.2 * seconds
+            )
+
+    def seed_latency(self, agent_id: str, model: str, seconds: float):
+        """Prior for a model's latency until it has been observed"""
+        with self._lock:
+            self._latency.setdefault((agent_id, model), seconds)
+
+    def record_settled(self, role: str, tier: int, top_model_key: Tuple[str, str], elapsed: float):
+        """Count the settling tier; savings are net of time lost on escalations"""
+        with self._lock:
+            counts = self.settled.setdefault(role, {})
+            counts[tier] = counts.get(tier, 0) + 1
+            top_latency = self._latency.get(top_model_key)
+            if top_latency is not None:
+                self.saved_seconds += top_latency - elapsed
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "settled_by_tier": {
+                    role: dict(sorted(counts.items())) for role, counts in self.settled.items()
+                },
+                "saved_seconds": round(self.saved_seconds, 1),
+            }
+
+
+# Shared by every session in the process unless a test passes its own
+cascade_stats = CascadeStats()
+
+
+class ModelCascade:
+    """Per-role cascade policies from the ``cascade`` section of config.yaml.
+
+    Example::
+
+        cascade:
+          reviewer:
+            min_confidence: 0.6
+            baseline_seconds: 40   # optional prior for the last tier's latency
+            tiers:
+              claude_code: [haiku, sonnet]
+
+    Votes from create_consensus use the role ``consensus``.
+    """
+
+    def __init__(self, config: Dict[str, Any], stats: Optional[CascadeStats] = None):
+        self.policies = config.get('cascade', {}) or {}
+        self.stats = stats or cascade_stats
+
+    def tiers_for(self, role: str, agent_id: str) -> List[str]:
+        policy = self.policies.get(role) or {}
+        return list((policy.get('tiers') or {}).get(agent_id, []))
+
+    def run(
+        self,
+        cli: CLIRunner,
+        agent_id: str,
+        role: str,
+        prompt: str,
+        **kwargs
+    ) -> Tuple[CLIResponse, Optional[Dict[str, Any]]]:
+        """Run through the role's tiers; returns the response and cascade info.
+
+        Without a policy for ``role``/``agent_id`` this is a plain run_cli call
+        and the info is None.
+        """
+        tiers = self.tiers_for(role, agent_id)
+        if not tiers:
+            return cli.run_cli(agent_id=agent_id, prompt=prompt, **kwargs), None
+
+        policy = self.policies[role]
+        min_confidence = policy.get('min_confidence', 0.6)
+        if role != "consensus":
+            prompt += CONFIDENCE_PROMPT
+        if policy.get('baseline_seconds'):
+            self.stats.seed_latency(agent_id, tiers[-1], policy['baseline_seconds'])
+        started = time.monotonic()
+
+        for tier, model in enumerate(tiers):
+            call_started = time.monotonic()
+            response = cli.run_cli(agent_id=agent_id, prompt=prompt, model=model, **kwargs)
+            self.stats.record_latency(agent_id, model, time.monotonic() - call_started)
+
+            confidence = score_confidence(response.text, role)
+            if confidence >= min_confidence or tier == len(tiers) - 1:
+                break
+            print(
+                f"[Cascade] {agent_id}/{model} confidence {confidence:.2f} "
+                f"< {min_confidence}, escalating"
+            )
+
+        # The confidence line was for us, not for the caller
+        response.text = _CONFIDENCE_LINE.sub("", response.text).rstrip()
+        elapsed = time.monotonic() - started
+        self.stats.record_settled(role, tier, (agent_id, tiers[-1]), elapsed)
+        return response, {
+            "model": model,
+            "tier": tier,
+            "confidence": round(confidence, 2),
+        }
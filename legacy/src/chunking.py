@@ -0,0 +1,94 @@
+"""Split large workflow inputs into chunks on file, function or token boundaries"""
+
+import re
+from typing import List
+
+# Approximate characters per token for sizing chunks
+CHARS_PER_TOKEN = 4
+
+# Headers that start a new file in pasted code, diffs and concatenated sources
+_FILE_HEADER = re.compile(
+    r"^(?:diff --git |==> .+ <==|=== .+ ===|#{1,3} File: |// File: |--- File: |File: )",
+    re.MULTILINE
+)
+
+# Top-level definitions in common languages (no indentation)
+_DEFINITION = re.compile(
+    r"^(?:(?:async\s+)?def |class |(?:export\s+)?(?:default\s+)?(?:async\s+)?function\b|"
+    r"(?:export\s+)?(?:interface|type|enum) |func |fn |pub fn |impl |"
+    r"(?:public|private|protected|internal)\s)",
+    re.MULTILINE
+)
+
+SPLIT_MODES = ("auto", "file", "function", "tokens")
+
+
+def _split_at(text: str, pattern: re.Pattern) -> List[str]:
+    """Pieces of ``text`` starting at each match (the preamble is kept with the first)"""
+    starts = [m.start() for m in pattern.finditer(text) if m.start() > 0]
+    bounds = [0] + starts + [len(text)]
+    return [text[a:b] for a, b in zip(bounds, bounds[1:]) if text[a:b].strip()]
+
+
+def _split_lines(text: str, max_chars: int) -> List[str]:
+    """Split on line boundaries (hard-cut only for single overlong lines)"""
+    pieces, current = [], ""
+    for line in text.splitlines(keepends=True):
+        while len(line) > max_chars:
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(line[:max_chars])
+            line = line[max_chars:]
+        if len(current) + len(line) > max_chars and current:
+            pieces.append(current)
+            current = ""
+        current += line
+    if current.strip():
+        pieces.append(current)
+    return pieces
+
+
+def _pack(pieces: List[str], max_chars: int) -> List[str]:
+    """Greedily combine consecutive pieces into chunks of at most ``max_chars``"""
+    chunks, current = [], ""
+    for piece in pieces:
+        if current and len(current) + len(piece) > max_chars:
+            chunks.append(current)
+            current = ""
+        current += piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def split_input(text: str, mode: str = "auto", chunk_tokens: int = 8000) -> List[str]:
+    """Split ``text`` into chunks of about ``chunk_tokens`` tokens.
+
+    ``file`` splits at file headers, ``function`` at top-level definitions and
+    ``tokens`` at line boundaries; ``auto`` uses the first one that applies.
+    Pieces that are still too large fall through to the next finer mode.
+    """
+    if mode not in SPLIT_MODES:
+        raise ValueError(f"Unknown split mode: {mode} (expected one of {', '.join(SPLIT_MODES)})")
+
+    max_chars = chunk_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return [text]
+
+    order = ["file", "function", "tokens"]
+    if mode != "auto":
+        order = order[order.index(mode):]
+
+    def refine(piece: str, modes: List[str]) -> List[str]:
+        if len(piece) <= max_chars:
+            return [piece]
+        if modes[0] == "tokens":
+            return _split_lines(piece, max_chars)
+        pattern = _FILE_HEADER if modes[0] == "file" else _DEFINITION
+        parts = _split_at(piece, pattern)
+        if len(parts) <= 1:
+            return refine(piece, modes[1:])
+        return [sub for part in parts for sub in refine(part, modes[1:])]
+
+    return _pack(refine(text, order), max_chars)
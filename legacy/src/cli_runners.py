@@ -1,11 +1,48 @@
 """CLI subprocess runners for different LLM CLIs"""
 
+import os
 import subprocess
 import json
+import sys
+import threading
+import time
 import uuid
-from typing import Dict, List, Optional, Any
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Any, Tuple
 from dataclasses import dataclass
 
+from .cancellation import (
+    CancellationToken, OperationCancelled, cancellation_stats,
+    kill_process_tree, noop, process_group_kwargs
+)
+from .resources import apply_limits, group_rss_kib, resource_profile
+from .scheduler import AgentScheduler
+
+
+# How long to wait for a killed process (or its pipes) before giving up on it
+KILL_GRACE_SECONDS = 5
+
+# Caller scope for CLI sessions (workflow step, ballot, ...); None = default.
+# A ContextVar keeps it per thread and per asyncio task.
+_session_scope: ContextVar[Optional[str]] = ContextVar("session_scope", default=None)
+
+# Priority class of the chat turn making the calls; None = the runner's default
+_call_priority: ContextVar[Optional[str]] = ContextVar("call_priority", default=None)
+
+
+def session_key(agent_id: str, scope: Optional[str] = None) -> str:
+    """Key in CLIRunner.sessions: ``agent_id`` or ``agent_id@scope``"""
+    return agent_id if scope is None else f"{agent_id}@{scope}"
+
+
+class CLITimeout(RuntimeError):
+    """An agent call ran out of time (its process was killed)"""
+
+    def __init__(self, message: str, seconds: float):
+        super().__init__(message)
+        self.seconds = seconds
+
 
 @dataclass
 class CLIResponse:
@@ -14,14 +51,27 @@ class CLIResponse:
     session_id: Optional[str] = None
     usage: Optional[Dict[str, int]] = None
     raw_output: str = ""
+    resources: Optional[Dict[str, Any]] = None  # peak RSS / CPU time of the CLI process
+    elapsed: Optional[float] = None  # seconds the call itself ran (without queueing for a slot)
 
 
 class CLIRunner:
     """Handles subprocess execution of various LLM CLIs"""
 
-    def __init__(self, config: Dict[str, Any]):
+    def __init__(
+        self,
+        config: Dict[str, Any],
+        scheduler: Optional[AgentScheduler] = None,
+        session_id: str = "default"
+    ):
         self.config = config
-        self.sessions: Dict[str, str] = {}  # agent_id -> session_id
+        self.sessions: Dict[str, str] = {}  # session_key -> CLI session ID
+        self._fork_parents: Dict[str, str] = {}  # session_key -> session to fork from
+        self._sessions_lock = threading.Lock()
+        self.scheduler = scheduler
+        self.session_id = session_id  # owner used for fair queuing
+        self.priority = "normal"
+        self.backends: Dict[str, Any] = {}  # agent_id -> non-CLI AgentBackend
 
     def run_cli(
         self,
@@ -29,14 +79,35 @@ class CLIRunner:
         prompt: str,
         system_prompt: Optional[str] = None,
         model: Optional[str] = None,
-        timeout: int = 120
+        timeout: int = 120,
+        priority: Optional[str] = None,
+        cancel_token: Optional[CancellationToken] = None
     ) -> CLIResponse:
-        """Execute CLI and return parsed response"""
+        """Execute CLI and return parsed response.
+
+        Cancelling ``cancel_token`` stops waiting for a slot, or kills the
+        CLI's whole process group, and raises OperationCancelled.
+        """
 
         agent_config = self.config['agents'].get(agent_id)
         if not agent_config:
             raise ValueError(f"Unknown agent: {agent_id}")
 
+        # Agents with ``backend: http`` etc. are served without a subprocess
+        if agent_config.get('backend', 'cli') != 'cli':
+            backend = self._backend(agent_id, agent_config)
+            with self._slot(agent_id, priority, cancel_token):
+                started = time.monotonic()
+                response = backend.run_cli(
+                    agent_id, prompt,
+                    system_prompt=system_prompt,
+                    model=model,
+                    timeout=timeout,
+                    cancel_token=cancel_token
+                )
+                response.elapsed = time.monotonic() - started
+                return response
+
         # Build command
         cmd = [agent_config['cli']] + agent_config.get('args', [])
 
@@ -46,11 +117,11 @@ class CLIRunner:
         elif agent_config.get('default_model'):
             cmd.extend([agent_config['model_arg'], agent_config['default_model']])
 
-        # Session management
-        session_id = self.sessions.get(agent_id)
-        if not session_id:
-            session_id = str(uuid.uuid4())
-            self.sessions[agent_id] = session_id
+        # Session management (per caller scope)
+        session_id, fork_from = self._claim_session(agent_id)
+
+        if fork_from and agent_config.get('resume_arg') and agent_config.get('fork_arg'):
+            cmd.extend([agent_config['resume_arg'], fork_from, agent_config['fork_arg']])
 
         if agent_config.get('session_arg'):
             cmd.extend([agent_config['session_arg'], session_id])
@@ -64,23 +135,221 @@ class CLIRunner:
 
         print(f"[CLI] Executing: {agent_config['cli']} (prompt: {len(prompt)} chars)")
 
-        # Execute
-        try:
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=timeout
+        # Execute (waits for a free slot when a scheduler is attached)
+        profile = resource_profile(self.config, agent_id)
+        with self._slot(agent_id, priority, cancel_token):
+            started = time.monotonic()
+            returncode, stdout, stderr, resources = self._execute(
+                cmd, timeout, cancel_token, profile
             )
+            elapsed = time.monotonic() - started
 
-            if result.returncode != 0:
-                raise RuntimeError(f"CLI failed: {result.stderr}")
+        if returncode != 0:
+            raise RuntimeError(f"CLI failed: {stderr}")
 
-            # Parse response
-            return self._parse_response(result.stdout, agent_id)
+        # Parse response
+        response = self._parse_response(stdout, agent_id)
+        response.resources = resources
+        response.elapsed = elapsed
+        return response
+
+    def _slot(
+        self,
+        agent_id: str,
+        priority: Optional[str],
+        cancel_token: Optional[CancellationToken]
+    ):
+        """Scheduler slot for one call (no-op without a scheduler)"""
+        if self.scheduler is None:
+            return nullcontext()
+        return self.scheduler.slot(
+            agent_id,
+            session_id=self.session_id,
+            priority=priority or _call_priority.get() or self.priority,
+            cancel_token=cancel_token
+        )
+
+    @contextmanager
+    def call_priority(self, priority: Optional[str]):
+        """Schedule calls made in this block with ``priority`` (None keeps the default)"""
+        token = _call_priority.set(priority)
+        try:
+            yield
+        finally:
+            _call_priority.reset(token)
+
+    def _backend(self, agent_id: str, agent_config: Dict[str, Any]):
+        """Create (once) the configured non-CLI backend for an agent"""
+        backend = self.backends.get(agent_id)
+        if backend is None:
+            from .backends import create_backend
+            backend = create_backend(agent_config)
+            self.backends[agent_id] = backend
+        return backend
+
+    def _execute(
+        self,
+        cmd: List[str],
+        timeout: int,
+        cancel_token: Optional[CancellationToken],
+        profile: Optional[Dict[str, Any]] = None
+    ):
+        """Run the CLI in its own process group; kill the group on timeout, cancel or limit breach.
+
+        Returns (returncode, stdout, stderr, resources) where resources holds
+        the child's peak RSS and CPU time (None on Windows).
+        """
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+
+        profile = profile or {}
+        if profile.get('max_wall_seconds'):
+            timeout = min(timeout, profile['max_wall_seconds'])
+
+        started = time.monotonic()
+        proc = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            **process_group_kwargs()
+        )
+        unregister = noop
+        if cancel_token is not None:
+            unregister = cancel_token.on_cancel(lambda: kill_process_tree(proc))
+
+        try:
+            if os.name == 'nt':
+                stdout, stderr, resources = self._communicate(proc, timeout)
+            else:
+                stdout, stderr, resources = self._monitor(proc, timeout, profile, started)
+        finally:
+            unregister()
 
+        if cancel_token is not None and cancel_token.cancelled:
+            cancellation_stats.record_call(time.monotonic() - started)
+            raise OperationCancelled(cancel_token.reason or "cancelled")
+
+        return (
+            proc.returncode,
+            stdout.decode('utf-8', errors='replace'),
+            stderr.decode('utf-8', errors='replace'),
+            resources
+        )
+
+    def _communicate(self, proc: subprocess.Popen, timeout: int):
+        """Wait for the CLI without resource monitoring (Windows)"""
+        try:
+            stdout, stderr = proc.communicate(timeout=timeout)
         except subprocess.TimeoutExpired:
-            raise RuntimeError(f"CLI timeout after {timeout}s")
+            kill_process_tree(proc)
+            try:
+                proc.communicate(timeout=KILL_GRACE_SECONDS)
+            except subprocess.TimeoutExpired:
+                print(f"[CLI] Process {proc.pid} still running {KILL_GRACE_SECONDS}s after kill")
+            raise CLITimeout(f"CLI timeout after {timeout}s", timeout)
+        except BaseException:
+            # e.g. Ctrl+C: the child is in its own group and would not get SIGINT
+            kill_process_tree(proc)
+            raise
+        return stdout, stderr, None
+
+    def _monitor(
+        self,
+        proc: subprocess.Popen,
+        timeout: int,
+        profile: Dict[str, Any],
+        started: float
+    ):
+        """Wait for the CLI while enforcing its resource profile.
+
+        Output is drained by reader threads (so the cap can be checked while
+        it streams) and the child is reaped with wait4 for its rusage.
+        """
+        max_output = profile.get('max_output_kb', 0) * 1024
+        max_rss_kib = profile.get('memory_mb', 0) * 1024
+        chunks: Dict[str, List[bytes]] = {'stdout': [], 'stderr': []}
+        output_size = [0]
+        over_output = threading.Event()
+
+        def read(stream, name):
+            for chunk in iter(lambda: stream.read1(65536), b''):
+                chunks[name].append(chunk)
+                output_size[0] += len(chunk)
+                if max_output and output_size[0] > max_output:
+                    over_output.set()
+            stream.close()
+
+        reaped: Dict[str, Any] = {}
+        exited = threading.Event()
+
+        def reap():
+            _, status, usage = os.wait4(proc.pid, 0)
+            reaped['status'], reaped['usage'] = status, usage
+            exited.set()
+
+        threads = [
+            threading.Thread(target=read, args=(proc.stdout, 'stdout'), daemon=True),
+            threading.Thread(target=read, args=(proc.stderr, 'stderr'), daemon=True),
+            threading.Thread(target=reap, daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+
+        group_peak_kib = 0
+        breach = None
+        timed_out = False
+        try:
+            apply_limits(proc.pid, profile)
+            while True:
+                remaining = started + timeout - time.monotonic()
+                # Poll while limits need checking; otherwise just wait for the exit
+                poll = 0.1 if (max_rss_kib or max_output) else remaining
+                if exited.wait(max(0.0, min(poll, remaining))):
+                    break
+                if time.monotonic() - started >= timeout:
+                    breach = f"timeout after {timeout}s"
+                    timed_out = True
+                elif over_output.is_set():
+                    breach = f"output exceeded {profile['max_output_kb']} KB"
+                elif max_rss_kib:
+                    rss = group_rss_kib(proc.pid) or 0
+                    group_peak_kib = max(group_peak_kib, rss)
+                    if rss > max_rss_kib:
+                        breach = f"memory exceeded {profile['memory_mb']} MB"
+                if breach:
+                    kill_process_tree(proc)
+                    if not exited.wait(KILL_GRACE_SECONDS):
+                        print(f"[CLI] Process {proc.pid} still running {KILL_GRACE_SECONDS}s after kill")
+                    break
+
+            # Grandchildren may hold the pipes open after the CLI exits
+            for thread in threads[:2]:
+                thread.join(max(0.0, started + timeout - time.monotonic()))
+            if any(thread.is_alive() for thread in threads[:2]):
+                kill_process_tree(proc)
+                for thread in threads[:2]:
+                    thread.join(KILL_GRACE_SECONDS)
+        except BaseException:
+            # e.g. Ctrl+C: the child is in its own group and would not get SIGINT
+            kill_process_tree(proc)
+            raise
+
+        if timed_out:
+            raise CLITimeout(f"CLI {breach}", timeout)
+        if breach:
+            raise RuntimeError(f"CLI {breach}")
+
+        proc.returncode = os.waitstatus_to_exitcode(reaped['status'])
+        usage = reaped['usage']
+        peak_rss = usage.ru_maxrss // 1024 if sys.platform == 'darwin' else usage.ru_maxrss
+        resources = {
+            'peak_rss_kib': peak_rss,
+            'cpu_seconds': round(usage.ru_utime + usage.ru_stime, 3),
+            'wall_seconds': round(time.monotonic() - started, 3),
+        }
+        if max_rss_kib:
+            resources['group_peak_rss_kib'] = group_peak_kib
+        return b''.join(chunks['stdout']), b''.join(chunks['stderr']), resources
 
     def _parse_response(self, output: str, agent_id: str) -> CLIResponse:
         """Parse JSON output from CLI"""
@@ -127,7 +396,88 @@ class CLIRunner:
                 raw_output=output
             )
 
+    def _claim_session(self, agent_id: str) -> Tuple[str, Optional[str]]:
+        """Session ID for the current scope (created on first use) and a pending fork parent"""
+        key = session_key(agent_id, _session_scope.get())
+        with self._sessions_lock:
+            session_id = self.sessions.get(key)
+            if not session_id:
+                session_id = str(uuid.uuid4())
+                self.sessions[key] = session_id
+            return session_id, self._fork_parents.pop(key, None)
+
+    def session_state(self, agent_id: str) -> Tuple[Optional[str], Optional[str]]:
+        """Session ID and pending fork parent of the current scope, without claiming them.
+
+        Both are None while the scope's next call would start a fresh session.
+        """
+        key = session_key(agent_id, _session_scope.get())
+        with self._sessions_lock:
+            return self.sessions.get(key), self._fork_parents.get(key)
+
+    def set_session(self, agent_id: str, session_id: str, fork_from: Optional[str] = None):
+        """Use a known session ID in the current scope (e.g. one handed to a worker).
+
+        Replaces any pending fork parent: without ``fork_from`` the session
+        resumes as is.
+        """
+        key = session_key(agent_id, _session_scope.get())
+        with self._sessions_lock:
+            self.sessions[key] = session_id
+            if fork_from:
+                self._fork_parents[key] = fork_from
+            else:
+                self._fork_parents.pop(key, None)
+
+    @contextmanager
+    def scope(self, name: str, release: bool = True):
+        """Run calls made in this block in their own CLI sessions.
+
+        Concurrent callers in different scopes never share a session. With
+        ``release`` the scope's sessions are forgotten when the block ends.
+        """
+        token = _session_scope.set(name)
+        try:
+            yield
+        finally:
+            _session_scope.reset(token)
+            if release:
+                self.release_scope(name)
+
+    def fork_session(self, agent_id: str, scope: str, from_scope: Optional[str] = None) -> bool:
+        """Start ``scope``'s session for an agent as a fork of ``from_scope``'s.
+
+        The fork shares the parent's conversation so far but continues
+        independently. Needs ``resume_arg`` and ``fork_arg`` on the agent;
+        returns False (and the scope starts fresh) otherwise or when the
+        parent has no session yet.
+        """
+        agent_config = self.config['agents'].get(agent_id) or {}
+        with self._sessions_lock:
+            parent = self.sessions.get(session_key(agent_id, from_scope))
+            if not (parent and agent_config.get('resume_arg') and agent_config.get('fork_arg')):
+                return False
+            self._fork_parents[session_key(agent_id, scope)] = parent
+        return True
+
+    def release_scope(self, scope: str):
+        """Forget all sessions of a scope"""
+        suffix = f"@{scope}"
+        with self._sessions_lock:
+            for key in [k for k in self.sessions if k.endswith(suffix)]:
+                del self.sessions[key]
+            for key in [k for k in self._fork_parents if k.endswith(suffix)]:
+                del self._fork_parents[key]
+
+    def clear_sessions(self):
+        """Forget every session in every scope"""
+        with self._sessions_lock:
+            self.sessions.clear()
+            self._fork_parents.clear()
+
     def reset_session(self, agent_id: str):
-        """Reset session for an agent"""
-        if agent_id in self.sessions:
-            del self.sessions[agent_id]
+        """Reset session for an agent (in the current scope)"""
+        key = session_key(agent_id, _session_scope.get())
+        with self._sessions_lock:
+            self.sessions.pop(key, None)
+            self._fork_parents.pop(key, None)
@@ -0,0 +1,117 @@
+"""Config loading with a cached, validated JSON snapshot of config.yaml"""
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+SNAPSHOT_VERSION = 1
+
+# config path -> (source fingerprint, JSON text)
+_memo: Dict[str, Tuple[Tuple[int, int], str]] = {}
+_memo_lock = threading.Lock()
+
+
+def snapshot_path(config_file: Path) -> Path:
+    """Location of the snapshot for a config file (next to it, hidden)"""
+    return config_file.with_name(f".{config_file.name}.snapshot.json")
+
+
+def validate_config(config: Any) -> Dict[str, Any]:
+    """Check the structure the orchestrator relies on; raises ValueError"""
+    if not isinstance(config, dict):
+        raise ValueError("Config must be a mapping")
+
+    agents = config.get('agents')
+    if not isinstance(agents, dict) or not agents:
+        raise ValueError("Config needs an 'agents' mapping of agent_id -> settings")
+    for agent_id, agent_config in agents.items():
+        if not isinstance(agent_config, dict):
+            raise ValueError(f"Agent '{agent_id}' settings must be a mapping")
+        backend = agent_config.get('backend', 'cli')
+        if backend == 'cli' and not agent_config.get('cli'):
+            raise ValueError(f"Agent '{agent_id}' needs a 'cli' setting")
+        if backend == 'http' and agent_config.get('api', 'anthropic') not in ('anthropic', 'openai'):
+            raise ValueError(f"Agent '{agent_id}' has an unknown 'api' (anthropic or openai)")
+
+    orchestrator = config.get('orchestrator')
+    if orchestrator is not None:
+        if not isinstance(orchestrator, dict) or 'model' not in orchestrator:
+            raise ValueError("'orchestrator' needs a 'model' setting")
+
+    workflows = config.get('workflows') or {}
+    for name, workflow in workflows.items():
+        if not isinstance(workflow, dict) or not isinstance(workflow.get('steps'), list):
+            raise ValueError(f"Workflow '{name}' needs a list of 'steps'")
+
+    return config
+
+
+def load_config(config_path: str = "config.yaml") -> Dict[str, Any]:
+    """Load config.yaml through its snapshot.
+
+    The parsed and validated config is stored as JSON next to the source and
+    reused while the source's mtime and size are unchanged, so YAML is only
+    imported and parsed when the file was edited. Within a process the
+    snapshot text is memoized as well. Each call returns a fresh dict.
+    """
+    config_file = Path(config_path)
+    try:
+        stat = config_file.stat()
+    except FileNotFoundError:
+        raise FileNotFoundError(
+            f"Config file not found: {config_path}\n"
+            f"Copy config.example.yaml to config.yaml and customize it."
+        )
+    fingerprint = (stat.st_mtime_ns, stat.st_size)
+    key = str(config_file.resolve())
+
+    with _memo_lock:
+        cached = _memo.get(key)
+    if cached and cached[0] == fingerprint:
+        return json.loads(cached[1])
+
+    text = _read_snapshot(config_file, fingerprint)
+    if text is None:
+        text = _build_snapshot(config_file, fingerprint)
+
+    with _memo_lock:
+        _memo[key] = (fingerprint, text)
+    return json.loads(text)
+
+
+def _read_snapshot(config_file: Path, fingerprint: Tuple[int, int]):
+    try:
+        with open(snapshot_path(config_file), encoding="utf-8") as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if (snapshot.get('version') != SNAPSHOT_VERSION
+            or tuple(snapshot.get('source', ())) != fingerprint):
+        return None
+    return json.dumps(snapshot['config'])
+
+
+def _build_snapshot(config_file: Path, fingerprint: Tuple[int, int]) -> str:
+    import yaml
+
+    with open(config_file, encoding="utf-8") as f:
+        config = validate_config(yaml.safe_load(f))
+    text = json.dumps(config, default=str)
+
+    # Best effort: a read-only config directory just means no snapshot
+    target = snapshot_path(config_file)
+    temp = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+    try:
+        with open(temp, "w", encoding="utf-8") as f:
+            json.dump(
+                {'version': SNAPSHOT_VERSION, 'source': fingerprint, 'config': config},
+                f, default=str
+            )
+        os.replace(temp, target)
+    except OSError:
+        pass
+
+    return text
@@ -0,0 +1,87 @@
+"""Novelty scoring to stop multi-round agent exchanges that keep repeating themselves"""
+
+import re
+from typing import Dict, Any, List, Optional, Set
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+STEER_PROMPT = (
+    "The last round mostly repeated points that were already made. "
+    "Do not restate earlier arguments. Only add genuinely new points, "
+    "or state clearly that you agree and have nothing to add."
+)
+
+
+def shingles(text: str, size: int = 4) -> Set[int]:
+    """Hashed word n-grams of ``text`` (case- and punctuation-insensitive)"""
+    words = _WORD.findall(text.lower())
+    if len(words) < size:
+        return {hash(tuple(words))} if words else set()
+    return {hash(tuple(words[i:i + size])) for i in range(len(words) - size + 1)}
+
+
+def similarity(a: str, b: str, size: int = 4) -> float:
+    """Jaccard similarity of two texts' shingle sets"""
+    sa, sb = shingles(a, size), shingles(b, size)
+    if not sa and not sb:
+        return 1.0
+    return len(sa & sb) / len(sa | sb)
+
+
+class ConvergenceDetector:
+    """Tracks how much new content each round adds.
+
+    Novelty of a round is the fraction of its shingles never seen in earlier
+    rounds (1.0 for the first round). A round below ``min_novelty`` counts as
+    stalled; after one stalled round callers should steer the prompt, after
+    ``patience`` consecutive stalled rounds they should stop.
+    """
+
+    def __init__(self, min_novelty: float = 0.2, patience: int = 2, shingle_size: int = 4):
+        self.min_novelty = min_novelty
+        self.patience = max(1, patience)
+        self.shingle_size = shingle_size
+        self.novelty: List[float] = []
+        self.stalled_rounds = 0
+        self._seen: Set[int] = set()
+
+    @classmethod
+    def from_config(
+        cls,
+        config: Dict[str, Any],
+        overrides: Optional[Dict[str, Any]] = None
+    ) -> "ConvergenceDetector":
+        """Build from the ``convergence`` section, with per-step overrides"""
+        section = dict(config.get('convergence', {}) or {})
+        section.update(overrides or {})
+        return cls(
+            min_novelty=section.get('min_novelty', 0.2),
+            patience=section.get('patience', 2)
+        )
+
+    def observe(self, responses: List[str]) -> float:
+        """Score one round of responses and remember its content"""
+        round_shingles: Set[int] = set()
+        for text in responses:
+            round_shingles |= shingles(text, self.shingle_size)
+
+        if round_shingles:
+            novelty = len(round_shingles - self._seen) / len(round_shingles)
+        else:
+            novelty = 0.0
+        self._seen |= round_shingles
+
+        self.novelty.append(novelty)
+        if novelty < self.min_novelty:
+            self.stalled_rounds += 1
+        else:
+            self.stalled_rounds = 0
+        return novelty
+
+    @property
+    def should_steer(self) -> bool:
+        return 0 < self.stalled_rounds < self.patience
+
+    @property
+    def converged(self) -> bool:
+        return self.stalled_rounds >= self.patience
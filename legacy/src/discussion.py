@@ -0,0 +1,102 @@
+"""Shared transcript and participant lookup for multi-round team discussions"""
+
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+
+class Transcript:
+    """Discussion transcript bounded to ``max_chars``.
+
+    Contributions are appended as they arrive and the oldest ones are dropped
+    from the front (the newest one is cut if it alone is too long), so the
+    size is maintained incrementally instead of re-measuring every round.
+    """
+
+    def __init__(self, max_chars: int = 50000):
+        self.max_chars = max_chars
+        self.entries: Deque[str] = deque()
+        self.chars = 0
+        self.dropped = 0
+
+    def add(self, speaker: str, round_number: int, text: str):
+        entry = f"[Round {round_number}] {speaker}:\n{text.strip()}\n\n"
+        if len(entry) > self.max_chars:
+            entry = entry[:self.max_chars - 6] + " [...]"
+        self.entries.append(entry)
+        self.chars += len(entry)
+
+        while self.chars > self.max_chars:
+            self.chars -= len(self.entries.popleft())
+            self.dropped += 1
+
+    def render(self) -> str:
+        text = "".join(self.entries)
+        if self.dropped:
+            text = f"[{self.dropped} earlier contribution(s) omitted]\n\n{text}"
+        return text
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+def _agent_for_member(config: Dict[str, Any], name: str, member: Dict[str, Any]) -> Optional[str]:
+    """Configured agent a discussion member runs on, None if there is none"""
+    if 'agent' in member:
+        return member['agent'] if member['agent'] in config['agents'] else None
+    if name in config['agents']:
+        return name
+    provider = member.get('provider')
+    if provider:
+        if provider in config['agents']:
+            return provider
+        for agent_id, agent_config in config['agents'].items():
+            if (agent_config or {}).get('provider') == provider:
+                return agent_id
+    return None
+
+
+def resolve_participants(
+    config: Dict[str, Any],
+    team: Optional[str] = None,
+    agents: Optional[List[str]] = None
+) -> List[Dict[str, Any]]:
+    """Map a team or agent list onto configured agents.
+
+    Without either, every configured agent takes part. Names may be agent
+    IDs from ``agents`` or members of ``discussion.agents``. A member runs on
+    its ``agent`` setting, the agent with the same ID, or the agent serving
+    its ``provider`` (an agent with that ID or with a matching ``provider``
+    key), and uses its ``systemPrompt`` or the text of its ``promptId``.
+    """
+    discussion = config.get('discussion', {}) or {}
+    members = {m['id']: m for m in discussion.get('agents', []) or []}
+    prompts = {p['id']: p.get('text', '') for p in discussion.get('prompts', []) or []}
+
+    if agents is None and team is not None:
+        teams = {t['id']: t for t in discussion.get('teams', []) or []}
+        if team not in teams:
+            raise ValueError(f"Unknown team: {team}")
+        agents = teams[team].get('agents') or []
+    if agents is None:
+        agents = list(config['agents'].keys())
+    if not agents:
+        raise ValueError("A discussion needs at least one participant")
+
+    participants = []
+    for name in agents:
+        member = members.get(name, {})
+        agent_id = _agent_for_member(config, name, member)
+        if agent_id is None:
+            hint = f" or an agent with 'provider: {member['provider']}'" if member.get('provider') else ""
+            raise ValueError(
+                f"Discussion member '{name}' needs an 'agent' setting naming a configured agent{hint}"
+            )
+        participants.append({
+            'name': name,
+            'agent_id': agent_id,
+            'role': member.get('role', 'critic'),
+            'system_prompt': member.get('systemPrompt') or prompts.get(member.get('promptId')),
+            # Provider-specific model names only apply to an agent chosen for the member
+            'model': member.get('model') if 'agent' in member or agent_id != name else None,
+        })
+    return participants
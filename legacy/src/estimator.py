@@ -0,0 +1,248 @@
+"""Latency and token-cost estimates for agent calls and workflows from past runs"""
+
+import json
+import random
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+# (seconds, tokens, prompt tokens)
+Sample = Tuple[float, int, int]
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _entry(key: str, sample: Sample, timed_out: bool) -> Dict[str, Any]:
+    """JSONL line of a recorded sample"""
+    seconds, tokens, prompt_tokens = sample
+    entry = {'key': key, 'seconds': round(seconds, 3), 'tokens': tokens, 'prompt_tokens': prompt_tokens}
+    if timed_out:
+        entry['timed_out'] = True
+    return entry
+
+
+class RunEstimator:
+    """Per-agent/role latency and token distributions learned from recorded runs.
+
+    Calls are recorded under ``agent_id/role`` and whole workflow steps
+    (including refinement rounds) under ``workflow:<name>:<step>``. Only the
+    last ``max_samples`` runs per key are kept; with ``path`` every sample is
+    appended to a JSONL file and replayed on startup; the file is rewritten
+    with just the kept samples once it holds twice as many lines.
+
+    A call that timed out is recorded at its timeout, and each consecutive
+    timeout multiplies the next timeout by ``timeout_backoff``.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        max_samples: int = 200,
+        min_samples: int = 5,
+        default_timeout: float = 120,
+        timeout_margin: float = 1.5,
+        min_timeout: float = 30,
+        max_timeout: float = 900,
+        timeout_backoff: float = 2.0,
+        simulations: int = 2000,
+        cost_per_1k_tokens: Optional[Dict[str, float]] = None
+    ):
+        self.path = path
+        self.max_samples = max_samples
+        self.min_samples = min_samples
+        self.default_timeout = default_timeout
+        self.timeout_margin = timeout_margin
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.timeout_backoff = timeout_backoff
+        self.simulations = simulations
+        self.cost_per_1k_tokens = cost_per_1k_tokens or {}
+        self._samples: Dict[str, Deque[Sample]] = {}
+        self._timeouts: Dict[str, int] = {}  # key -> consecutive timeouts
+        self._retained = 0    # samples kept in memory
+        self._file_lines = 0  # samples in the JSONL file
+        self._lock = threading.Lock()
+
+        if path and Path(path).exists():
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._add_locked(
+                            entry['key'], entry['seconds'], entry['tokens'],
+                            entry.get('prompt_tokens', 0), entry.get('timed_out', False)
+                        )
+                        self._file_lines += 1
+            if self._file_lines > self._retained:
+                self._compact_locked()
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "RunEstimator":
+        section = config.get('estimator', {}) or {}
+        return cls(
+            path=section.get('path'),
+            max_samples=section.get('max_samples', 200),
+            min_samples=section.get('min_samples', 5),
+            default_timeout=config.get('behavior', {}).get('cli_timeout', 120),
+            timeout_margin=section.get('timeout_margin', 1.5),
+            min_timeout=section.get('min_timeout', 30),
+            max_timeout=section.get('max_timeout', 900),
+            timeout_backoff=section.get('timeout_backoff', 2.0),
+            simulations=section.get('simulations', 2000),
+            cost_per_1k_tokens=section.get('cost_per_1k_tokens'),
+        )
+
+    def _add_locked(self, key: str, seconds: float, tokens: int, prompt_tokens: int, timed_out: bool):
+        samples = self._samples.get(key)
+        if samples is None:
+            samples = self._samples[key] = deque(maxlen=self.max_samples)
+        if len(samples) < self.max_samples:
+            self._retained += 1
+        samples.append((seconds, tokens, prompt_tokens))
+        self._timeouts[key] = self._timeouts.get(key, 0) + 1 if timed_out else 0
+
+    def record(self, key: str, seconds: float, tokens: int, prompt_tokens: int = 0, timed_out: bool = False):
+        with self._lock:
+            self._add_locked(key, seconds, tokens, prompt_tokens, timed_out)
+            if not self.path:
+                return
+            if self._file_lines >= 2 * self._retained:
+                self._compact_locked()
+            else:
+                Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(_entry(key, (seconds, tokens, prompt_tokens), timed_out)) + "\n")
+                self._file_lines += 1
+
+    def _compact_locked(self):
+        """Rewrite the JSONL file with the samples still kept"""
+        path = Path(self.path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp = path.with_suffix(path.suffix + ".tmp")
+        with open(temp, "w", encoding="utf-8") as f:
+            for key, samples in self._samples.items():
+                # The trailing run of timeouts keeps the backoff across restarts
+                first_timeout = len(samples) - self._timeouts.get(key, 0)
+                for i, sample in enumerate(samples):
+                    f.write(json.dumps(_entry(key, sample, i >= first_timeout)) + "\n")
+        temp.replace(path)
+        self._file_lines = self._retained
+
+    def record_call(
+        self,
+        agent_id: str,
+        role: str,
+        seconds: float,
+        tokens: int,
+        prompt_tokens: int = 0,
+        timed_out: bool = False
+    ):
+        """Record one CLI run; ``seconds`` is the process time (the timeout if it timed out)"""
+        self.record(f"{agent_id}/{role}", seconds, tokens, prompt_tokens, timed_out)
+
+    def record_step(self, workflow: str, step: int, seconds: float, tokens: int):
+        self.record(f"workflow:{workflow}:{step}", seconds, tokens)
+
+    def _samples_for(self, *keys: str) -> List[Sample]:
+        """Samples of the first key with enough history"""
+        with self._lock:
+            for key in keys:
+                samples = self._samples.get(key)
+                if samples and len(samples) >= self.min_samples:
+                    return list(samples)
+        return []
+
+    def timeout_for(self, agent_id: str, role: str, prompt_tokens: Optional[int] = None) -> float:
+        """p95 latency times the margin, within bounds; the default until learned.
+
+        Prompts larger than the typical recorded prompt scale the timeout up
+        proportionally, and every consecutive timeout backs it off further.
+        """
+        key = f"{agent_id}/{role}"
+        samples = self._samples_for(key)
+        with self._lock:
+            backoff = self.timeout_backoff ** self._timeouts.get(key, 0)
+        if not samples:
+            return max(self.default_timeout, min(self.max_timeout, self.default_timeout * backoff))
+
+        timeout = percentile([sample[0] for sample in samples], 0.95) * self.timeout_margin
+        typical_prompt = percentile([sample[2] for sample in samples], 0.5)
+        if prompt_tokens and typical_prompt and prompt_tokens > typical_prompt:
+            timeout *= prompt_tokens / typical_prompt
+        return max(self.min_timeout, min(self.max_timeout, timeout * backoff))
+
+    def _simulate(self, parts: List[Tuple[str, List[Sample]]]) -> Dict[str, Any]:
+        """Monte Carlo over sequential parts; a part without history is unknown"""
+        unknown = [name for name, samples in parts if not samples]
+        known = [(name, samples) for name, samples in parts if samples]
+
+        rng = random.Random(0)
+        durations, token_totals, costs = [], [], []
+        for _ in range(self.simulations if known else 0):
+            seconds = tokens = cost = 0.0
+            for name, samples in known:
+                sample_seconds, sample_tokens, _ = rng.choice(samples)
+                seconds += sample_seconds
+                tokens += sample_tokens
+                agent_id = name.split("/")[0]
+                cost += sample_tokens / 1000 * self.cost_per_1k_tokens.get(agent_id, 0.0)
+            durations.append(seconds)
+            token_totals.append(tokens)
+            costs.append(cost)
+
+        def summary(values: List[float], digits: int) -> Optional[Dict[str, float]]:
+            if not values:
+                return None
+            return {
+                "p50": round(percentile(values, 0.5), digits),
+                "p95": round(percentile(values, 0.95), digits),
+            }
+
+        return {
+            "seconds": summary(durations, 1),
+            "tokens": summary(token_totals, 0),
+            "cost": summary(costs, 4),
+            # Parts without enough history are left out of the numbers above
+            "unknown": unknown,
+        }
+
+    def estimate_workflow(self, config: Dict[str, Any], workflow_name: str) -> Dict[str, Any]:
+        """Predicted p50/p95 duration, tokens and cost of a workflow before it runs"""
+        workflow = config.get('workflows', {}).get(workflow_name)
+        if not workflow:
+            raise ValueError(f"Unknown workflow: {workflow_name}")
+
+        parts = []
+        for step_number, step in enumerate(workflow['steps']):
+            call_key = f"{step['agent']}/{step['role']}"
+            # Whole-step history covers refinement rounds; fall back to one call
+            samples = self._samples_for(f"workflow:{workflow_name}:{step_number}", call_key)
+            parts.append((call_key, samples))
+
+        return {"workflow": workflow_name, **self._simulate(parts)}
+
+    def estimate_consensus(self, agents: List[str]) -> Dict[str, Any]:
+        """Predicted duration and cost of create_consensus (ballots run one after another)"""
+        parts = [(f"{agent_id}/consensus", self._samples_for(f"{agent_id}/consensus")) for agent_id in agents]
+        return {"agents": agents, **self._simulate(parts)}
+
+
+_shared_estimators: Dict[Optional[str], RunEstimator] = {}
+_shared_lock = threading.Lock()
+
+
+def shared_estimator(config: Dict[str, Any]) -> RunEstimator:
+    """Process-wide estimator for the ``estimator`` config section, shared by all sessions"""
+    path = (config.get('estimator', {}) or {}).get('path')
+
+    with _shared_lock:
+        estimator = _shared_estimators.get(path)
+        if estimator is None:
+            estimator = RunEstimator.from_config(config)
+            _shared_estimators[path] = estimator
+        return estimator
@@ -1,40 +1,55 @@
 """Main orchestrator that coordinates multiple LLM agents"""
 
-import anthropic
-import yaml
 import json
 import os
-from pathlib import Path
-from typing import Dict, Any, List
-from dotenv import load_dotenv
+from typing import Dict, Any, List, Optional, Tuple
 
+from .cancellation import CancellationToken, OperationCancelled, cancellation_stats
 from .cli_runners import CLIRunner
+from .config import load_config
+from .scheduler import AgentScheduler
+from .state import StateBackend, to_jsonable
+from .tokens import DEFAULT_CONTEXT_WINDOW, raw_token_count, shorten, token_estimator
 from .tools import OrchestratorTools
 
-# Load environment variables
-load_dotenv()
+# anthropic and python-dotenv are imported on first use to keep startup fast
+# for worker processes and CLI one-shots that never reach the orchestrator.
 
 
 class MultiAgentOrchestrator:
     """Main orchestrator that coordinates multiple LLM agents"""
 
-    def __init__(self, config_path: str = "config.yaml"):
+    def __init__(
+        self,
+        config_path: str = "config.yaml",
+        scheduler: Optional[AgentScheduler] = None,
+        session_id: str = "default",
+        state_backend: Optional[StateBackend] = None
+    ):
         # Load config
-        config_file = Path(config_path)
-        if not config_file.exists():
-            raise FileNotFoundError(
-                f"Config file not found: {config_path}\n"
-                f"Copy config.example.yaml to config.yaml and customize it."
-            )
-
-        with open(config_file) as f:
-            self.config = yaml.safe_load(f)
+        self.config = load_config(config_path)
 
         # Initialize components
-        self.cli_runner = CLIRunner(self.config)
+        state_config = self.config.get('state', {}) or {}
+        if state_backend is not None and state_config.get('remote_agents'):
+            # Agent calls run on agent-worker nodes (see agent_worker.py)
+            from .workers import RemoteCLIRunner
+
+            self.cli_runner = RemoteCLIRunner(
+                self.config,
+                state_backend,
+                job_timeout=state_config.get('job_timeout', 600),
+                session_id=session_id
+            )
+        else:
+            self.cli_runner = CLIRunner(self.config, scheduler=scheduler, session_id=session_id)
         self.tools = OrchestratorTools(self.cli_runner, self.config)
 
         # Initialize Anthropic client for orchestrator
+        import anthropic
+        from dotenv import load_dotenv
+
+        load_dotenv()
         api_key = os.getenv('ANTHROPIC_API_KEY')
         if not api_key:
             raise ValueError(
@@ -67,20 +82,35 @@ Available tools:
 - call_agent: Delegate a task to a specific agent with a role
 - create_consensus: Get agreement from multiple agents
 - run_workflow: Execute predefined multi-step workflows
+- run_discussion: Let a team of agents debate a question over several rounds
+- search_past_work: Find earlier agent answers to similar questions
 
 Available workflows: {', '.join(available_workflows)}
 
 Guidelines:
-1. Break complex tasks into subtasks for different agents
-2. Use each agent's strengths (Claude for code, Gemini for review)
-3. Validate important decisions with consensus
-4. Iterate until quality standards are met
-5. Synthesize outputs into coherent final result
+1. Check search_past_work first and reuse or cite prior answers
+2. Break complex tasks into subtasks for different agents
+3. Use each agent's strengths (Claude for code, Gemini for review)
+4. Validate important decisions with consensus
+5. Iterate until quality standards are met
+6. Synthesize outputs into coherent final result
 
 When uncertain, ask clarifying questions before delegating."""
 
-    def chat(self, user_message: str) -> str:
-        """Main chat interface with orchestrator"""
+    def chat(
+        self,
+        user_message: str,
+        cancel_token: Optional[CancellationToken] = None,
+        priority: Optional[str] = None
+    ) -> str:
+        """Main chat interface with orchestrator.
+
+        Cancelling ``cancel_token`` kills running agent CLIs, discards the
+        partial turn from the conversation and raises OperationCancelled.
+        Agent calls of this turn are scheduled with ``priority``.
+        """
+
+        turn_start = len(self.messages)
 
         # Add user message
         self.messages.append({
@@ -88,20 +118,39 @@ When uncertain, ask clarifying questions before delegating."""
             "content": user_message
         })
 
-        # Agentic loop
+        try:
+            with self.cli_runner.call_priority(priority):
+                return self._run_turn(cancel_token or CancellationToken())
+        except OperationCancelled as e:
+            # Keep the conversation valid (no tool_use without tool_result)
+            del self.messages[turn_start:]
+            cancellation_stats.record_turn()
+            print(f"[Orchestrator] Turn cancelled: {e}")
+            raise
+
+    def _run_turn(self, cancel_token: CancellationToken) -> str:
+        """Agentic loop for one user message"""
+
         max_iterations = self.config['orchestrator']['max_iterations']
 
         for iteration in range(max_iterations):
+            cancel_token.raise_if_cancelled()
             print(f"[Orchestrator] Iteration {iteration + 1}/{max_iterations}")
 
             # Call Claude (orchestrator)
+            tools = self.tools.get_tool_definitions()
+            messages, sent = self._fit_messages(tools)
             response = self.client.messages.create(
                 model=self.config['orchestrator']['model'],
                 max_tokens=4096,
                 system=self.system_prompt,
-                tools=self.tools.get_tool_definitions(),
-                messages=self.messages
+                tools=tools,
+                messages=messages
             )
+            cancel_token.raise_if_cancelled()
+            if getattr(response, 'usage', None) is not None:
+                counts = token_estimator.record("orchestrator", sent, response.usage.input_tokens)
+                print(f"[Tokens] Orchestrator input: ~{counts['estimated']} estimated, {counts['actual']} actual")
 
             # Add assistant response
             self.messages.append({
@@ -126,7 +175,8 @@ When uncertain, ask clarifying questions before delegating."""
                         try:
                             result = self.tools.execute_tool(
                                 block.name,
-                                block.input
+                                block.input,
+                                cancel_token=cancel_token
                             )
 
                             tool_results.append({
@@ -137,6 +187,8 @@ When uncertain, ask clarifying questions before delegating."""
 
                             print(f"[Orchestrator] Result: Success")
 
+                        except OperationCancelled:
+                            raise
                         except Exception as e:
                             print(f"[Orchestrator] Result: Error - {str(e)}")
                             tool_results.append({
@@ -154,6 +206,38 @@ When uncertain, ask clarifying questions before delegating."""
 
         return "Max iterations reached without final answer."
 
+    def _fit_messages(self, tools: List[Dict[str, Any]]) -> Tuple[List[Any], str]:
+        """Messages to send, with the oldest tool results shortened until the request fits the model window.
+
+        self.messages keeps the full results. Also returns the request text
+        the estimate was based on (for calibration).
+        """
+        window = self.config['orchestrator'].get('context_window', DEFAULT_CONTEXT_WINDOW)
+        budget = window - 4096
+        slope, overhead = token_estimator.calibration("orchestrator")
+        fixed = self.system_prompt + json.dumps(tools)
+        plain = [to_jsonable(message) for message in self.messages]
+
+        # Measure every message once, then adjust the total by each shortened block's delta
+        raw = raw_token_count(fixed) + sum(raw_token_count(json.dumps(m)) for m in plain)
+        messages = list(self.messages)
+        if slope * raw + overhead > budget:
+            # Tool results are the bulkiest and least important context once answered
+            for i, message in enumerate(plain[:-1]):
+                if not isinstance(message['content'], list):
+                    continue
+                for block in message['content']:
+                    if isinstance(block, dict) and block.get('type') == 'tool_result':
+                        short = shorten(str(block['content']), 2000)
+                        raw += raw_token_count(json.dumps(short)) - raw_token_count(json.dumps(block['content']))
+                        block['content'] = short
+                        messages[i] = message  # the shortened copy
+                if slope * raw + overhead <= budget:
+                    print("[Tokens] Shortened old tool results to fit the orchestrator window")
+                    break
+
+        return messages, fixed + json.dumps(plain)
+
     def _extract_text(self, content: List[Any]) -> str:
         """Extract text from response content"""
         texts = []
@@ -166,9 +250,23 @@ When uncertain, ask clarifying questions before delegating."""
         """Reset conversation state"""
         self.messages = []
         self.tools.conversation_history = []
-        self.cli_runner.sessions = {}
+        self.cli_runner.clear_sessions()
         print("[Orchestrator] Conversation reset.")
 
     def get_history(self) -> List[Dict[str, str]]:
         """Get conversation history"""
         return self.tools.conversation_history
+
+    def export_state(self) -> Dict[str, Any]:
+        """JSON-serializable session state for a shared state backend"""
+        return {
+            "messages": to_jsonable(self.messages),
+            "history": self.tools.conversation_history,
+            "cli_sessions": dict(self.cli_runner.sessions),
+        }
+
+    def import_state(self, state: Dict[str, Any]):
+        """Restore session state saved by export_state (possibly on another node)"""
+        self.messages = state.get("messages", [])
+        self.tools.conversation_history = state.get("history", [])
+        self.cli_runner.sessions = dict(state.get("cli_sessions", {}))
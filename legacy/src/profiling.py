@@ -0,0 +1,259 @@
+"""Per-turn sampling profiler with allocation snapshots and flame-graph output"""
+
+import os
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+# Frames that mean "waiting on something outside this process"
+AGENT_WAIT_FRAMES = (
+    ("subprocess.py", "communicate"),
+    ("subprocess.py", "wait"),
+    ("subprocess.py", "_communicate"),
+    ("http/client.py", "getresponse"),
+    ("socket.py", "readinto"),
+    ("ssl.py", "read"),
+    ("ssl.py", "recv_into"),
+    ("httpcore/_backends/sync.py", "read"),  # orchestrator API calls (anthropic SDK)
+    ("cli_runners.py", "_monitor"),          # CLI calls on POSIX (waits on reaper events)
+    ("state.py", "wait_job"),                # calls run by remote agent workers
+)
+# Frames that mean "waiting on another thread of ours" (scheduler slot, pool results)
+IDLE_FRAMES = (
+    ("threading.py", "wait"),
+    ("concurrent/futures/_base.py", "as_completed"),
+    ("concurrent/futures/_base.py", "wait"),
+    ("queue.py", "get"),
+)
+
+
+# tracemalloc and its peak are process-wide, so only one turn is profiled at a time
+_active = threading.Lock()
+
+# Profiler of the turn the current context belongs to (carried into pool tasks)
+_current_profiler: ContextVar[Optional["TurnProfiler"]] = ContextVar("current_profiler", default=None)
+
+
+class ProfilerBusy(RuntimeError):
+    """Another turn is already being profiled"""
+
+
+def run_in_turn(func, *args, **kwargs):
+    """Call ``func`` in this thread, sampled as part of the caller's profiled turn (if any).
+
+    Tool pools run their tasks through this (in a copy of the submitting
+    context), so the profiler samples exactly the threads working for it.
+    """
+    profiler = _current_profiler.get()
+    if profiler is None:
+        return func(*args, **kwargs)
+    ident = threading.get_ident()
+    profiler._enter_thread(ident)
+    try:
+        return func(*args, **kwargs)
+    finally:
+        profiler._leave_thread(ident)
+
+
+def _matches(filename: str, function: str, patterns: Tuple[Tuple[str, str], ...]) -> bool:
+    filename = filename.replace(os.sep, "/")
+    return any(filename.endswith(suffix) and function == name for suffix, name in patterns)
+
+
+def classify(stack: List[Tuple[str, str]]) -> str:
+    """Category of a sampled stack (innermost frame last)"""
+    for depth in range(len(stack) - 1, -1, -1):
+        filename, function = stack[depth]
+        if _matches(filename, function, AGENT_WAIT_FRAMES):
+            return "agent_wait"
+        if _matches(filename, function, IDLE_FRAMES):
+            # Thread waits inside an agent wait (the CLI monitor, a remote job) are agent waits
+            callers = stack[:depth]
+            if any(_matches(f, name, AGENT_WAIT_FRAMES) for f, name in callers):
+                return "agent_wait"
+            return "idle"
+    return "python"
+
+
+class TurnProfiler:
+    """Profile one chat turn.
+
+    A background thread samples the stacks of the calling thread and of
+    pool threads while they run tasks of this turn (see run_in_turn) every
+    ``interval`` seconds; tracemalloc records allocations. On exit the
+    collapsed stacks are written to ``<output_dir>/<name>.collapsed``
+    (flamegraph.pl / speedscope format) and ``summary`` is filled in.
+
+    Only one turn can be profiled at a time; entering a second profiler
+    raises ProfilerBusy.
+    """
+
+    def __init__(
+        self,
+        name: str = "turn",
+        output_dir: Optional[str] = "data/profiles",
+        interval: float = 0.005,
+        trace_frames: int = 10
+    ):
+        self.name = re.sub(r"[^\w.-]", "_", name)  # also the file name
+        self.output_dir = output_dir
+        self.interval = interval
+        self.trace_frames = trace_frames
+        self.stacks: Counter = Counter()      # (thread, *frames) -> seconds
+        self.categories: Counter = Counter()  # category -> seconds
+        self.summary: Dict[str, Any] = {}
+        self.samples = 0
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self._threads: Counter = Counter()  # ident -> tasks of this turn running on it
+        self._threads_lock = threading.Lock()
+
+    def _enter_thread(self, ident: int):
+        with self._threads_lock:
+            self._threads[ident] += 1
+
+    def _leave_thread(self, ident: int):
+        with self._threads_lock:
+            self._threads[ident] -= 1
+            if not self._threads[ident]:
+                del self._threads[ident]
+
+    def __enter__(self) -> "TurnProfiler":
+        if not _active.acquire(blocking=False):
+            raise ProfilerBusy("Another turn is being profiled")
+        self._owner = threading.get_ident()
+        self._context_token = _current_profiler.set(self)
+        # With tracing started elsewhere the peak is not ours to reset (or report)
+        self._started_tracing = not tracemalloc.is_tracing()
+        if self._started_tracing:
+            tracemalloc.start(self.trace_frames)
+        self._baseline = tracemalloc.take_snapshot()
+        self._started = time.monotonic()
+
+        self._sampler = threading.Thread(target=self._sample_loop, name="profiler", daemon=True)
+        self._sampler.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._sampler.join()
+        wall = time.monotonic() - self._started
+
+        snapshot = tracemalloc.take_snapshot()
+        peak = None
+        if self._started_tracing:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        _current_profiler.reset(self._context_token)
+        _active.release()
+
+        self.summary = self._summarize(wall, peak, snapshot)
+        if self.output_dir:
+            self.summary["flamegraph"] = self._write_collapsed()
+        return False
+
+    def _sample_loop(self):
+        last = time.monotonic()
+        while not self._stop.wait(self.interval):
+            # Weight by the real tick length, which drifts above the interval under load
+            now = time.monotonic()
+            tick, last = now - last, now
+            with self._threads_lock:
+                turn_threads = set(self._threads)
+            threads = {t.ident: t for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident != self._owner and ident not in turn_threads:
+                    continue
+                thread = threads.get(ident)
+                stack = []
+                while frame is not None:
+                    stack.append((frame.f_code.co_filename, frame.f_code.co_name))
+                    frame = frame.f_back
+                stack.reverse()
+
+                name = "main" if ident == self._owner else (thread.name if thread else str(ident))
+                self.samples += 1
+                self.stacks[(name,) + tuple(stack)] += tick
+                self.categories[classify(stack)] += tick
+
+    def _summarize(self, wall: float, peak: Optional[int], snapshot: tracemalloc.Snapshot) -> Dict[str, Any]:
+        # Self time of Python code that was actually running (not waiting)
+        self_time: Counter = Counter()
+        for key, seconds in self.stacks.items():
+            stack = list(key[1:])
+            if stack and classify(stack) == "python":
+                filename, function = stack[-1]
+                self_time[f"{_short(filename)}:{function}"] += seconds
+
+        allocations = []
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+        for stat in snapshot.filter_traces(filters).compare_to(
+                self._baseline.filter_traces(filters), "lineno")[:10]:
+            if stat.size_diff <= 0:
+                continue
+            frame = stat.traceback[0]
+            allocations.append({
+                "location": f"{_short(frame.filename)}:{frame.lineno}",
+                "kib": round(stat.size_diff / 1024, 1),
+            })
+
+        return {
+            "name": self.name,
+            "wall_seconds": round(wall, 3),
+            "samples": self.samples,
+            # Per thread, so with parallel agents the total can exceed wall time
+            "seconds": {
+                category: round(seconds, 3)
+                for category, seconds in self.categories.most_common()
+            },
+            "top_python": [
+                {"function": function, "seconds": round(seconds, 3)}
+                for function, seconds in self_time.most_common(10)
+            ],
+            "peak_memory_kib": round(peak / 1024, 1) if peak is not None else None,
+            "top_allocations": allocations,
+        }
+
+    def _write_collapsed(self) -> str:
+        path = Path(self.output_dir) / f"{self.name}.collapsed"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            # Weights are milliseconds
+            for key, seconds in self.stacks.most_common():
+                weight = round(seconds * 1000)
+                if weight:
+                    frames = [key[0]] + [f"{_short(filename)}:{function}" for filename, function in key[1:]]
+                    f.write(f"{';'.join(frame.replace(';', ',') for frame in frames)} {weight}\n")
+        return str(path)
+
+
+def _short(filename: str) -> str:
+    """Path relative to the working directory or the last two components"""
+    try:
+        return str(Path(filename).relative_to(Path.cwd()))
+    except ValueError:
+        return "/".join(Path(filename).parts[-2:])
+
+
+def format_summary(summary: Dict[str, Any]) -> str:
+    """Short human-readable report of a TurnProfiler summary"""
+    seconds = summary["seconds"]
+    lines = [
+        f"[Profile] {summary['name']}: {summary['wall_seconds']}s wall, "
+        f"{seconds.get('python', 0)}s Python, {seconds.get('agent_wait', 0)}s waiting on agents, "
+        f"{seconds.get('idle', 0)}s idle in threads"
+        + (f"; peak {summary['peak_memory_kib']} KiB" if summary['peak_memory_kib'] is not None else "")
+    ]
+    for entry in summary["top_python"][:5]:
+        lines.append(f"[Profile]   cpu  {entry['seconds']:>7}s  {entry['function']}")
+    for entry in summary["top_allocations"][:5]:
+        lines.append(f"[Profile]   mem  {entry['kib']:>7} KiB  {entry['location']}")
+    if summary.get("flamegraph"):
+        lines.append(f"[Profile] Flame graph stacks: {summary['flamegraph']}")
+    return "\n".join(lines)
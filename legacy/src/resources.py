@@ -0,0 +1,85 @@
+"""Per-agent resource profiles for spawned CLI processes (POSIX)"""
+
+import os
+from typing import Any, Dict, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PROFILE_KEYS = (
+    "memory_mb",           # RSS of the whole process group; killed above this
+    "address_space_mb",    # RLIMIT_AS per process (too low breaks Node.js CLIs)
+    "cpu_seconds",         # RLIMIT_CPU per process
+    "max_open_files",      # RLIMIT_NOFILE
+    "nice",                # scheduling priority, inherited by children
+    "cpu_affinity",        # list of CPU indices
+    "max_wall_seconds",    # caps the call timeout
+    "max_output_kb",       # stdout + stderr; killed above this
+)
+
+
+def resource_profile(config: Dict[str, Any], agent_id: str) -> Dict[str, Any]:
+    """Resolved profile for an agent.
+
+    ``agents.<id>.resources`` is either a mapping or the name of an entry in
+    ``resource_profiles``; agents without one use ``resource_profiles.default``.
+    """
+    profiles = config.get('resource_profiles', {}) or {}
+    selected = (config['agents'].get(agent_id) or {}).get('resources', 'default')
+    if isinstance(selected, str):
+        if selected != 'default' and selected not in profiles:
+            raise ValueError(f"Agent '{agent_id}' uses unknown resource profile '{selected}'")
+        selected = profiles.get(selected, {})
+
+    unknown = set(selected) - set(PROFILE_KEYS)
+    if unknown:
+        raise ValueError(f"Unknown resource limit(s) for '{agent_id}': {', '.join(sorted(unknown))}")
+    return dict(selected)
+
+
+def apply_limits(pid: int, profile: Dict[str, Any]):
+    """Apply rlimits, niceness and CPU affinity to a freshly spawned child.
+
+    Done right after spawn with prlimit/setpriority instead of preexec_fn,
+    which is unsafe in a threaded server. The CLI has only just been exec'd
+    at this point; processes it starts later inherit the settings.
+    """
+    if resource is None or not profile:
+        return
+
+    limits = {
+        'address_space_mb': (getattr(resource, 'RLIMIT_AS', None), 1024 * 1024),
+        'cpu_seconds': (resource.RLIMIT_CPU, 1),
+        'max_open_files': (resource.RLIMIT_NOFILE, 1),
+    }
+    for key, (limit, scale) in limits.items():
+        if profile.get(key) is not None and limit is not None and hasattr(resource, 'prlimit'):
+            value = int(profile[key] * scale)
+            resource.prlimit(pid, limit, (value, value))
+
+    if profile.get('nice') is not None:
+        os.setpriority(os.PRIO_PROCESS, pid, int(profile['nice']))
+    if profile.get('cpu_affinity') and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(pid, set(profile['cpu_affinity']))
+
+
+def group_rss_kib(pgid: int) -> Optional[int]:
+    """Total resident memory of a process group (Linux /proc), None if unavailable"""
+    if not os.path.isdir('/proc'):
+        return None
+    page_kib = os.sysconf('SC_PAGE_SIZE') // 1024
+    total = 0
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat', 'rb') as f:
+                # Fields after the parenthesised command name; pgrp is 3rd, rss 22nd
+                fields = f.read().rsplit(b')', 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[2]) == pgid:
+            total += int(fields[21]) * page_kib
+    return total
@@ -0,0 +1,231 @@
+"""Local BM25 index over past agent tasks and responses"""
+
+import heapq
+import json
+import math
+import re
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+# Common English and German filler words (agents answer in both)
+STOPWORDS = frozenset("""
+a an and are as at be but by for from has have how i in is it its of on or
+that the this to was we what when which with you your
+aber als auch auf aus bei das dass dem den der des die ein eine einen einer
+es für hat ich ist im in mit nicht noch oder sich sie sind so und von wie wir
+zu zum zur
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without stopwords and single characters"""
+    return [
+        word for word in _WORD.findall(text.lower())
+        if len(word) > 1 and word not in STOPWORDS
+    ]
+
+
+class BM25Index:
+    """Incrementally updated inverted index with BM25 ranking.
+
+    When ``path`` is given, each added document is also appended to a JSONL
+    file and replayed on startup. Beyond ``max_entries`` the oldest documents
+    are evicted (and the file is compacted), and text fields are truncated to
+    ``max_chars``. Documents added with an ``owner`` are only found by
+    searches for that owner. Queries only touch the postings of the query
+    terms, so latency stays in the millisecond range for tens of thousands
+    of entries.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        k1: float = 1.5,
+        b: float = 0.75,
+        max_entries: int = 10000,
+        max_chars: int = 4000
+    ):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.max_entries = max_entries
+        self.max_chars = max_chars
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._docs: Dict[int, Dict[str, Any]] = {}  # doc_id -> entry, oldest first
+        self._next_id = 0
+        self._total_length = 0
+        self._file_lines = 0
+        self._keys = set()
+        self._lock = threading.Lock()
+
+        if path and Path(path).exists():
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._add_locked(entry['text'], entry['metadata'], entry.get('key'), entry.get('owner'))
+                        self._file_lines += 1
+            if self._file_lines > len(self._docs):
+                self._compact_locked()
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def add(
+        self,
+        text: str,
+        metadata: Dict[str, Any],
+        key: Optional[str] = None,
+        owner: Optional[str] = None
+    ) -> Optional[int]:
+        """Index ``text``; documents with an already indexed ``key`` are skipped"""
+        text = text[:self.max_chars]
+        metadata = {
+            name: value[:self.max_chars] if isinstance(value, str) else value
+            for name, value in metadata.items()
+        }
+        with self._lock:
+            if key is not None and key in self._keys:
+                return None
+            doc_id = self._add_locked(text, metadata, key, owner)
+            if self.path:
+                if self._file_lines >= 2 * self.max_entries:
+                    self._compact_locked()
+                else:
+                    Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+                    with open(self.path, "a", encoding="utf-8") as f:
+                        f.write(json.dumps(self._docs[doc_id]) + "\n")
+                    self._file_lines += 1
+            return doc_id
+
+    def _add_locked(self, text: str, metadata: Dict[str, Any], key: Optional[str], owner: Optional[str]) -> int:
+        doc_id = self._next_id
+        self._next_id += 1
+        terms = Counter(tokenize(text))
+        for term, count in terms.items():
+            self._postings.setdefault(term, {})[doc_id] = count
+
+        length = sum(terms.values())
+        self._total_length += length
+        self._docs[doc_id] = {
+            'text': text, 'metadata': metadata, 'key': key, 'owner': owner, 'length': length,
+        }
+        if key is not None:
+            self._keys.add(key)
+
+        while len(self._docs) > self.max_entries:
+            self._evict_oldest_locked()
+        return doc_id
+
+    def _evict_oldest_locked(self):
+        doc_id = next(iter(self._docs))
+        doc = self._docs.pop(doc_id)
+        for term in set(tokenize(doc['text'])):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[term]
+        self._total_length -= doc['length']
+        self._keys.discard(doc['key'])
+
+    def _compact_locked(self):
+        """Rewrite the JSONL file with the documents still in the index"""
+        path = Path(self.path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp = path.with_suffix(path.suffix + ".tmp")
+        with open(temp, "w", encoding="utf-8") as f:
+            for doc in self._docs.values():
+                f.write(json.dumps(doc) + "\n")
+        temp.replace(path)
+        self._file_lines = len(self._docs)
+
+    def search(self, query: str, limit: int = 5, owner: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Return the best matching documents as ``{score, **metadata}``.
+
+        Only documents without an owner or owned by ``owner`` are returned.
+        """
+        with self._lock:
+            count = len(self._docs)
+            if count == 0:
+                return []
+            avg_length = self._total_length / count
+
+            scores: Dict[int, float] = {}
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                df = len(postings)
+                idf = math.log(1 + (count - df + 0.5) / (df + 0.5))
+                for doc_id, tf in postings.items():
+                    doc = self._docs[doc_id]
+                    if doc['owner'] is not None and doc['owner'] != owner:
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * doc['length'] / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+            best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+            return [
+                {'score': round(score, 3), **self._docs[doc_id]['metadata']}
+                for doc_id, score in best
+            ]
+
+    def count(self, owner: Optional[str] = None) -> int:
+        """Documents visible to ``owner``"""
+        with self._lock:
+            return sum(1 for doc in self._docs.values() if doc['owner'] is None or doc['owner'] == owner)
+
+    def add_jobs_file(self, jobs_file: str) -> int:
+        """Index completed discussion jobs from data/jobs.json; returns how many were new"""
+        jobs_path = Path(jobs_file)
+        if not jobs_path.exists():
+            return 0
+
+        with open(jobs_path, encoding="utf-8") as f:
+            jobs = json.load(f).get('jobs', [])
+
+        added = 0
+        for job in jobs:
+            if job.get('status') != 'complete' or not job.get('result'):
+                continue
+            metadata = {
+                'source': 'job',
+                'job_id': job.get('id'),
+                'task': job.get('topic', ''),
+                'response': job['result'],
+            }
+            if self.add(f"{job.get('topic', '')}\n{job['result']}", metadata, key=f"job:{job.get('id')}") is not None:
+                added += 1
+        return added
+
+
+_shared_indexes: Dict[Optional[str], BM25Index] = {}
+_shared_lock = threading.Lock()
+
+
+def shared_index(config: Dict[str, Any]) -> BM25Index:
+    """Process-wide index for the ``retrieval`` config section.
+
+    Shared by all sessions; agent work is added with the session as owner,
+    so each session only finds its own entries plus the shared jobs.
+    """
+    section = config.get('retrieval', {}) or {}
+    path = section.get('path')
+
+    with _shared_lock:
+        index = _shared_indexes.get(path)
+        if index is None:
+            index = BM25Index(
+                path=path,
+                max_entries=section.get('max_entries', 10000),
+                max_chars=section.get('max_chars', 4000)
+            )
+            if section.get('jobs_file'):
+                index.add_jobs_file(section['jobs_file'])
+            _shared_indexes[path] = index
+        return index
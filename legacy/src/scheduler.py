@@ -0,0 +1,296 @@
+"""Global fair scheduler and admission control for agent CLI calls"""
+
+import itertools
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+from .cancellation import CancellationToken, OperationCancelled, noop
+
+
+# Lower rank is dispatched first
+PRIORITY_CLASSES = {
+    "interactive": 0,
+    "normal": 1,
+    "batch": 2,
+}
+
+
+class SchedulerBusy(RuntimeError):
+    """Raised when a request is refused because the queue is too long"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@dataclass
+class _Ticket:
+    """A queued request for one CLI slot"""
+    agent_id: str
+    session_id: str
+    rank: int
+    start: float
+    tag: float
+    seq: int
+    granted: bool = False
+
+
+@dataclass
+class SchedulerStats:
+    """Counters exposed via /stats"""
+    dispatched: int = 0
+    rejected: int = 0
+    total_wait: float = 0.0
+
+
+class AgentScheduler:
+    """Caps concurrent CLI processes globally and per agent.
+
+    Waiting calls are ordered by priority class first and then by a
+    start-time fair queuing tag per session, so one busy session cannot
+    starve the others. Each session advances its own virtual clock by
+    ``1 / weight`` per call.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = 4,
+        per_agent: Optional[Dict[str, int]] = None,
+        session_weights: Optional[Dict[str, float]] = None,
+        max_queue_wait: float = 60.0,
+        expected_call_seconds: float = 30.0
+    ):
+        self.max_concurrent = max(1, max_concurrent)
+        self.per_agent = per_agent or {}
+        self.session_weights = session_weights or {}
+        self.max_queue_wait = max_queue_wait
+        self.avg_call_seconds = expected_call_seconds
+
+        self._cond = threading.Condition()
+        self._waiting: List[_Ticket] = []
+        self._running = 0
+        self._running_per_agent: Dict[str, int] = {}
+        self._virtual_time = 0.0
+        self._session_finish: Dict[str, float] = {}
+        self._seq = itertools.count()
+        self.stats = SchedulerStats()
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "AgentScheduler":
+        """Build a scheduler from the ``scheduler`` section of config.yaml"""
+        section = config.get('scheduler', {}) or {}
+        return cls(
+            max_concurrent=section.get('max_concurrent', 4),
+            per_agent=section.get('per_agent', {}),
+            session_weights=section.get('session_weights', {}),
+            max_queue_wait=section.get('max_queue_wait', 60.0),
+            expected_call_seconds=section.get('expected_call_seconds', 30.0)
+        )
+
+    def estimate_wait(self) -> float:
+        """Estimate seconds a new request would wait before getting a slot"""
+        with self._cond:
+            return self._estimate_wait_locked()
+
+    def _estimate_wait_locked(self) -> float:
+        backlog = len(self._waiting) + self._running - self.max_concurrent + 1
+        if backlog <= 0:
+            return 0.0
+        return backlog / self.max_concurrent * self.avg_call_seconds
+
+    def admit(self):
+        """Front-door check; raises SchedulerBusy if the queue is too long"""
+        with self._cond:
+            estimate = self._estimate_wait_locked()
+            if estimate > self.max_queue_wait:
+                self.stats.rejected += 1
+                raise SchedulerBusy(
+                    f"Agent queue is full (estimated wait {estimate:.0f}s)",
+                    retry_after=estimate
+                )
+
+    @contextmanager
+    def slot(
+        self,
+        agent_id: str,
+        session_id: str = "default",
+        priority: str = "normal",
+        timeout: Optional[float] = None,
+        cancel_token: Optional[CancellationToken] = None
+    ) -> Iterator[None]:
+        """Hold one CLI slot for ``agent_id`` for the duration of the block"""
+        self._acquire(agent_id, session_id, priority, timeout, cancel_token)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(agent_id, time.monotonic() - started)
+
+    def _acquire(
+        self,
+        agent_id: str,
+        session_id: str,
+        priority: str,
+        timeout: Optional[float],
+        cancel_token: Optional[CancellationToken] = None
+    ):
+        if priority not in PRIORITY_CLASSES:
+            raise ValueError(f"Unknown priority class: {priority}")
+
+        unregister = noop
+        if cancel_token is not None:
+            unregister = cancel_token.on_cancel(self._wake_all)
+        try:
+            self._wait_for_slot(agent_id, session_id, priority, timeout, cancel_token)
+        finally:
+            unregister()
+
+    def _wake_all(self):
+        with self._cond:
+            self._cond.notify_all()
+
+    def _wait_for_slot(
+        self,
+        agent_id: str,
+        session_id: str,
+        priority: str,
+        timeout: Optional[float],
+        cancel_token: Optional[CancellationToken]
+    ):
+
+        enqueued = time.monotonic()
+        deadline = enqueued + timeout if timeout is not None else None
+
+        with self._cond:
+            weight = self.session_weights.get(session_id, 1.0)
+            start = max(self._virtual_time, self._session_finish.get(session_id, 0.0))
+            tag = start + 1.0 / weight
+            self._session_finish[session_id] = tag
+
+            ticket = _Ticket(
+                agent_id=agent_id,
+                session_id=session_id,
+                rank=PRIORITY_CLASSES[priority],
+                start=start,
+                tag=tag,
+                seq=next(self._seq)
+            )
+            self._waiting.append(ticket)
+            self._dispatch_locked()
+
+            while not ticket.granted:
+                if cancel_token is not None and cancel_token.cancelled:
+                    self._waiting.remove(ticket)
+                    raise OperationCancelled(cancel_token.reason or "cancelled")
+
+                remaining = None
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._waiting.remove(ticket)
+                        self.stats.rejected += 1
+                        raise SchedulerBusy(
+                            f"Timed out waiting for a slot for {agent_id}",
+                            retry_after=self._estimate_wait_locked()
+                        )
+                self._cond.wait(remaining)
+
+            self.stats.dispatched += 1
+            self.stats.total_wait += time.monotonic() - enqueued
+
+    def _release(self, agent_id: str, elapsed: float):
+        with self._cond:
+            self._running -= 1
+            self._running_per_agent[agent_id] -= 1
+            # Exponential moving average of call duration for wait estimates
+            self.avg_call_seconds = 0.8 * self.avg_call_seconds + 0.2 * elapsed
+            self._dispatch_locked()
+            # Sessions whose clock fell behind the global one carry no state
+            self._session_finish = {
+                session: finish for session, finish in self._session_finish.items()
+                if finish > self._virtual_time
+            }
+
+    def _dispatch_locked(self):
+        """Grant slots to the best waiting tickets that fit the caps"""
+        granted_any = False
+        for ticket in sorted(self._waiting, key=lambda t: (t.rank, t.tag, t.seq)):
+            if self._running >= self.max_concurrent:
+                break
+            agent_cap = self.per_agent.get(ticket.agent_id)
+            agent_running = self._running_per_agent.get(ticket.agent_id, 0)
+            if agent_cap is not None and agent_running >= agent_cap:
+                continue
+
+            self._waiting.remove(ticket)
+            ticket.granted = True
+            self._running += 1
+            self._running_per_agent[ticket.agent_id] = agent_running + 1
+            self._virtual_time = max(self._virtual_time, ticket.start)
+            granted_any = True
+
+        if granted_any:
+            self._cond.notify_all()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Snapshot of queue depth, running calls and counters"""
+        with self._cond:
+            dispatched = self.stats.dispatched
+            return {
+                "running": self._running,
+                "queued": len(self._waiting),
+                "running_per_agent": dict(self._running_per_agent),
+                "max_concurrent": self.max_concurrent,
+                "dispatched": dispatched,
+                "rejected": self.stats.rejected,
+                "avg_wait_seconds": self.stats.total_wait / dispatched if dispatched else 0.0,
+                "estimated_wait_seconds": self._estimate_wait_locked(),
+            }
+
+
+class RateLimiter:
+    """Sliding-window request limiter (``security.rateLimit`` in config.yaml)"""
+
+    def __init__(self, max_requests: int, window_seconds: float):
+        self.max_requests = max_requests
+        self.window_seconds = window_seconds
+        self._hits: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> Optional["RateLimiter"]:
+        """Build a limiter if security.rateLimit is configured and enabled"""
+        security = config.get('security', {}) or {}
+        rate_limit = security.get('rateLimit')
+        if not security.get('enabled', True) or not rate_limit:
+            return None
+        return cls(
+            max_requests=rate_limit.get('maxRequests', 100),
+            window_seconds=rate_limit.get('windowSeconds', 60)
+        )
+
+    def check(self, key: str = "global"):
+        """Record a request for ``key``; raises SchedulerBusy over the limit"""
+        now = time.monotonic()
+        with self._lock:
+            hits = self._hits.setdefault(key, deque())
+            while hits and hits[0] <= now - self.window_seconds:
+                hits.popleft()
+            if len(hits) >= self.max_requests:
+                retry_after = hits[0] + self.window_seconds - now
+                raise SchedulerBusy(
+                    f"Rate limit exceeded ({self.max_requests} requests "
+                    f"per {self.window_seconds}s)",
+                    retry_after=retry_after
+                )
+            hits.append(now)
+
+
+def retry_after_header(error: SchedulerBusy) -> Dict[str, str]:
+    """Retry-After header value (whole seconds, at least 1)"""
+    return {"Retry-After": str(max(1, math.ceil(error.retry_after)))}
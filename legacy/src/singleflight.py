@@ -0,0 +1,110 @@
+"""Single-flight coalescing of identical concurrent agent calls"""
+
+import hashlib
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .cancellation import CancellationToken, OperationCancelled
+
+
+def request_key(
+    agent_id: str,
+    model: Optional[str],
+    system_prompt: Optional[str],
+    prompt: str,
+    session: Optional[str] = None
+) -> str:
+    """Hash of the normalized request (whitespace differences do not matter).
+
+    ``session`` identifies the conversation the call continues; calls that
+    start a fresh one leave it out.
+    """
+    parts = [
+        agent_id, model or "", session or "",
+        " ".join((system_prompt or "").split()), " ".join(prompt.split())
+    ]
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """Concurrent calls with the same key share one execution.
+
+    The first caller (leader) runs the function; callers arriving while it
+    runs wait for its result. If the leader is cancelled, waiting followers
+    retry and one of them becomes the new leader; other errors are shared.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: Dict[str, _Flight] = {}
+        self.executions = 0
+        self.coalesced_calls = 0
+        self.saved_seconds = 0.0
+
+    def do(
+        self,
+        key: str,
+        func: Callable[[], Any],
+        cancel_token: Optional[CancellationToken] = None
+    ) -> Tuple[Any, bool]:
+        """Run ``func`` or join an identical call in flight; returns (value, coalesced)"""
+        while True:
+            with self._lock:
+                flight = self._flights.get(key)
+                leader = flight is None
+                if leader:
+                    flight = self._flights[key] = _Flight()
+                    self.executions += 1
+                else:
+                    flight.followers += 1
+
+            if leader:
+                return self._lead(key, flight, func), False
+
+            # Follow, but stay responsive to our own cancellation
+            while not flight.done.wait(0.1):
+                if cancel_token is not None:
+                    cancel_token.raise_if_cancelled()
+            if isinstance(flight.error, OperationCancelled):
+                continue  # the leader's caller gave up, not us
+            if flight.error is not None:
+                raise flight.error
+            return flight.value, True
+
+    def _lead(self, key: str, flight: _Flight, func: Callable[[], Any]) -> Any:
+        started = time.monotonic()
+        try:
+            flight.value = func()
+            return flight.value
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+                if flight.error is None:
+                    self.coalesced_calls += flight.followers
+                    self.saved_seconds += flight.followers * (time.monotonic() - started)
+            flight.done.set()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "executions": self.executions,
+                "coalesced_calls": self.coalesced_calls,
+                "in_flight": len(self._flights),
+                "saved_call_seconds": round(self.saved_seconds, 1),
+            }
+
+
+# Shared by every session in the process so duplicates across sessions coalesce
+single_flight = SingleFlight()
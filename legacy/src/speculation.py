@@ -0,0 +1,37 @@
+"""Statistics for speculative execution of workflow steps"""
+
+import threading
+from typing import Any, Dict
+
+
+class SpeculationStats:
+    """Per-workflow hit rate and time saved by speculatively started steps"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._workflows: Dict[str, Dict[str, float]] = {}
+
+    def record(self, workflow: str, hit: bool, saved_seconds: float = 0.0):
+        with self._lock:
+            counts = self._workflows.setdefault(workflow, {"hits": 0, "misses": 0, "saved_seconds": 0.0})
+            counts["hits" if hit else "misses"] += 1
+            counts["saved_seconds"] += saved_seconds
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {workflow: summarize(counts) for workflow, counts in self._workflows.items()}
+
+
+def summarize(counts: Dict[str, float]) -> Dict[str, Any]:
+    """Hits, misses, hit rate and saved seconds of a counts dict"""
+    attempts = counts["hits"] + counts["misses"]
+    return {
+        "hits": int(counts["hits"]),
+        "misses": int(counts["misses"]),
+        "hit_rate": round(counts["hits"] / attempts, 2) if attempts else None,
+        "saved_seconds": round(counts["saved_seconds"], 1),
+    }
+
+
+# Shared by every session in the process
+speculation_stats = SpeculationStats()
@@ -0,0 +1,429 @@
+"""Shared state backends for running the orchestrator across several processes or machines"""
+
+import importlib
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .cancellation import CancellationToken, OperationCancelled
+
+
+class JobFailed(RuntimeError):
+    """Raised when a queued agent job finished with an error"""
+
+
+class StateBackend(ABC):
+    """Key/value store for session state plus a simple job queue and leases.
+
+    Implementations must be safe to use from several threads. Backends with
+    ``shared = True`` are visible to other processes, so API workers can be
+    stateless and load a session on every request. Jobs are deleted by the
+    node that enqueued them once it has the result or gives up.
+    """
+
+    shared = False
+
+    # Key/value ------------------------------------------------------------
+
+    @abstractmethod
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        ...
+
+    @abstractmethod
+    def put(self, namespace: str, key: str, value: Any):
+        ...
+
+    @abstractmethod
+    def delete(self, namespace: str, key: str):
+        ...
+
+    @abstractmethod
+    def keys(self, namespace: str) -> List[str]:
+        ...
+
+    # Job queue ------------------------------------------------------------
+
+    @abstractmethod
+    def enqueue_job(self, queue: str, payload: Dict[str, Any]) -> str:
+        ...
+
+    @abstractmethod
+    def claim_job(self, queues: List[str], worker_id: str) -> Optional[Dict[str, Any]]:
+        """Atomically take the oldest pending job from any of ``queues``"""
+
+    @abstractmethod
+    def finish_job(
+        self,
+        job_id: str,
+        result: Optional[Dict[str, Any]] = None,
+        error: Optional[str] = None
+    ):
+        """Store a job's outcome (no-op if the job was deleted meanwhile)"""
+
+    @abstractmethod
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def withdraw_job(self, job_id: str) -> bool:
+        """Delete a job no worker has claimed yet; False if one already has it"""
+
+    @abstractmethod
+    def delete_job(self, job_id: str):
+        ...
+
+    def renew_job(self, job_id: str, worker_id: str):
+        """Extend the lease of a running job (no-op for backends without leases)"""
+
+    # Leases ---------------------------------------------------------------
+
+    @abstractmethod
+    def acquire_lease(self, name: str, holder: str, seconds: float) -> bool:
+        """Take the lease ``name`` for ``seconds``; False while another holder has it"""
+
+    @abstractmethod
+    def renew_lease(self, name: str, holder: str, seconds: float) -> bool:
+        """Extend a lease ``holder`` still has; False if it was released or taken over since"""
+
+    @abstractmethod
+    def release_lease(self, name: str, holder: str):
+        """Give a lease up (no-op unless ``holder`` has it)"""
+
+    def wait_job(
+        self,
+        job_id: str,
+        timeout: float,
+        poll_interval: float = 0.05,
+        cancel_token: Optional[CancellationToken] = None
+    ) -> Dict[str, Any]:
+        """Block until a job is done and return its result"""
+        deadline = time.monotonic() + timeout
+        while True:
+            if cancel_token is not None and cancel_token.cancelled:
+                raise OperationCancelled(cancel_token.reason or "cancelled")
+            job = self.get_job(job_id)
+            if job and job['status'] == 'done':
+                if job.get('error'):
+                    raise JobFailed(job['error'])
+                return job['result']
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"Job {job_id} not finished after {timeout}s")
+            if cancel_token is not None:
+                cancel_token.wait(poll_interval)
+            else:
+                time.sleep(poll_interval)
+
+
+class MemoryStateBackend(StateBackend):
+    """In-process backend (single node, the default)"""
+
+    def __init__(self):
+        self._data: Dict[str, Dict[str, str]] = {}
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._leases: Dict[str, Tuple[str, float]] = {}  # name -> (holder, expires)
+        self._lock = threading.Lock()
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        with self._lock:
+            value = self._data.get(namespace, {}).get(key)
+        return json.loads(value) if value is not None else None
+
+    def put(self, namespace: str, key: str, value: Any):
+        encoded = json.dumps(value)
+        with self._lock:
+            self._data.setdefault(namespace, {})[key] = encoded
+
+    def delete(self, namespace: str, key: str):
+        with self._lock:
+            self._data.get(namespace, {}).pop(key, None)
+
+    def keys(self, namespace: str) -> List[str]:
+        with self._lock:
+            return list(self._data.get(namespace, {}).keys())
+
+    def enqueue_job(self, queue: str, payload: Dict[str, Any]) -> str:
+        job_id = str(uuid.uuid4())
+        with self._lock:
+            self._jobs[job_id] = {
+                'id': job_id,
+                'queue': queue,
+                'payload': payload,
+                'status': 'pending',
+                'worker': None,
+                'result': None,
+                'error': None,
+            }
+        return job_id
+
+    def claim_job(self, queues: List[str], worker_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            for job in self._jobs.values():
+                if job['status'] == 'pending' and job['queue'] in queues:
+                    job['status'] = 'claimed'
+                    job['worker'] = worker_id
+                    return dict(job)
+        return None
+
+    def finish_job(
+        self,
+        job_id: str,
+        result: Optional[Dict[str, Any]] = None,
+        error: Optional[str] = None
+    ):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(status='done', result=result, error=error)
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def withdraw_job(self, job_id: str) -> bool:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job['status'] != 'pending':
+                return False
+            del self._jobs[job_id]
+            return True
+
+    def delete_job(self, job_id: str):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def acquire_lease(self, name: str, holder: str, seconds: float) -> bool:
+        now = time.time()
+        with self._lock:
+            current = self._leases.get(name)
+            if current and current[0] != holder and current[1] > now:
+                return False
+            self._leases[name] = (holder, now + seconds)
+            return True
+
+    def renew_lease(self, name: str, holder: str, seconds: float) -> bool:
+        with self._lock:
+            if self._leases.get(name, (None,))[0] != holder:
+                return False
+            self._leases[name] = (holder, time.time() + seconds)
+            return True
+
+    def release_lease(self, name: str, holder: str):
+        with self._lock:
+            if self._leases.get(name, (None,))[0] == holder:
+                del self._leases[name]
+
+
+class SQLiteStateBackend(StateBackend):
+    """SQLite file backend, shared by every process on the same host or volume.
+
+    Workers renew the lease of a running job; claimed jobs whose lease ran
+    out for ``lease_seconds`` are handed to the next worker, so a crashed
+    node does not lose work.
+    """
+
+    shared = True
+
+    def __init__(self, path: str = "data/openbotman_state.db", lease_seconds: float = 60):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self._local = threading.local()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS kv ("
+            " namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+            " PRIMARY KEY (namespace, key))"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " seq INTEGER PRIMARY KEY AUTOINCREMENT, id TEXT UNIQUE NOT NULL,"
+            " queue TEXT NOT NULL, payload TEXT NOT NULL, status TEXT NOT NULL,"
+            " worker TEXT, claimed_at REAL, result TEXT, error TEXT)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_pending ON jobs (status, queue, seq)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS leases ("
+            " name TEXT PRIMARY KEY, holder TEXT NOT NULL, expires REAL NOT NULL)"
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        row = self._conn().execute(
+            "SELECT value FROM kv WHERE namespace = ? AND key = ?", (namespace, key)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, namespace: str, key: str, value: Any):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO kv (namespace, key, value) VALUES (?, ?, ?)",
+            (namespace, key, json.dumps(value))
+        )
+
+    def delete(self, namespace: str, key: str):
+        self._conn().execute(
+            "DELETE FROM kv WHERE namespace = ? AND key = ?", (namespace, key)
+        )
+
+    def keys(self, namespace: str) -> List[str]:
+        rows = self._conn().execute(
+            "SELECT key FROM kv WHERE namespace = ? ORDER BY key", (namespace,)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def enqueue_job(self, queue: str, payload: Dict[str, Any]) -> str:
+        job_id = str(uuid.uuid4())
+        self._conn().execute(
+            "INSERT INTO jobs (id, queue, payload, status) VALUES (?, ?, ?, 'pending')",
+            (job_id, queue, json.dumps(payload))
+        )
+        return job_id
+
+    def claim_job(self, queues: List[str], worker_id: str) -> Optional[Dict[str, Any]]:
+        conn = self._conn()
+        placeholders = ", ".join("?" for _ in queues)
+        now = time.time()
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                f"SELECT id, queue, payload FROM jobs"
+                f" WHERE queue IN ({placeholders})"
+                f" AND (status = 'pending' OR (status = 'claimed' AND claimed_at < ?))"
+                f" ORDER BY seq LIMIT 1",
+                (*queues, now - self.lease_seconds)
+            ).fetchone()
+            if row:
+                conn.execute(
+                    "UPDATE jobs SET status = 'claimed', worker = ?, claimed_at = ? WHERE id = ?",
+                    (worker_id, now, row[0])
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        if not row:
+            return None
+        return {
+            'id': row[0],
+            'queue': row[1],
+            'payload': json.loads(row[2]),
+            'status': 'claimed',
+            'worker': worker_id,
+        }
+
+    def finish_job(
+        self,
+        job_id: str,
+        result: Optional[Dict[str, Any]] = None,
+        error: Optional[str] = None
+    ):
+        self._conn().execute(
+            "UPDATE jobs SET status = 'done', result = ?, error = ? WHERE id = ?",
+            (json.dumps(result), error, job_id)
+        )
+
+    def withdraw_job(self, job_id: str) -> bool:
+        cursor = self._conn().execute(
+            "DELETE FROM jobs WHERE id = ? AND status = 'pending'", (job_id,)
+        )
+        return cursor.rowcount > 0
+
+    def delete_job(self, job_id: str):
+        self._conn().execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def renew_job(self, job_id: str, worker_id: str):
+        self._conn().execute(
+            "UPDATE jobs SET claimed_at = ? WHERE id = ? AND status = 'claimed' AND worker = ?",
+            (time.time(), job_id, worker_id)
+        )
+
+    def acquire_lease(self, name: str, holder: str, seconds: float) -> bool:
+        now = time.time()
+        cursor = self._conn().execute(
+            "INSERT INTO leases (name, holder, expires) VALUES (?, ?, ?)"
+            " ON CONFLICT (name) DO UPDATE SET holder = excluded.holder, expires = excluded.expires"
+            " WHERE leases.holder = excluded.holder OR leases.expires <= ?",
+            (name, holder, now + seconds, now)
+        )
+        return cursor.rowcount > 0
+
+    def renew_lease(self, name: str, holder: str, seconds: float) -> bool:
+        cursor = self._conn().execute(
+            "UPDATE leases SET expires = ? WHERE name = ? AND holder = ?",
+            (time.time() + seconds, name, holder)
+        )
+        return cursor.rowcount > 0
+
+    def release_lease(self, name: str, holder: str):
+        self._conn().execute("DELETE FROM leases WHERE name = ? AND holder = ?", (name, holder))
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute(
+            "SELECT id, queue, payload, status, worker, result, error FROM jobs WHERE id = ?",
+            (job_id,)
+        ).fetchone()
+        if not row:
+            return None
+        return {
+            'id': row[0],
+            'queue': row[1],
+            'payload': json.loads(row[2]),
+            'status': row[3],
+            'worker': row[4],
+            'result': json.loads(row[5]) if row[5] else None,
+            'error': row[6],
+        }
+
+
+def create_state_backend(config: Dict[str, Any]) -> StateBackend:
+    """Build the backend selected by the ``state`` section of config.yaml.
+
+    ``backend`` is ``memory`` (default), ``sqlite``, or ``module:ClassName``
+    for a custom (e.g. networked) store; ``options`` are passed as kwargs.
+    """
+    section = config.get('state', {}) or {}
+    backend = section.get('backend', 'memory')
+    options = section.get('options', {}) or {}
+
+    if backend == 'memory':
+        return MemoryStateBackend()
+    if backend == 'sqlite':
+        # A job re-claimed after its requester stopped waiting would run for nobody
+        job_timeout = section.get('job_timeout', 600)
+        if options.get('lease_seconds', 60) > job_timeout:
+            raise ValueError(
+                f"state.options.lease_seconds ({options['lease_seconds']}) "
+                f"must not exceed state.job_timeout ({job_timeout})"
+            )
+        return SQLiteStateBackend(**options)
+    if ':' in backend:
+        module_name, class_name = backend.split(':', 1)
+        backend_class = getattr(importlib.import_module(module_name), class_name)
+        return backend_class(**options)
+    raise ValueError(f"Unknown state backend: {backend}")
+
+
+def to_jsonable(value: Any) -> Any:
+    """Convert Anthropic SDK content blocks (pydantic models) to plain dicts"""
+    if hasattr(value, 'model_dump'):
+        return value.model_dump(exclude_none=True)
+    if isinstance(value, list):
+        return [to_jsonable(item) for item in value]
+    if isinstance(value, dict):
+        return {key: to_jsonable(item) for key, item in value.items()}
+    return value
@@ -0,0 +1,172 @@
+"""Fast local token estimates, calibrated against reported usage, and prompt fitting"""
+
+import re
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+# Sub-word pieces: BPE vocabularies average about four characters per token
+# for English prose and code, punctuation is mostly one token each
+_PIECE = re.compile(r"\w{1,4}|[^\w\s]")
+
+DEFAULT_CONTEXT_WINDOW = 200000
+
+
+def raw_token_count(text: str) -> int:
+    """Uncalibrated token estimate (one regex pass, no tokenizer needed)"""
+    return len(_PIECE.findall(text))
+
+
+@dataclass
+class PromptPart:
+    """A piece of a prompt; parts with the lowest priority are cut first"""
+    text: str
+    priority: int = 0
+    label: str = ""
+    required: bool = False
+
+
+class TokenEstimator:
+    """Per-agent linear calibration ``actual = slope * raw + overhead``.
+
+    The overhead absorbs what a CLI adds around our prompt (its own system
+    prompt, tool schemas). The fit is a running least-squares over the
+    estimate/actual pairs, so each observation costs O(1).
+    """
+
+    def __init__(self, min_samples: int = 3):
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        # agent -> [n, sum_x, sum_y, sum_xx, sum_xy, sum_abs_error_pct]
+        self._sums: Dict[str, List[float]] = {}
+
+    def _fit(self, agent_id: str) -> Tuple[float, float]:
+        sums = self._sums.get(agent_id)
+        if not sums or sums[0] < self.min_samples:
+            return 1.0, 0.0
+        n, sx, sy, sxx, sxy, _ = sums
+        denominator = n * sxx - sx * sx
+        if denominator <= 0:
+            # All prompts the same size so far: scale only
+            return (sy / sx if sx else 1.0), 0.0
+        slope = (n * sxy - sx * sy) / denominator
+        overhead = (sy - slope * sx) / n
+        if slope <= 0:
+            return (sy / sx if sx else 1.0), 0.0
+        return slope, max(0.0, overhead)
+
+    def calibration(self, agent_id: Optional[str]) -> Tuple[float, float]:
+        """(slope, overhead) for an agent; (1, 0) until calibrated"""
+        if agent_id is None:
+            return 1.0, 0.0
+        with self._lock:
+            return self._fit(agent_id)
+
+    def estimate(self, text: str, agent_id: Optional[str] = None) -> int:
+        """Calibrated estimate of the input tokens a call with ``text`` costs"""
+        slope, overhead = self.calibration(agent_id)
+        return int(slope * raw_token_count(text) + overhead)
+
+    def record(self, agent_id: str, text: str, actual: int) -> Dict[str, int]:
+        """Calibrate with a reported input token count; returns estimate and actual"""
+        raw = raw_token_count(text)
+        with self._lock:
+            slope, overhead = self._fit(agent_id)
+            estimated = int(slope * raw + overhead)
+            sums = self._sums.setdefault(agent_id, [0, 0.0, 0.0, 0.0, 0.0, 0.0])
+            sums[0] += 1
+            sums[1] += raw
+            sums[2] += actual
+            sums[3] += raw * raw
+            sums[4] += raw * actual
+            if actual:
+                sums[5] += abs(estimated - actual) / actual
+        return {"estimated": estimated, "actual": actual}
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = {}
+            for agent_id, sums in self._sums.items():
+                slope, overhead = self._fit(agent_id)
+                stats[agent_id] = {
+                    "samples": int(sums[0]),
+                    "slope": round(slope, 3),
+                    "overhead": int(overhead),
+                    "mean_error_pct": round(100 * sums[5] / sums[0], 1),
+                }
+            return stats
+
+
+# Shared by every session in the process
+token_estimator = TokenEstimator()
+
+
+def context_budget(config: Dict[str, Any], agent_id: str) -> int:
+    """Input tokens available to an agent: its window minus the output reserve"""
+    section = config.get('tokens', {}) or {}
+    agent_config = config.get('agents', {}).get(agent_id) or {}
+    window = agent_config.get('context_window', section.get('context_window', DEFAULT_CONTEXT_WINDOW))
+    return window - section.get('reserve_output', 8000)
+
+
+def fit_prompt(
+    parts: List[PromptPart],
+    budget: int,
+    agent_id: Optional[str] = None,
+    estimator: Optional[TokenEstimator] = None
+) -> Tuple[List[PromptPart], List[str]]:
+    """Fit parts into ``budget`` tokens, cutting the lowest priority first.
+
+    The lowest-priority part is shortened to its head and tail when that is
+    enough, otherwise dropped, and so on upwards. Required parts are only
+    shortened. Returns the kept parts (in their original order) and notes on
+    what was cut. Raises ValueError if the required parts alone do not fit.
+    """
+    estimator = estimator or token_estimator
+    slope, overhead = estimator.calibration(agent_id)
+
+    def size(text: str) -> int:
+        return int(slope * raw_token_count(text))
+
+    sizes = [size(part.text) for part in parts]
+    total = int(overhead) + sum(sizes)
+    kept = list(parts)
+    notes: List[str] = []
+
+    # Cheapest to lose first; among equals the earliest part
+    for i in sorted(range(len(parts)), key=lambda i: (parts[i].required, parts[i].priority, i)):
+        if total <= budget:
+            break
+        excess = total - budget
+        part = parts[i]
+        label = part.label or f"part {i + 1}"
+
+        if sizes[i] - excess >= 200 or part.required:
+            # A little extra off for the omission marker and estimate noise
+            keep_ratio = max(0.0, 0.95 * (sizes[i] - excess) / sizes[i] - 0.01) if sizes[i] else 0.0
+            shortened = shorten(part.text, int(len(part.text) * keep_ratio))
+            new_size = size(shortened)
+            total += new_size - sizes[i]
+            sizes[i] = new_size
+            kept[i] = PromptPart(shortened, part.priority, part.label, part.required)
+            notes.append(f"shortened {label}")
+        else:
+            total -= sizes[i]
+            sizes[i] = 0
+            kept[i] = None
+            notes.append(f"dropped {label}")
+
+    if total > budget:
+        raise ValueError(f"Prompt needs ~{total} tokens, the budget is {budget}")
+    return [part for part in kept if part is not None], notes
+
+
+def shorten(text: str, max_chars: int) -> str:
+    """Keep the head and tail of ``text`` with a marker for the omitted middle"""
+    if len(text) <= max_chars:
+        return text
+    omitted = len(text) - max_chars
+    marker = f"\n[... {omitted} characters omitted ...]\n"
+    head = max(0, (max_chars - len(marker)) * 2 // 3)
+    tail = max(0, max_chars - len(marker) - head)
+    return text[:head] + marker + (text[-tail:] if tail else "")
@@ -1,8 +1,183 @@
 """Tools available to the orchestrator agent"""
 
-from typing import List, Dict, Any, Optional
-from .cli_runners import CLIRunner, CLIResponse
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed, wait
+from typing import Callable, List, Dict, Any, Optional, Tuple
+from .cli_runners import CLIRunner, CLIResponse, CLITimeout
+from .cancellation import CancellationToken
+from .cascade import ModelCascade
+from .chunking import CHARS_PER_TOKEN, split_input
+from .convergence import ConvergenceDetector, STEER_PROMPT
+from .discussion import Transcript, resolve_participants
+from .estimator import shared_estimator
+from .profiling import run_in_turn
+from .retrieval import shared_index
+from .singleflight import request_key, single_flight
+from .speculation import speculation_stats, summarize as summarize_speculation
+from .tokens import PromptPart, context_budget, fit_prompt, shorten, token_estimator
+import contextvars
+import difflib
 import json
+import re
+import time
+import uuid
+
+# An approval reply starts with APPROVED, optionally followed by a remark
+_APPROVED = re.compile(r"^\W*APPROVED\b", re.IGNORECASE)
+
+
+def change_ratio(previous: str, current: str) -> float:
+    """Fraction of words that changed between two outputs (0 = identical, 1 = rewritten)"""
+    if previous == current:
+        return 0.0
+    matcher = difflib.SequenceMatcher(
+        None, previous.split(), current.split(), autojunk=False
+    )
+    return 1.0 - matcher.ratio()
+
+
+def _number_ranges(numbers: List[int]) -> str:
+    """1-based ranges of sorted 0-based indexes, e.g. [2, 3, 4, 7] -> 3..5, 8"""
+    ranges: List[List[int]] = []
+    for n in numbers:
+        if ranges and ranges[-1][1] == n - 1:
+            ranges[-1][1] = n
+        else:
+            ranges.append([n, n])
+    return ", ".join(
+        f"{start + 1}" if start == end else f"{start + 1}..{end + 1}" for start, end in ranges
+    )
+
+
+def _submit(pool: ThreadPoolExecutor, func: Callable, *args, **kwargs) -> Future:
+    """pool.submit that carries the caller's context (turn priority, profiler) into the worker"""
+    return pool.submit(contextvars.copy_context().run, run_in_turn, func, *args, **kwargs)
+
+
+def _call_tokens(prompt: str, response: CLIResponse) -> int:
+    """Tokens used by a call: reported usage, else roughly 4 characters per token"""
+    if response.usage:
+        return response.usage.get('input', 0) + response.usage.get('output', 0)
+    return (len(prompt) + len(response.text)) // 4
+
+
+def _record_input_tokens(agent_id: str, sent: str, response: CLIResponse) -> Dict[str, Any]:
+    """Local input token estimate next to the reported count (which calibrates it)"""
+    actual = (response.usage or {}).get('input')
+    if actual:
+        return token_estimator.record(agent_id, sent, actual)
+    return {"estimated": token_estimator.estimate(sent, agent_id), "actual": None}
+
+
+class _WorkflowSpeculation:
+    """Speculative runs of the next workflow step while the current output is reviewed.
+
+    At most one run is pending. It is discarded when the output is revised
+    and collected once the output is final; hits, misses and saved time are
+    counted for the run and in ``speculation_stats``.
+    """
+
+    def __init__(
+        self,
+        tools: "OrchestratorTools",
+        workflow_name: str,
+        run_id: str,
+        cancel_token: Optional[CancellationToken]
+    ):
+        self.tools = tools
+        self.workflow_name = workflow_name
+        self.run_id = run_id
+        self.cancel_token = cancel_token
+        self.pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="speculate")
+        self.pending: Optional[Dict[str, Any]] = None
+        self.counts = {"hits": 0, "misses": 0, "saved_seconds": 0.0}
+
+    def start(self, step_number: int, step: Dict[str, Any], context: str, attempt: int):
+        """Start workflow step ``step_number`` on an output that may still be revised"""
+        tools = self.tools
+        token = self.cancel_token.child() if self.cancel_token else CancellationToken()
+        scope = f"workflow:{self.workflow_name}:{self.run_id}:{step_number}:speculative{attempt}"
+        task = f"{step['task']}\n\nInput:\n{context}"
+
+        def run():
+            # Pool threads start unscoped; a kept run's sessions carry on in the step
+            try:
+                with tools.cli.scope(scope, release=False):
+                    result = tools.call_agent(
+                        agent_id=step['agent'],
+                        role=step['role'],
+                        task=task,
+                        context=context,
+                        cancel_token=token,
+                        record=False
+                    )
+            finally:
+                token.detach()
+            return result, time.monotonic()
+
+        self.pending = {
+            "future": _submit(self.pool, run),
+            "token": token,
+            "scope": scope,
+            "step": step,
+            "task": task,
+            "started": time.monotonic(),
+        }
+
+    def discard(self):
+        """The output was revised: the pending run is stale"""
+        if self.pending is not None:
+            self._cancel()
+            self._count(hit=False)
+
+    def _cancel(self):
+        """Cancel the pending run and forget its sessions once it has stopped"""
+        pending, self.pending = self.pending, None
+        pending["token"].cancel("speculation discarded")
+        pending["future"].add_done_callback(lambda _: self.tools.cli.release_scope(pending["scope"]))
+
+    def collect(self) -> Optional[Dict[str, Any]]:
+        """Wait for the pending run now that its input is final.
+
+        Returns ``{"result", "scope", "seconds"}`` (``seconds``: how long the
+        run took), or None when nothing was pending or the run failed and the
+        step has to run normally.
+        """
+        pending, self.pending = self.pending, None
+        if pending is None:
+            return None
+
+        needed = time.monotonic()
+        try:
+            result, finished = pending["future"].result()
+        except Exception as e:
+            print(f"[Workflow] Speculative step failed, running it again: {e}")
+            self.tools.cli.release_scope(pending["scope"])
+            self._count(hit=False)
+            return None
+
+        step = pending["step"]
+        self.tools._log_call(step['agent'], step['role'], pending["task"], result['response'])
+        result['speculative'] = True
+        # Time the step had already run by the time it was due to start
+        self._count(hit=True, saved=max(0.0, min(needed, finished) - pending["started"]))
+        return {"result": result, "scope": pending["scope"], "seconds": finished - pending["started"]}
+
+    def close(self):
+        """Stop a run left pending (the workflow failed) and the pool"""
+        if self.pending is not None:
+            self._cancel()
+        self.pool.shutdown(wait=False)
+
+    def summary(self) -> Optional[Dict[str, Any]]:
+        """Hit/miss summary of this run, None if nothing was speculated"""
+        if not (self.counts["hits"] or self.counts["misses"]):
+            return None
+        return summarize_speculation(self.counts)
+
+    def _count(self, hit: bool, saved: float = 0.0):
+        self.counts["hits" if hit else "misses"] += 1
+        self.counts["saved_seconds"] += saved
+        speculation_stats.record(self.workflow_name, hit=hit, saved_seconds=saved)
 
 
 class OrchestratorTools:
@@ -12,6 +187,9 @@ class OrchestratorTools:
         self.cli = cli_runner
         self.config = config
         self.conversation_history: List[Dict[str, str]] = []
+        self.index = shared_index(config)
+        self.cascade = ModelCascade(config)
+        self.estimator = shared_estimator(config)
 
     def get_tool_definitions(self) -> List[Dict[str, Any]]:
         """Return Anthropic-style tool definitions"""
@@ -95,6 +273,59 @@ class OrchestratorTools:
                     },
                     "required": ["workflow_name", "input_data"]
                 }
+            },
+            {
+                "name": "run_discussion",
+                "description": (
+                    "Run a multi-round discussion in which a team of agents answers in parallel "
+                    "and reads each other's contributions. Useful for open design questions."
+                ),
+                "input_schema": {
+                    "type": "object",
+                    "properties": {
+                        "topic": {
+                            "type": "string",
+                            "description": "Question or proposal to discuss"
+                        },
+                        "team": {
+                            "type": "string",
+                            "enum": [t['id'] for t in self.config.get('discussion', {}).get('teams', [])],
+                            "description": "Configured team to use"
+                        },
+                        "agents": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "Participants (instead of a team)"
+                        },
+                        "max_rounds": {
+                            "type": "integer",
+                            "description": "Maximum number of rounds"
+                        }
+                    },
+                    "required": ["topic"]
+                }
+            },
+            {
+                "name": "search_past_work",
+                "description": (
+                    "Search earlier agent tasks, responses and past discussion results. "
+                    "Use this before delegating to reuse or cite prior answers to similar questions."
+                ),
+                "input_schema": {
+                    "type": "object",
+                    "properties": {
+                        "query": {
+                            "type": "string",
+                            "description": "What to look for"
+                        },
+                        "limit": {
+                            "type": "integer",
+                            "description": "Maximum number of matches",
+                            "default": 5
+                        }
+                    },
+                    "required": ["query"]
+                }
             }
         ]
 
@@ -103,63 +334,162 @@ class OrchestratorTools:
         agent_id: str,
         role: str,
         task: str,
-        context: Optional[str] = None
+        context: Optional[str] = None,
+        cancel_token: Optional[CancellationToken] = None,
+        timeout: Optional[float] = None,
+        record: bool = True
     ) -> Dict[str, Any]:
-        """Execute call_agent tool"""
+        """Execute call_agent tool (timeout defaults to the learned per-role timeout).
+
+        With ``record=False`` the call is left out of the history and search
+        index (speculative calls are recorded only once they are kept).
+        """
 
         # Build role-specific system prompt
         system_prompt = self._build_role_prompt(agent_id, role)
 
-        # Build full prompt with context
-        full_prompt = task
+        # Build full prompt with context, cut to the agent's context window
+        parts = [PromptPart(task, priority=1, label="task", required=True)]
         if context:
-            full_prompt = f"Context:\n{context}\n\nTask:\n{task}"
+            parts.insert(0, PromptPart(context, priority=0, label="context"))
+        budget = context_budget(self.config, agent_id) - token_estimator.estimate(system_prompt)
+        parts, notes = fit_prompt(parts, budget, agent_id)
+        if notes:
+            print(f"[Tokens] {agent_id}: {', '.join(notes)} to fit {budget} tokens")
+        fitted = {part.label: part.text for part in parts}
+
+        full_prompt = fitted["task"]
+        if "context" in fitted:
+            full_prompt = f"Context:\n{fitted['context']}\n\nTask:\n{fitted['task']}"
 
-        # Execute CLI
-        response = self.cli.run_cli(
-            agent_id=agent_id,
-            prompt=full_prompt,
-            system_prompt=system_prompt
+        # Execute CLI (through the role's model cascade, if configured)
+        response, cascade, coalesced = self._run_agent(
+            agent_id, role, full_prompt, system_prompt,
+            timeout=timeout,
+            cancel_token=cancel_token
         )
+        tokens = _call_tokens(full_prompt, response)
+        input_tokens = _record_input_tokens(agent_id, system_prompt + full_prompt, response)
 
-        # Log to history
-        self.conversation_history.append({
-            "agent": agent_id,
-            "role": role,
-            "task": task,
-            "response": response.text
-        })
+        if record:
+            self._log_call(agent_id, role, task, response.text)
 
-        return {
+        result = {
             "agent": agent_id,
             "role": role,
             "response": response.text,
             "session_id": response.session_id,
-            "usage": response.usage
+            "usage": response.usage,
+            "tokens": tokens,
+            "input_tokens": input_tokens
         }
+        if response.resources:
+            result["resources"] = response.resources
+        if cascade:
+            result["cascade"] = cascade
+        if coalesced:
+            result["coalesced"] = True
+        return result
+
+    def _log_call(self, agent_id: str, role: str, task: str, response: str):
+        """Add an agent call to the history and the search index"""
+        entry = {
+            "agent": agent_id,
+            "role": role,
+            "task": task,
+            "response": response
+        }
+        self.conversation_history.append(entry)
+        self.index.add(f"{task}\n{response}", {"source": "agent", **entry}, owner=self.cli.session_id)
+
+    def _run_agent(
+        self,
+        agent_id: str,
+        role: str,
+        prompt: str,
+        system_prompt: str,
+        timeout: Optional[float] = None,
+        cancel_token: Optional[CancellationToken] = None
+    ) -> Tuple[CLIResponse, Optional[Dict[str, Any]], bool]:
+        """Run a call through the role's cascade; returns (response, cascade, coalesced).
+
+        The timeout defaults to the learned one for the role and prompt size.
+        The call's own run time (or its timeout) feeds the estimator.
+        For roles listed in ``single_flight.roles`` an identical call already
+        in flight is joined instead of started again: from any session if both
+        start a fresh CLI session, otherwise only within the same CLI session.
+        """
+        prompt_tokens = token_estimator.estimate(system_prompt + prompt, agent_id)
+        timeout = timeout or self.estimator.timeout_for(agent_id, role, prompt_tokens)
+
+        def run():
+            started = time.monotonic()
+            try:
+                response, cascade = self.cascade.run(
+                    self.cli,
+                    agent_id=agent_id,
+                    role=role,
+                    prompt=prompt,
+                    system_prompt=system_prompt,
+                    timeout=timeout,
+                    cancel_token=cancel_token
+                )
+            except CLITimeout as e:
+                self.estimator.record_call(agent_id, role, e.seconds, 0, prompt_tokens, timed_out=True)
+                raise
+            # Only the (last) CLI run counts: not slot queueing or earlier cascade tiers
+            elapsed = response.elapsed if response.elapsed is not None else time.monotonic() - started
+            self.estimator.record_call(
+                agent_id, role, elapsed, _call_tokens(prompt, response), prompt_tokens
+            )
+            return response, cascade
+
+        roles = (self.config.get('single_flight', {}) or {}).get('roles', [])
+        if role not in roles:
+            response, cascade = run()
+            return response, cascade, False
+
+        # Calls continuing a CLI conversation only match calls in the same one
+        agent_config = self.config['agents'].get(agent_id, {})
+        session = None
+        if agent_config.get('session_arg'):
+            session_id, fork_from = self.cli.session_state(agent_id)
+            if session_id or fork_from:
+                session = f"{session_id}:{fork_from}"
+        key = request_key(agent_id, agent_config.get('default_model'), system_prompt, prompt, session)
+        (response, cascade), coalesced = single_flight.do(key, run, cancel_token)
+        return response, cascade, coalesced
 
     def create_consensus(
         self,
         agents: List[str],
         topic: str,
-        min_agreement: float = 0.7
+        min_agreement: float = 0.7,
+        cancel_token: Optional[CancellationToken] = None
     ) -> Dict[str, Any]:
         """Execute create_consensus tool"""
 
         responses = []
         votes = {"approve": 0, "reject": 0}
+        ballot_id = uuid.uuid4().hex[:8]
 
         for agent_id in agents:
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+
             prompt = (
                 f"Evaluate this and vote APPROVE or REJECT:\n\n{topic}\n\n"
                 f"Provide reasoning then vote."
             )
 
-            response = self.cli.run_cli(
-                agent_id=agent_id,
-                prompt=prompt,
-                system_prompt="You are a critical reviewer. Be thorough."
-            )
+            # Each ballot forks the agent's conversation so votes stay independent
+            ballot = f"consensus:{ballot_id}:{agent_id}"
+            self.cli.fork_session(agent_id, ballot)
+            with self.cli.scope(ballot):
+                response, _, _ = self._run_agent(
+                    agent_id, "consensus", prompt, "You are a critical reviewer. Be thorough.",
+                    cancel_token=cancel_token
+                )
 
             # Count votes
             text_upper = response.text.upper()
@@ -188,9 +518,16 @@ class OrchestratorTools:
     def run_workflow(
         self,
         workflow_name: str,
-        input_data: str
+        input_data: str,
+        cancel_token: Optional[CancellationToken] = None,
+        progress: Optional[Callable[[Dict[str, Any]], None]] = None
     ) -> Dict[str, Any]:
-        """Execute run_workflow tool"""
+        """Execute run_workflow tool (``progress`` receives per-chunk map-reduce events).
+
+        With ``speculate`` on the workflow or a step, the next step starts on
+        the current output while the refinement feedback is pending. It is
+        kept if the output is approved and cancelled if it is revised.
+        """
 
         workflow = self.config.get('workflows', {}).get(workflow_name)
         if not workflow:
@@ -198,61 +535,504 @@ class OrchestratorTools:
 
         results = []
         current_context = input_data
+        steps = workflow['steps']
+        run_id = uuid.uuid4().hex[:8]
+        speculation = None
+        if workflow.get('speculate') or any(step.get('speculate') for step in steps):
+            speculation = _WorkflowSpeculation(self, workflow_name, run_id, cancel_token)
+        kept = None  # speculative result of the current step
 
-        for step in workflow['steps']:
-            agent_id = step['agent']
-            role = step['role']
-            task_template = step['task']
+        try:
+            for step_number, step in enumerate(steps):
+                # Each step gets its own CLI sessions so concurrent runs don't cross-talk
+                scope = kept['scope'] if kept else f"workflow:{workflow_name}:{run_id}:{step_number}"
+                with self.cli.scope(scope):
+                    if cancel_token is not None:
+                        cancel_token.raise_if_cancelled()
 
-            # Build task with context
-            task = f"{task_template}\n\nInput:\n{current_context}"
+                    agent_id = step['agent']
+                    role = step['role']
+                    task_template = step['task']
 
-            # Execute step
-            result = self.call_agent(
-                agent_id=agent_id,
-                role=role,
-                task=task,
-                context=current_context
-            )
+                    # Build task with context
+                    task = f"{task_template}\n\nInput:\n{current_context}"
+                    step_started = time.monotonic()
+                    speculative_seconds = 0.0
+                    first_result = len(results)
 
-            results.append(result)
+                    # Execute step (large inputs are split and mapped in parallel)
+                    mapped = kept is None and self._uses_map_reduce(step, current_context)
+                    if kept is not None:
+                        result, speculative_seconds, kept = kept['result'], kept['seconds'], None
+                    elif mapped:
+                        result = self._run_map_reduce(
+                            step, current_context, cancel_token, progress
+                        )
+                        # The input does not fit one call: refine the merged findings instead
+                        task = task_template
+                    else:
+                        result = self.call_agent(
+                            agent_id=agent_id,
+                            role=role,
+                            task=task,
+                            context=current_context,
+                            cancel_token=cancel_token
+                        )
 
-            # Check if we need iterations
-            max_iterations = step.get('max_iterations', 1)
-            if max_iterations > 1:
-                for iteration in range(max_iterations - 1):
-                    # Ask if satisfied
-                    feedback_prompt = (
-                        f"Review this output:\n{result['response']}\n\n"
-                        f"Reply APPROVED if satisfied, or provide improvements."
-                    )
+                    results.append(result)
 
-                    feedback = self.cli.run_cli(
-                        agent_id=agent_id,
-                        prompt=feedback_prompt
+                    next_step = steps[step_number + 1] if step_number + 1 < len(steps) else None
+                    speculate = (
+                        speculation is not None and next_step is not None
+                        and step.get('speculate', workflow.get('speculate', False))
                     )
 
-                    if "APPROVED" in feedback.text.upper():
-                        break
+                    # Check if we need iterations
+                    max_iterations = step.get('max_iterations', 1)
+                    if max_iterations > 1 and step.get('iteration_mode') == 'fused':
+                        result = self._refine_fused(step, task, result, results, cancel_token)
+                    elif max_iterations > 1:
+                        detector = ConvergenceDetector.from_config(self.config, step.get('convergence'))
+
+                        for iteration in range(max_iterations - 1):
+                            # Ask if satisfied
+                            feedback_prompt = (
+                                f"Review this output:\n{result['response']}\n\n"
+                                f"Reply APPROVED if satisfied, or provide improvements."
+                            )
+                            if detector.should_steer:
+                                feedback_prompt += f"\n\n{STEER_PROMPT}"
+
+                            # Most outputs are approved: start the next step on this one meanwhile
+                            if speculate and not self._uses_map_reduce(next_step, result['response']):
+                                speculation.start(step_number + 1, next_step, result['response'], iteration)
+
+                            feedback = self.cli.run_cli(
+                                agent_id=agent_id,
+                                prompt=feedback_prompt,
+                                timeout=self.estimator.timeout_for(
+                                    agent_id, role, token_estimator.estimate(feedback_prompt, agent_id)
+                                ),
+                                cancel_token=cancel_token
+                            )
 
-                    # Iterate
-                    result = self.call_agent(
-                        agent_id=agent_id,
-                        role=role,
-                        task=f"Improve based on:\n{feedback.text}\n\nOriginal:\n{task}",
-                        context=current_context
+                            if "APPROVED" in feedback.text.upper():
+                                break
+
+                            # Stop when the feedback keeps raising the same points
+                            novelty = detector.observe([feedback.text])
+                            if detector.converged:
+                                print(
+                                    f"[Workflow] Feedback stopped adding new points "
+                                    f"(novelty {novelty:.0%}), ending refinement"
+                                )
+                                break
+
+                            # The output is revised, so the speculative step is stale
+                            if speculate:
+                                speculation.discard()
+
+                            # Iterate
+                            if mapped:
+                                result = self.call_agent(
+                                    agent_id=agent_id,
+                                    role=role,
+                                    task=(
+                                        f"Improve based on:\n{feedback.text}\n\nOriginal:\n{task}\n\n"
+                                        f"Current findings:\n{result['response']}"
+                                    ),
+                                    cancel_token=cancel_token
+                                )
+                            else:
+                                result = self.call_agent(
+                                    agent_id=agent_id,
+                                    role=role,
+                                    task=f"Improve based on:\n{feedback.text}\n\nOriginal:\n{task}",
+                                    context=current_context,
+                                    cancel_token=cancel_token
+                                )
+                            result['novelty'] = novelty
+                            results.append(result)
+
+                    # Whole-step timing (including refinement) feeds workflow estimates;
+                    # a kept speculative run counts with the time it actually took
+                    self.estimator.record_step(
+                        workflow_name, step_number,
+                        time.monotonic() - step_started + speculative_seconds,
+                        sum(r.get('tokens', 0) for r in results[first_result:])
                     )
-                    results.append(result)
 
-            # Update context for next step
-            current_context = result['response']
+                    # Update context for next step
+                    current_context = result['response']
 
-        return {
+                if speculation is not None:
+                    kept = speculation.collect()
+        finally:
+            if speculation is not None:
+                speculation.close()
+
+        output = {
             "workflow": workflow_name,
             "steps_completed": len(results),
             "results": results,
             "final_output": current_context
         }
+        summary = speculation.summary() if speculation is not None else None
+        if summary:
+            output["speculation"] = summary
+        return output
+
+    @staticmethod
+    def _uses_map_reduce(step: Dict[str, Any], context: str) -> bool:
+        """Whether a step splits this input and maps over the chunks"""
+        map_reduce = step.get('map_reduce')
+        chunk_tokens = (map_reduce or {}).get('chunk_tokens', 8000)
+        return bool(map_reduce) and len(context) > chunk_tokens * CHARS_PER_TOKEN
+
+    def run_discussion(
+        self,
+        topic: str,
+        team: Optional[str] = None,
+        agents: Optional[List[str]] = None,
+        max_rounds: Optional[int] = None,
+        cancel_token: Optional[CancellationToken] = None
+    ) -> Dict[str, Any]:
+        """Execute run_discussion tool.
+
+        All participants answer each round concurrently, so a round takes as
+        long as its slowest agent. Agents still running at the round timeout
+        are cancelled and the round continues without them.
+        """
+
+        settings = self.config.get('discussion', {}) or {}
+        participants = resolve_participants(self.config, team, agents)
+        max_rounds = max_rounds or settings.get('maxRounds', 3)
+        round_timeout = settings.get('timeout', 180)
+        max_context = settings.get('maxContext', 50000)
+        transcript = Transcript(max_context)
+        detector = ConvergenceDetector.from_config(self.config)
+        rounds = []
+        discussion_id = uuid.uuid4().hex[:8]
+        for p in participants:
+            p['system_prompt'] = p['system_prompt'] or self._build_role_prompt(p['agent_id'], p['role'])
+        # The shared prompt has to fit the smallest window among the participants
+        budget = min(
+            context_budget(self.config, p['agent_id']) - token_estimator.estimate(p['system_prompt'])
+            for p in participants
+        )
+
+        try:
+            with ThreadPoolExecutor(max_workers=len(participants)) as pool:
+                for round_number in range(1, max_rounds + 1):
+                    if cancel_token is not None:
+                        cancel_token.raise_if_cancelled()
+
+                    topic_text = f"Topic:\n{topic}\n\n"
+                    if len(transcript):
+                        instructions = "Respond to the other participants and refine your position."
+                    else:
+                        instructions = "Give your position on the topic."
+                    if detector.should_steer:
+                        instructions += f"\n\n{STEER_PROMPT}"
+
+                    # The transcript gets what maxContext (characters) leaves after topic and instructions
+                    parts = [PromptPart(topic_text, priority=2, label="topic", required=True)]
+                    room = max_context - len(topic_text) - len(instructions) - len("Discussion so far:\n")
+                    notes = []
+                    if len(transcript) and room > 0:
+                        history = transcript.render()
+                        if len(history) > room:
+                            history = shorten(history, room)
+                            notes.append("shortened transcript")
+                        parts.append(PromptPart(f"Discussion so far:\n{history}", priority=0, label="transcript"))
+                    elif len(transcript):
+                        notes.append("dropped transcript")
+                    parts.append(PromptPart(instructions, priority=1, label="instructions", required=True))
+                    parts, window_notes = fit_prompt(parts, budget)
+                    notes += window_notes
+                    if notes:
+                        print(f"[Tokens] Discussion round {round_number}: {', '.join(notes)}")
+                    prompt = "".join(part.text for part in parts)
+
+                    # Cancelling the round token kills this round's stragglers only
+                    round_token = cancel_token.child() if cancel_token else CancellationToken()
+                    started = time.monotonic()
+                    try:
+                        futures = {
+                            _submit(
+                                pool,
+                                self._run_in_scope,
+                                f"discussion:{discussion_id}:{p['name']}",
+                                agent_id=p['agent_id'],
+                                prompt=prompt,
+                                system_prompt=p['system_prompt'],
+                                model=p['model'],
+                                timeout=round_timeout,
+                                cancel_token=round_token
+                            ): p
+                            for p in participants
+                        }
+                        done, pending = wait(futures, timeout=round_timeout)
+                        if pending:
+                            round_token.cancel("discussion round timeout")
+                            wait(pending)
+                    finally:
+                        round_token.detach()
+                    if cancel_token is not None:
+                        cancel_token.raise_if_cancelled()
+
+                    contributions = []
+                    for future, p in futures.items():  # participant order, not finish order
+                        entry = {"name": p['name'], "agent": p['agent_id']}
+                        if future in pending:
+                            entry["error"] = f"no answer within {round_timeout}s"
+                        elif future.exception() is not None:
+                            entry["error"] = str(future.exception())
+                        else:
+                            entry["response"] = future.result().text
+                            entry["input_tokens"] = _record_input_tokens(
+                                p['agent_id'], p['system_prompt'] + prompt, future.result()
+                            )
+                            transcript.add(p['name'], round_number, entry["response"])
+                            self.index.add(
+                                f"{topic}\n{entry['response']}",
+                                {"source": "discussion", "agent": p['agent_id'], "role": p['role'],
+                                 "task": topic, "response": entry["response"]},
+                                owner=self.cli.session_id
+                            )
+                        contributions.append(entry)
+
+                    answers = [c["response"] for c in contributions if "response" in c]
+                    if not answers:
+                        raise RuntimeError(f"No participant answered in round {round_number}")
+                    novelty = detector.observe(answers)
+                    rounds.append({
+                        "round": round_number,
+                        "seconds": round(time.monotonic() - started, 1),
+                        "novelty": novelty,
+                        "contributions": contributions
+                    })
+                    print(
+                        f"[Discussion] Round {round_number}: {len(answers)}/{len(participants)} "
+                        f"answers in {rounds[-1]['seconds']}s"
+                    )
+
+                    if detector.converged:
+                        print(f"[Discussion] Converged (novelty {novelty:.0%}), ending discussion")
+                        break
+        finally:
+            # Also when cancelled or a round failed: the sessions must not outlive the discussion
+            for p in participants:
+                self.cli.release_scope(f"discussion:{discussion_id}:{p['name']}")
+
+        self.conversation_history.append({
+            "agent": ", ".join(p['name'] for p in participants),
+            "role": "discussion",
+            "task": topic,
+            "response": transcript.render()
+        })
+
+        return {
+            "topic": topic,
+            "participants": [p['name'] for p in participants],
+            "rounds_completed": len(rounds),
+            "converged": detector.converged,
+            "rounds": rounds,
+            "transcript": transcript.render()
+        }
+
+    def _run_in_scope(self, scope: str, **kwargs) -> CLIResponse:
+        """run_cli in a session scope that lasts across calls (pool threads start unscoped)"""
+        with self.cli.scope(scope, release=False):
+            return self.cli.run_cli(**kwargs)
+
+    def estimate(
+        self,
+        workflow_name: Optional[str] = None,
+        agents: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """Predicted p50/p95 duration, tokens and cost of a workflow or consensus"""
+        if workflow_name:
+            return self.estimator.estimate_workflow(self.config, workflow_name)
+        if agents:
+            return self.estimator.estimate_consensus(agents)
+        raise ValueError("Estimate needs a workflow_name or a list of agents")
+
+    def search_past_work(self, query: str, limit: int = 5) -> Dict[str, Any]:
+        """Execute search_past_work tool"""
+
+        matches = self.index.search(query, limit=limit, owner=self.cli.session_id)
+        snippet_chars = (self.config.get('retrieval') or {}).get('snippet_chars', 1500)
+
+        for match in matches:
+            if len(match['response']) > snippet_chars:
+                match['response'] = match['response'][:snippet_chars] + " [...]"
+
+        return {
+            "query": query,
+            "indexed_entries": self.index.count(owner=self.cli.session_id),
+            "matches": matches
+        }
+
+    def _run_map_reduce(
+        self,
+        step: Dict[str, Any],
+        input_data: str,
+        cancel_token: Optional[CancellationToken] = None,
+        progress: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> Dict[str, Any]:
+        """Map the step's task over chunks of the input in parallel, then merge.
+
+        Chunks are spread round-robin over ``map_reduce.agents`` (default: the
+        step's agent) with at most ``max_parallel`` calls in flight. Findings
+        that are too large for one reduce call are merged in groups first.
+        """
+
+        settings = step['map_reduce']
+        chunk_tokens = settings.get('chunk_tokens', 8000)
+        chunks = split_input(input_data, settings.get('split', 'auto'), chunk_tokens)
+        agents = settings.get('agents') or [step['agent']]
+        reduce_agent = settings.get('reduce_agent', step['agent'])
+        reduce_task = settings.get(
+            'reduce_task',
+            "Merge these findings from different parts of the input into one result. "
+            "Remove duplicates and keep every distinct point."
+        )
+        scope = uuid.uuid4().hex[:8]
+        print(f"[Workflow] Map-reduce over {len(chunks)} chunks ({len(input_data)} chars)")
+
+        def map_chunk(number: int, chunk: str) -> Dict[str, Any]:
+            # Pool threads start unscoped; give every chunk its own sessions
+            with self.cli.scope(f"map:{scope}:{number}"):
+                return self.call_agent(
+                    agent_id=agents[number % len(agents)],
+                    role=step['role'],
+                    task=(
+                        f"{step['task']}\n\n"
+                        f"This is part {number + 1} of {len(chunks)} of the input:\n{chunk}"
+                    ),
+                    cancel_token=cancel_token
+                )
+
+        def report(event: Dict[str, Any]):
+            print(
+                f"[Workflow] Chunk {event['chunk'] + 1}/{event['of']} "
+                f"{'failed' if 'error' in event else 'done'} ({event['agent']}, {event['seconds']}s)"
+            )
+            if progress is not None:
+                progress(event)
+
+        findings: Dict[int, str] = {}
+        chunk_log = []
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=settings.get('max_parallel', 4)) as pool:
+            futures = {_submit(pool, map_chunk, n, chunk): n for n, chunk in enumerate(chunks)}
+            for future in as_completed(futures):
+                number = futures[future]
+                event = {
+                    "chunk": number,
+                    "of": len(chunks),
+                    "agent": agents[number % len(agents)],
+                    "chars": len(chunks[number]),
+                    "seconds": round(time.monotonic() - started, 1),
+                }
+                if future.exception() is not None:
+                    event["error"] = str(future.exception())
+                else:
+                    findings[number] = future.result()['response']
+                chunk_log.append(event)
+                report(event)
+
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+        if not findings:
+            raise RuntimeError(f"All {len(chunks)} map-reduce chunks failed")
+
+        # Missing parts either fail the step or are called out to the reducer
+        note = None
+        failed = [n for n in range(len(chunks)) if n not in findings]
+        if failed:
+            note = (
+                f"Chunks {_number_ranges(failed)} of {len(chunks)} failed; "
+                f"the findings do not cover those parts of the input."
+            )
+            if settings.get('on_chunk_error', 'note') == 'fail':
+                raise RuntimeError(f"Map-reduce: {note}")
+            print(f"[Workflow] {note}")
+            reduce_task = f"{reduce_task}\n\nNote: {note}"
+
+        # Reduce, in groups while the findings exceed one chunk
+        parts = [f"[Part {n + 1}]\n{findings[n]}\n\n" for n in sorted(findings)]
+        while True:
+            groups = split_input("".join(parts), "tokens", chunk_tokens) if len(parts) > 1 else parts
+            merged = [
+                self.call_agent(
+                    agent_id=reduce_agent,
+                    role=step['role'],
+                    task=f"{reduce_task}\n\nFindings:\n{group}",
+                    cancel_token=cancel_token
+                )
+                for group in groups
+            ]
+            if len(merged) == 1 or len(groups) >= len(parts):
+                break
+            parts = [f"{m['response']}\n\n" for m in merged]
+
+        result = merged[0] if len(merged) == 1 else {
+            **merged[-1], "response": "\n\n".join(m['response'] for m in merged)
+        }
+        result['chunks'] = sorted(chunk_log, key=lambda e: e['chunk'])
+        if note:
+            result['note'] = note
+        return result
+
+    def _refine_fused(
+        self,
+        step: Dict[str, Any],
+        task: str,
+        result: Dict[str, Any],
+        results: List[Dict[str, Any]],
+        cancel_token: Optional[CancellationToken] = None
+    ) -> Dict[str, Any]:
+        """Refine a step output with one combined review-and-revise call per round.
+
+        Stops when the agent approves, when a revision changes less than
+        ``convergence_threshold`` of the output, or after ``max_iterations``.
+        """
+
+        threshold = step.get('convergence_threshold', 0.05)
+
+        for iteration in range(step['max_iterations'] - 1):
+            revision = self.call_agent(
+                agent_id=step['agent'],
+                role=step['role'],
+                task=(
+                    f"Original task:\n{task}\n\n"
+                    f"Current output:\n{result['response']}\n\n"
+                    f"Critically review the current output against the task. "
+                    f"If no changes are needed, reply with only APPROVED. "
+                    f"Otherwise reply with the complete revised output and nothing else."
+                ),
+                cancel_token=cancel_token
+            )
+
+            # Approval (with or without a remark) keeps the current output
+            if _APPROVED.match(revision['response']):
+                break
+
+            change = change_ratio(result['response'], revision['response'])
+            revision['change_ratio'] = change
+            results.append(revision)
+            result = revision
+
+            if change < threshold:
+                print(
+                    f"[Workflow] Converged after {iteration + 1} revision(s) "
+                    f"(change {change:.1%} < {threshold:.1%})"
+                )
+                break
+
+        return result
 
     def _build_role_prompt(self, agent_id: str, role: str) -> str:
         """Build system prompt based on role"""
@@ -298,14 +1078,23 @@ class OrchestratorTools:
 
         return base_prompt
 
-    def execute_tool(self, tool_name: str, tool_input: Dict[str, Any]) -> Dict[str, Any]:
+    def execute_tool(
+        self,
+        tool_name: str,
+        tool_input: Dict[str, Any],
+        cancel_token: Optional[CancellationToken] = None
+    ) -> Dict[str, Any]:
         """Execute a tool by name"""
 
         if tool_name == "call_agent":
-            return self.call_agent(**tool_input)
+            return self.call_agent(**tool_input, cancel_token=cancel_token)
         elif tool_name == "create_consensus":
-            return self.create_consensus(**tool_input)
+            return self.create_consensus(**tool_input, cancel_token=cancel_token)
         elif tool_name == "run_workflow":
-            return self.run_workflow(**tool_input)
+            return self.run_workflow(**tool_input, cancel_token=cancel_token)
+        elif tool_name == "run_discussion":
+            return self.run_discussion(**tool_input, cancel_token=cancel_token)
+        elif tool_name == "search_past_work":
+            return self.search_past_work(**tool_input)
         else:
             raise ValueError(f"Unknown tool: {tool_name}")
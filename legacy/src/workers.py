@@ -0,0 +1,184 @@
+"""Remote agent execution through the shared job queue"""
+
+import os
+import socket
+import threading
+import time
+from dataclasses import asdict
+from typing import Any, Dict, List, Optional
+
+from .cancellation import CancellationToken, OperationCancelled
+from .cli_runners import CLIRunner, CLIResponse
+from .state import JobFailed, StateBackend
+
+# How often a worker renews the lease of the job it is running
+LEASE_RENEW_SECONDS = 10
+
+
+def node_id() -> str:
+    """Identifier of this process, used for worker IDs and routing hints"""
+    return os.getenv("OPENBOTMAN_NODE_ID") or f"{socket.gethostname()}-{os.getpid()}"
+
+
+class RemoteCLIRunner(CLIRunner):
+    """CLIRunner that hands each call to an agent-worker node via the job queue.
+
+    Session IDs are still tracked here and travel with the job, so any worker
+    can continue an agent's CLI session.
+    """
+
+    def __init__(
+        self,
+        config: Dict[str, Any],
+        backend: StateBackend,
+        job_timeout: float = 600,
+        **kwargs
+    ):
+        super().__init__(config, **kwargs)
+        self.backend = backend
+        self.job_timeout = job_timeout
+
+    def run_cli(
+        self,
+        agent_id: str,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        model: Optional[str] = None,
+        timeout: int = 120,
+        priority: Optional[str] = None,
+        cancel_token: Optional[CancellationToken] = None
+    ) -> CLIResponse:
+        """Queue the call for a worker and wait for its response"""
+
+        if agent_id not in self.config['agents']:
+            raise ValueError(f"Unknown agent: {agent_id}")
+
+        session_id, fork_from = self._claim_session(agent_id)
+
+        job_id = self.backend.enqueue_job(agent_id, {
+            'agent_id': agent_id,
+            'prompt': prompt,
+            'system_prompt': system_prompt,
+            'model': model,
+            'timeout': timeout,
+            'session_id': session_id,
+            'fork_from': fork_from,
+        })
+        print(f"[CLI] Queued {agent_id} job {job_id[:8]} (prompt: {len(prompt)} chars)")
+
+        try:
+            result = self.backend.wait_job(
+                job_id, timeout=self.job_timeout, cancel_token=cancel_token
+            )
+        except (OperationCancelled, TimeoutError) as e:
+            # Nobody will collect the job: take it back, or stop its worker
+            # (which polls for this, kills its CLI process and deletes the job)
+            if not self.backend.withdraw_job(job_id):
+                self.backend.put("cancelled_jobs", job_id, str(e))
+            raise
+        except JobFailed:
+            self.backend.delete_job(job_id)
+            raise
+        self.backend.delete_job(job_id)
+        return CLIResponse(**result)
+
+
+class AgentWorker:
+    """Pulls agent jobs from the queue and runs them with a local CLIRunner"""
+
+    def __init__(
+        self,
+        config: Dict[str, Any],
+        backend: StateBackend,
+        worker_id: Optional[str] = None,
+        agents: Optional[List[str]] = None
+    ):
+        self.backend = backend
+        self.worker_id = worker_id or node_id()
+        self.agents = agents or list(config['agents'].keys())
+        self.runner = CLIRunner(config, session_id=self.worker_id)
+        self.completed = 0
+        self._stop = threading.Event()
+
+    def run_once(self) -> bool:
+        """Process one job if available; returns False when the queue was empty"""
+        job = self.backend.claim_job(self.agents, self.worker_id)
+        if not job:
+            return False
+
+        if self.backend.get("cancelled_jobs", job['id']):
+            self.backend.delete_job(job['id'])
+            self.backend.delete("cancelled_jobs", job['id'])
+            return True
+
+        payload = job['payload']
+        self.runner.set_session(
+            payload['agent_id'], payload['session_id'], payload.get('fork_from')
+        )
+
+        cancel_token = CancellationToken()
+        done = threading.Event()
+        watcher = threading.Thread(
+            target=self._watch_cancellation,
+            args=(job['id'], cancel_token, done),
+            daemon=True
+        )
+        watcher.start()
+
+        try:
+            response = self.runner.run_cli(
+                agent_id=payload['agent_id'],
+                prompt=payload['prompt'],
+                system_prompt=payload.get('system_prompt'),
+                model=payload.get('model'),
+                timeout=payload.get('timeout', 120),
+                cancel_token=cancel_token
+            )
+            self.backend.finish_job(job['id'], result=asdict(response))
+        except Exception as e:
+            if cancel_token.cancelled:
+                # The requester gave up on the job, so there is no one to report to
+                self.backend.delete_job(job['id'])
+            else:
+                self.backend.finish_job(job['id'], error=str(e))
+        finally:
+            done.set()
+            self.backend.delete("cancelled_jobs", job['id'])
+
+        self.completed += 1
+        return True
+
+    def _watch_cancellation(
+        self,
+        job_id: str,
+        cancel_token: CancellationToken,
+        done: threading.Event,
+        poll_interval: float = 0.25
+    ):
+        """Cancel the local CLI call when the requesting node gives up on the job.
+
+        Also keeps the job's lease alive so no other worker takes it over.
+        """
+        renewed = time.monotonic()
+        while not done.wait(poll_interval):
+            reason = self.backend.get("cancelled_jobs", job_id)
+            if reason:
+                cancel_token.cancel(reason)
+                return
+            if time.monotonic() - renewed >= LEASE_RENEW_SECONDS:
+                self.backend.renew_job(job_id, self.worker_id)
+                renewed = time.monotonic()
+
+    def run_forever(self, poll_interval: float = 0.2, exit_when_idle: Optional[float] = None):
+        """Serve jobs until stopped (or until idle for ``exit_when_idle`` seconds)"""
+        idle_since = time.monotonic()
+        while not self._stop.is_set():
+            if self.run_once():
+                idle_since = time.monotonic()
+                continue
+            if exit_when_idle is not None and time.monotonic() - idle_since > exit_when_idle:
+                break
+            self._stop.wait(poll_interval)
+
+    def stop(self):
+        self._stop.set()
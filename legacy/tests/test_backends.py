@@ -0,0 +1,164 @@
+"""Tests for agent backends against a local stub HTTP server"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from src.backends import AgentBackend, ConnectionPool, HTTPAgentBackend
+from src.cancellation import CancellationToken, OperationCancelled
+from src.cli_runners import CLIRunner
+from src.config import validate_config
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        server = self.server
+        server.requests.append((self.path, dict(self.headers), body))
+        server.connections.add(self.client_address)
+        if server.drop_next:
+            # Like a server that closed an idle keep-alive connection
+            server.drop_next = False
+            self.close_connection = True
+            return
+        time.sleep(server.delay)
+
+        if server.status != 200:
+            reply = {"error": {"message": "overloaded"}}
+        elif self.path == "/v1/messages":
+            reply = {
+                "content": [{"type": "text", "text": f"echo: {body['messages'][0]['content']}"}],
+                "usage": {"input_tokens": 12, "output_tokens": 3},
+            }
+        else:
+            reply = {
+                "choices": [{"message": {"role": "assistant", "content": "openai reply"}}],
+                "usage": {"prompt_tokens": 7, "completion_tokens": 2},
+            }
+
+        data = json.dumps(reply).encode()
+        self.send_response(server.status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    server.requests = []
+    server.connections = set()
+    server.delay = 0
+    server.status = 200
+    server.drop_next = False
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _agent(server, **overrides):
+    return {
+        "backend": "http",
+        "base_url": f"http://127.0.0.1:{server.server_address[1]}",
+        "default_model": "stub-model",
+        "api_key_env": "OPENBOTMAN_TEST_KEY",
+        "pool_size": 2,
+        **overrides,
+    }
+
+
+def test_cli_runner_is_a_backend():
+    assert isinstance(CLIRunner({"agents": {}}), AgentBackend)
+
+
+def test_anthropic_api_through_cli_runner(stub_server, monkeypatch):
+    monkeypatch.setenv("OPENBOTMAN_TEST_KEY", "secret")
+    runner = CLIRunner({"agents": {"api": _agent(stub_server)}})
+
+    first = runner.run_cli("api", "hello", system_prompt="be brief")
+    second = runner.run_cli("api", "again", model="other-model")
+
+    assert first.text == "echo: hello"
+    assert first.usage == {"input": 12, "output": 3}
+    assert first.session_id is None
+    assert second.text == "echo: again"
+
+    path, headers, body = stub_server.requests[0]
+    assert path == "/v1/messages"
+    assert headers["x-api-key"] == "secret"
+    assert body["system"] == "be brief" and body["model"] == "stub-model"
+    assert stub_server.requests[1][2]["model"] == "other-model"
+    # Both calls went over one kept-alive connection
+    assert len(stub_server.connections) == 1
+
+
+def test_openai_api(stub_server, monkeypatch):
+    monkeypatch.setenv("OPENBOTMAN_TEST_KEY", "secret")
+    backend = HTTPAgentBackend(_agent(stub_server, api="openai"))
+
+    response = backend.run_cli("local", "hi", system_prompt="sys")
+
+    assert response.text == "openai reply"
+    assert response.usage == {"input": 7, "output": 2}
+    path, headers, body = stub_server.requests[0]
+    assert path == "/v1/chat/completions"
+    assert headers["Authorization"] == "Bearer secret"
+    assert body["messages"][0] == {"role": "system", "content": "sys"}
+
+
+def test_error_status_raises(stub_server):
+    stub_server.status = 529
+    backend = HTTPAgentBackend(_agent(stub_server, pool_size=3))
+
+    with pytest.raises(RuntimeError, match="HTTP backend failed: 529"):
+        backend.run_cli("api", "hi")
+
+
+def test_cancel_aborts_request(stub_server):
+    stub_server.delay = 5
+    backend = HTTPAgentBackend(_agent(stub_server, pool_size=5))
+    token = CancellationToken()
+    threading.Timer(0.2, token.cancel, args=("client disconnected",)).start()
+
+    started = time.monotonic()
+    with pytest.raises(OperationCancelled):
+        backend.run_cli("api", "hi", cancel_token=token)
+    assert time.monotonic() - started < 2
+
+
+def test_pool_retries_only_stale_connections(stub_server):
+    """A dropped keep-alive connection is retried; a timeout is not"""
+    pool = ConnectionPool(f"http://127.0.0.1:{stub_server.server_address[1]}", size=1)
+    body = {"messages": [{"content": "hi"}]}
+    assert pool.request("/v1/messages", body, {}, timeout=5)[0] == 200
+
+    stub_server.drop_next = True
+    assert pool.request("/v1/messages", body, {}, timeout=5)[0] == 200
+    assert len(stub_server.requests) == 3
+    assert pool.connections_opened == 2
+
+    # The server got the request and is working on it: sending it again
+    # would run (and bill) the model call twice
+    stub_server.delay = 1
+    with pytest.raises(TimeoutError):
+        pool.request("/v1/messages", body, {}, timeout=0.3)
+    assert len(stub_server.requests) == 4
+
+
+def test_validate_config_accepts_http_agents():
+    validate_config({"agents": {"api": {"backend": "http", "api": "openai"}}})
+    with pytest.raises(ValueError, match="cli"):
+        validate_config({"agents": {"x": {"args": []}}})
+    with pytest.raises(ValueError, match="api"):
+        validate_config({"agents": {"x": {"backend": "http", "api": "grpc"}}})
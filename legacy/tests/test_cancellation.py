@@ -0,0 +1,143 @@
+"""Tests for cancellation of chat turns and CLI processes"""
+
+import os
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from src.cancellation import CancellationToken, OperationCancelled, cancellation_stats
+from src.cli_runners import CLIRunner
+from src.scheduler import AgentScheduler
+
+# Stand-in CLI that starts a grandchild, records its PID and hangs
+HANG_SCRIPT = (
+    "import subprocess, sys, time; "
+    "child = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)']); "
+    "open(sys.argv[1], 'w').write(str(child.pid)); "
+    "time.sleep(60)"
+)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    # Reaped by init shortly after being killed; treat zombies as dead
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().split()[2] != "Z"
+    except FileNotFoundError:
+        return False
+
+
+def test_token_callbacks_and_children():
+    token = CancellationToken()
+    child = token.child()
+    calls = []
+    unregister = token.on_cancel(lambda: calls.append("a"))
+    token.on_cancel(lambda: calls.append("b"))
+    unregister()
+
+    token.cancel("stop")
+
+    assert calls == ["b"]
+    assert child.cancelled and child.reason == "stop"
+    with pytest.raises(OperationCancelled):
+        token.raise_if_cancelled()
+
+    late = []
+    token.on_cancel(lambda: late.append(True))
+    assert late == [True]
+
+
+def test_detached_child_releases_parent():
+    """Finished children do not pile up callbacks on a long-lived parent"""
+    token = CancellationToken()
+    for _ in range(100):
+        token.child().detach()
+    assert token._callbacks == {}
+
+    child = token.child()
+    child.detach()
+    token.cancel()
+    assert not child.cancelled
+
+
+@pytest.mark.skipif(os.name == "nt", reason="uses POSIX process groups")
+def test_cancel_kills_process_tree(tmp_path):
+    """Cancelling run_cli kills the CLI and everything it spawned"""
+    pid_file = tmp_path / "grandchild.pid"
+    runner = CLIRunner({
+        "agents": {"hang": {"cli": sys.executable, "args": ["-c", HANG_SCRIPT, str(pid_file)]}}
+    })
+    token = CancellationToken()
+    before = cancellation_stats.get_stats()["cancelled_calls"]
+
+    def cancel_when_started():
+        while not pid_file.exists() or not pid_file.read_text():
+            time.sleep(0.02)
+        token.cancel("test")
+
+    threading.Thread(target=cancel_when_started).start()
+    started = time.monotonic()
+    with pytest.raises(OperationCancelled):
+        runner.run_cli("hang", "prompt", timeout=30, cancel_token=token)
+
+    assert time.monotonic() - started < 10
+    grandchild = int(pid_file.read_text())
+    deadline = time.monotonic() + 5
+    while _alive(grandchild) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not _alive(grandchild)
+    assert cancellation_stats.get_stats()["cancelled_calls"] == before + 1
+
+
+def test_cancel_while_waiting_for_slot():
+    """A queued call gives up its place when cancelled"""
+    scheduler = AgentScheduler(max_concurrent=1)
+    token = CancellationToken()
+
+    with scheduler.slot("a"):
+        threading.Timer(0.1, token.cancel).start()
+        with pytest.raises(OperationCancelled):
+            with scheduler.slot("a", cancel_token=token):
+                pass
+
+    assert scheduler.get_stats()["queued"] == 0
+
+
+def test_cancelled_chat_turn_is_rolled_back(tmp_path, monkeypatch):
+    """A cancelled turn leaves no dangling tool_use in the conversation"""
+    from src.orchestrator import MultiAgentOrchestrator
+
+    config_file = tmp_path / "config.yaml"
+    config_file.write_text(
+        "orchestrator:\n  model: test\n  max_iterations: 3\n"
+        "agents:\n  claude_code:\n    cli: claude\n"
+    )
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test")
+    orch = MultiAgentOrchestrator(str(config_file))
+    token = CancellationToken()
+
+    tool_use = SimpleNamespace(
+        type="tool_use", id="t1", name="call_agent",
+        input={"agent_id": "claude_code", "role": "coder", "task": "x"}
+    )
+    orch.client = SimpleNamespace(messages=SimpleNamespace(
+        create=lambda **kwargs: SimpleNamespace(content=[tool_use], stop_reason="tool_use")
+    ))
+
+    def cancelled_call(**kwargs):
+        token.cancel("client disconnected")
+        token.raise_if_cancelled()
+
+    monkeypatch.setattr(orch.tools, "call_agent", cancelled_call)
+    orch.messages = [{"role": "user", "content": "earlier"}]
+
+    with pytest.raises(OperationCancelled):
+        orch.chat("new request", cancel_token=token)
+
+    assert orch.messages == [{"role": "user", "content": "earlier"}]
@@ -0,0 +1,105 @@
+"""Tests for the model cascade"""
+
+import pytest
+from src.cascade import CascadeStats, ModelCascade, score_confidence
+from src.cli_runners import CLIResponse
+
+CONFIG = {
+    "cascade": {
+        "reviewer": {
+            "min_confidence": 0.6,
+            "baseline_seconds": 30,
+            "tiers": {"claude_code": ["haiku", "sonnet"]}
+        },
+        "consensus": {
+            "tiers": {"gemini": ["flash", "pro"]}
+        }
+    }
+}
+
+
+class FakeCLI:
+    def __init__(self, answers):
+        self.answers = answers
+        self.models = []
+
+    def run_cli(self, agent_id, prompt, model=None, **kwargs):
+        self.models.append(model)
+        self.prompt = prompt
+        return CLIResponse(text=self.answers[model])
+
+
+@pytest.mark.parametrize("text, role, expected", [
+    ("", "reviewer", 0.0),
+    ("I vote APPROVE because the design is sound.", "consensus", 0.9),
+    ("APPROVE or REJECT, hard to decide.", "consensus", 0.1),
+    ("Looks fine overall.\nConfidence: 85%", "reviewer", 0.85),
+    ("Looks fine overall.\n**Confidence:** 85%", "reviewer", 0.85),
+    ("Confidence: 0.3", "reviewer", 0.3),
+    # Only the last line counts, not code or config that mentions a confidence
+    ("class Vote:\n    def __init__(self):\n        self.confidence = 1\nI am not sure.", "coder", 0.3),
+    ("Set min_confidence: 0.9 in the cascade policy to escalate more often.", "coder", 0.5),
+])
+def test_score_confidence(text, role, expected):
+    assert score_confidence(text, role) == pytest.approx(expected)
+
+
+def test_missing_confidence_line_scores_low():
+    """An answer that skips the requested confidence line does not settle"""
+    plain = "The cache invalidation is wrong because keys never expire after writes."
+    hedged = "I'm not sure, it depends on the workload and the details are unclear."
+    assert 0.6 > score_confidence(plain, "reviewer") > score_confidence(hedged, "reviewer")
+
+
+def test_cheap_tier_settles():
+    stats = CascadeStats()
+    cli = FakeCLI({"haiku": "The loop on line 12 never terminates for empty input lists.\n\nConfidence: 90%"})
+
+    response, info = ModelCascade(CONFIG, stats).run(cli, "claude_code", "reviewer", "Review")
+
+    assert cli.models == ["haiku"]
+    assert "Confidence: NN%" in cli.prompt
+    assert response.text == "The loop on line 12 never terminates for empty input lists."
+    assert info == {"model": "haiku", "tier": 0, "confidence": 0.9}
+    assert stats.get_stats()["settled_by_tier"] == {"reviewer": {0: 1}}
+    assert stats.get_stats()["saved_seconds"] > 29
+
+
+def test_escalates_on_low_confidence():
+    stats = CascadeStats()
+    cli = FakeCLI({"flash": "APPROVE? REJECT? Unclear.", "pro": "REJECT: missing tests."})
+
+    response, info = ModelCascade(CONFIG, stats).run(cli, "gemini", "consensus", "Vote")
+
+    assert cli.models == ["flash", "pro"]
+    assert response.text == "REJECT: missing tests."
+    assert info["tier"] == 1
+    assert stats.get_stats()["settled_by_tier"] == {"consensus": {1: 1}}
+
+
+def test_no_policy_uses_default_model():
+    cli = FakeCLI({None: "default answer"})
+
+    response, info = ModelCascade(CONFIG, CascadeStats()).run(cli, "claude_code", "coder", "Code")
+
+    assert cli.models == [None]
+    assert info is None
+
+
+@pytest.mark.parametrize("weak_answer", [
+    "The function looks mostly fine, though error handling could be improved in places.\n"
+    "Confidence: 40%",
+    "The function looks mostly fine, though error handling could be improved in places.",
+])
+def test_escalates_on_weak_review(weak_answer):
+    """A vague cheap-tier review, rated low or not rated at all, goes to the next tier"""
+    cli = FakeCLI({
+        "haiku": weak_answer,
+        "sonnet": "Line 40 swallows the KeyError and returns None to the caller.\nConfidence: 85%",
+    })
+
+    response, info = ModelCascade(CONFIG, CascadeStats()).run(cli, "claude_code", "reviewer", "Review")
+
+    assert cli.models == ["haiku", "sonnet"]
+    assert info["tier"] == 1
+    assert response.text.startswith("Line 40")
@@ -0,0 +1,47 @@
+"""Tests for splitting large inputs into chunks"""
+
+import pytest
+from src.chunking import split_input
+
+
+def _source(name, functions):
+    body = "".join(f"def {name}_{i}():\n    return {i}\n\n" for i in range(functions))
+    return f"### File: {name}.py\n{body}"
+
+
+def test_small_input_is_one_chunk():
+    assert split_input("short text", chunk_tokens=100) == ["short text"]
+
+
+def test_split_on_file_boundaries():
+    text = _source("alpha", 3) + _source("beta", 3) + _source("gamma", 3)
+
+    chunks = split_input(text, "auto", chunk_tokens=40)
+
+    assert len(chunks) == 3
+    assert "".join(chunks) == text
+    assert all(c.startswith("### File:") for c in chunks)
+
+
+def test_oversized_file_falls_back_to_functions():
+    text = _source("big", 30)
+
+    chunks = split_input(text, "file", chunk_tokens=50)
+
+    assert len(chunks) > 1
+    assert "".join(chunks) == text
+    assert all(c.startswith(("### File:", "def ")) for c in chunks)
+
+
+def test_token_mode_splits_on_lines():
+    text = "".join(f"line {i}\n" for i in range(200))
+
+    chunks = split_input(text, "tokens", chunk_tokens=25)
+
+    assert all(len(c) <= 100 and c.endswith("\n") for c in chunks)
+    assert "".join(chunks) == text
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        split_input("x" * 1000, "paragraph", chunk_tokens=10)
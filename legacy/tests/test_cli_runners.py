@@ -1,8 +1,30 @@
 """Tests for CLI runners"""
 
+import json
+import sys
+import threading
+
 import pytest
 from src.cli_runners import CLIRunner, CLIResponse
 
+# Stand-in CLI that echoes its arguments (prompt last) as JSON
+ARGV_SCRIPT = "import json, sys; print(json.dumps({'text': json.dumps(sys.argv[1:])}))"
+
+
+@pytest.fixture
+def argv_config():
+    return {
+        "agents": {
+            "echo": {
+                "cli": sys.executable,
+                "args": ["-c", ARGV_SCRIPT],
+                "session_arg": "--session-id",
+                "resume_arg": "--resume",
+                "fork_arg": "--fork-session",
+            }
+        }
+    }
+
 
 def test_cli_response_dataclass():
     """Test CLIResponse dataclass"""
@@ -56,5 +78,59 @@ def test_session_management():
     assert "test_agent" not in runner.sessions
 
 
+def test_scoped_sessions(argv_config):
+    """Calls in different scopes use different CLI sessions"""
+    runner = CLIRunner(argv_config)
+
+    runner.run_cli("echo", "main")
+    with runner.scope("review-1", release=False):
+        runner.run_cli("echo", "scoped")
+
+    assert set(runner.sessions) == {"echo", "echo@review-1"}
+    assert runner.sessions["echo"] != runner.sessions["echo@review-1"]
+    json.dumps(runner.sessions)
+
+    runner.release_scope("review-1")
+    assert set(runner.sessions) == {"echo"}
+
+
+def test_parallel_scopes_do_not_share_sessions(argv_config):
+    runner = CLIRunner(argv_config)
+    seen = {}
+
+    def review(n):
+        with runner.scope(f"review-{n}"):
+            args = json.loads(runner.run_cli("echo", f"task {n}").text)
+            seen[n] = args[args.index("--session-id") + 1]
+
+    threads = [threading.Thread(target=review, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(set(seen.values())) == 4
+    assert runner.sessions == {}
+
+
+def test_fork_session(argv_config):
+    """A forked scope resumes the parent session once, then continues on its own"""
+    runner = CLIRunner(argv_config)
+    assert not runner.fork_session("echo", "branch")  # parent not started yet
+
+    runner.run_cli("echo", "shared prefix")
+    parent = runner.sessions["echo"]
+    assert runner.fork_session("echo", "branch")
+
+    with runner.scope("branch"):
+        first = json.loads(runner.run_cli("echo", "one").text)
+        second = json.loads(runner.run_cli("echo", "two").text)
+
+    assert first[first.index("--resume") + 1] == parent
+    assert "--fork-session" in first
+    assert first[first.index("--session-id") + 1] != parent
+    assert "--resume" not in second
+
+
 # Note: Full CLI execution tests would require actual CLI binaries
 # Those are better done as integration tests
@@ -0,0 +1,78 @@
+"""Tests for config loading and the config snapshot"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from src.config import load_config, snapshot_path, validate_config
+
+LEGACY_DIR = Path(__file__).parent.parent
+
+CONFIG = """
+orchestrator:
+  model: claude-sonnet
+  max_iterations: 5
+agents:
+  claude_code:
+    cli: claude
+"""
+
+
+def test_snapshot_written_and_reused(tmp_path):
+    config_file = tmp_path / "config.yaml"
+    config_file.write_text(CONFIG)
+
+    config = load_config(str(config_file))
+
+    assert config["agents"]["claude_code"]["cli"] == "claude"
+    assert snapshot_path(config_file).exists()
+
+    # A fresh process loads from the snapshot without importing yaml
+    result = subprocess.run(
+        [sys.executable, "-c",
+         f"import sys; from src.config import load_config; "
+         f"load_config({str(config_file)!r}); print('yaml' in sys.modules)"],
+        cwd=LEGACY_DIR, capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == "False"
+
+
+def test_snapshot_rebuilt_when_source_changes(tmp_path):
+    config_file = tmp_path / "config.yaml"
+    config_file.write_text(CONFIG)
+    load_config(str(config_file))
+
+    config_file.write_text(CONFIG + "  gemini:\n    cli: gemini\n")
+    stat = config_file.stat()
+    os.utime(config_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+    assert "gemini" in load_config(str(config_file))["agents"]
+
+
+def test_load_returns_independent_copies(tmp_path):
+    config_file = tmp_path / "config.yaml"
+    config_file.write_text(CONFIG)
+
+    first = load_config(str(config_file))
+    first["agents"].clear()
+
+    assert load_config(str(config_file))["agents"]
+
+
+def test_missing_config(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        load_config(str(tmp_path / "missing.yaml"))
+
+
+@pytest.mark.parametrize("config", [
+    None,
+    {"agents": {}},
+    {"agents": {"a": {"args": []}}},
+    {"agents": {"a": {"cli": "x"}}, "orchestrator": {"max_iterations": 3}},
+    {"agents": {"a": {"cli": "x"}}, "workflows": {"w": {"steps": "plan"}}},
+])
+def test_validate_config_rejects(config):
+    with pytest.raises(ValueError):
+        validate_config(config)
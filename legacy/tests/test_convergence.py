@@ -0,0 +1,57 @@
+"""Tests for the convergence detector"""
+
+from src.convergence import ConvergenceDetector, shingles, similarity
+
+
+def test_shingles_ignore_case_and_punctuation():
+    assert shingles("The cache is too small!") == shingles("the cache, is too small")
+    assert shingles("") == set()
+    assert len(shingles("two words")) == 1
+
+
+def test_similarity():
+    text = "we should add a cache in front of the database to cut latency"
+    assert similarity(text, text) == 1.0
+    assert similarity(text, "completely unrelated remarks about user interface colors") == 0.0
+
+
+def test_detector_flags_repetition():
+    """Rounds that restate earlier points have low novelty and end the exchange"""
+    detector = ConvergenceDetector(min_novelty=0.2, patience=2)
+
+    first = detector.observe([
+        "We should add a cache in front of the database.",
+        "The API needs rate limiting per client."
+    ])
+    assert first == 1.0
+    assert not detector.should_steer
+
+    repeated = detector.observe([
+        "So we should add a cache in front of the database."
+    ])
+    assert repeated < 0.2
+    assert detector.should_steer
+    assert not detector.converged
+
+    detector.observe(["The API needs rate limiting per client."])
+    assert detector.converged
+    assert len(detector.novelty) == 3
+
+
+def test_new_arguments_reset_stall():
+    detector = ConvergenceDetector(min_novelty=0.2, patience=2)
+    detector.observe(["Use PostgreSQL for storage of all session data."])
+    detector.observe(["Use PostgreSQL for storage of all session data."])
+    assert detector.should_steer
+
+    detector.observe(["Consider sharding sessions by tenant to spread write load."])
+    assert detector.stalled_rounds == 0
+
+
+def test_from_config_overrides():
+    detector = ConvergenceDetector.from_config(
+        {"convergence": {"min_novelty": 0.3, "patience": 4}},
+        {"patience": 1}
+    )
+    assert detector.min_novelty == 0.3
+    assert detector.patience == 1
@@ -0,0 +1,142 @@
+"""Tests for the run latency/cost estimator"""
+
+import time
+
+import pytest
+from src.cli_runners import CLIRunner, CLIResponse, CLITimeout
+from src.estimator import RunEstimator, percentile
+from src.tools import OrchestratorTools
+
+CONFIG = {
+    "agents": {"claude_code": {"cli": "claude"}, "gemini": {"cli": "gemini"}},
+    "workflows": {
+        "review": {
+            "steps": [
+                {"agent": "claude_code", "role": "coder", "task": "Write"},
+                {"agent": "gemini", "role": "reviewer", "task": "Review"},
+            ]
+        }
+    },
+}
+
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert percentile(values, 0.5) == 51
+    assert percentile(values, 0.95) == 96
+
+
+def test_adaptive_timeout():
+    estimator = RunEstimator(min_samples=3, default_timeout=120, min_timeout=5, max_timeout=100)
+    assert estimator.timeout_for("claude_code", "coder") == 120
+
+    for seconds in (10, 12, 14, 40):
+        estimator.record_call("claude_code", "coder", seconds, 500)
+    assert estimator.timeout_for("claude_code", "coder") == 60  # p95 40s * 1.5
+
+    for _ in range(10):
+        estimator.record_call("gemini", "reviewer", 500, 100)
+    assert estimator.timeout_for("gemini", "reviewer") == 100
+
+
+def test_workflow_estimate_and_persistence(tmp_path):
+    path = str(tmp_path / "runs.jsonl")
+    estimator = RunEstimator(path=path, min_samples=2, cost_per_1k_tokens={"claude_code": 0.01})
+    for seconds in (10, 20):
+        estimator.record_call("claude_code", "coder", seconds, 1000)
+
+    estimate = estimator.estimate_workflow(CONFIG, "review")
+    assert estimate["unknown"] == ["gemini/reviewer"]
+    assert estimate["seconds"]["p95"] == 20
+    assert estimate["cost"]["p50"] == pytest.approx(0.01)
+
+    # Step history (including refinement rounds) takes precedence
+    restored = RunEstimator(path=path, min_samples=2)
+    for seconds in (30, 30):
+        restored.record_step("review", 1, seconds, 300)
+    estimate = restored.estimate_workflow(CONFIG, "review")
+    assert estimate["unknown"] == []
+    assert 40 <= estimate["seconds"]["p50"] <= 50
+
+    with pytest.raises(ValueError):
+        restored.estimate_workflow(CONFIG, "missing")
+
+
+def test_tools_record_runs_and_pass_timeouts(monkeypatch):
+    tools = OrchestratorTools(CLIRunner(CONFIG), CONFIG)
+    tools.estimator = RunEstimator(min_samples=1, min_timeout=1)
+    timeouts = []
+
+    def fake_run_cli(agent_id, prompt, timeout=None, **kwargs):
+        timeouts.append(timeout)
+        time.sleep(0.01)
+        return CLIResponse(text="ok", usage={"input": 10, "output": 5})
+
+    monkeypatch.setattr(tools.cli, "run_cli", fake_run_cli)
+
+    tools.run_workflow("review", "input")
+    tools.run_workflow("review", "input")
+
+    assert timeouts[:2] == [120, 120]
+    assert timeouts[2] == 1  # learned: p95 of ~10ms, clamped to min_timeout
+    estimate = tools.estimate(workflow_name="review")
+    assert estimate["tokens"]["p50"] == 30
+    assert estimate["unknown"] == []
+
+
+def test_timeouts_back_off_and_prompt_size_scales(tmp_path):
+    path = str(tmp_path / "runs.jsonl")
+    estimator = RunEstimator(path=path, min_samples=3, min_timeout=5, max_timeout=1000)
+    for _ in range(4):
+        estimator.record_call("claude_code", "coder", 20, 500, prompt_tokens=1000)
+    assert estimator.timeout_for("claude_code", "coder") == 30
+    assert estimator.timeout_for("claude_code", "coder", prompt_tokens=500) == 30
+    assert estimator.timeout_for("claude_code", "coder", prompt_tokens=3000) == 90
+
+    # A timeout is a sample at the timeout value, and the next timeout backs off
+    estimator.record_call("claude_code", "coder", 30, 0, prompt_tokens=1000, timed_out=True)
+    assert estimator.timeout_for("claude_code", "coder") == 90  # p95 30s * 1.5 * 2
+
+    # Consecutive timeouts survive a restart; a completed call resets the backoff
+    restored = RunEstimator(path=path, min_samples=3, min_timeout=5, max_timeout=1000)
+    assert restored.timeout_for("claude_code", "coder") == 90
+    restored.record_call("claude_code", "coder", 20, 500, prompt_tokens=1000)
+    assert restored.timeout_for("claude_code", "coder") == 45
+
+
+def test_tools_record_cli_time_and_timeouts(monkeypatch):
+    tools = OrchestratorTools(CLIRunner(CONFIG), CONFIG)
+    tools.estimator = RunEstimator(min_samples=1, default_timeout=60, min_timeout=1)
+
+    def slow_queue(agent_id, prompt, timeout=None, **kwargs):
+        time.sleep(0.05)  # e.g. waiting for a scheduler slot
+        return CLIResponse(text="ok", elapsed=2.0)
+
+    monkeypatch.setattr(tools.cli, "run_cli", slow_queue)
+    tools.call_agent("claude_code", "coder", "Write")
+    assert tools.estimator._samples_for("claude_code/coder")[0][0] == 2.0
+
+    def timing_out(agent_id, prompt, timeout=None, **kwargs):
+        raise CLITimeout(f"CLI timeout after {timeout}s", timeout)
+
+    monkeypatch.setattr(tools.cli, "run_cli", timing_out)
+    with pytest.raises(CLITimeout):
+        tools.call_agent("gemini", "reviewer", "Review")
+    assert [sample[:2] for sample in tools.estimator._samples_for("gemini/reviewer")] == [(60, 0)]
+    assert tools.estimator.timeout_for("gemini", "reviewer") == 180  # p95 60s * 1.5 * 2
+
+
+def test_history_file_is_compacted(tmp_path):
+    path = tmp_path / "runs.jsonl"
+    estimator = RunEstimator(path=str(path), max_samples=5, min_samples=1, min_timeout=1)
+    for i in range(50):
+        estimator.record_call("claude_code", "coder", 10 + i, 100)
+    estimator.record_call("claude_code", "coder", 100, 0, timed_out=True)
+
+    # The file stays within about twice the kept samples
+    assert len(path.read_text().splitlines()) <= 10
+
+    restored = RunEstimator(path=str(path), max_samples=5, min_samples=1, min_timeout=1)
+    assert len(path.read_text().splitlines()) == 5
+    assert restored._samples_for("claude_code/coder") == estimator._samples_for("claude_code/coder")
+    assert restored.timeout_for("claude_code", "coder") == estimator.timeout_for("claude_code", "coder")
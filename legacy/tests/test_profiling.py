@@ -0,0 +1,83 @@
+"""Tests for the per-turn profiler"""
+
+import contextvars
+import json
+import subprocess
+import sys
+import threading
+
+import pytest
+from src.cli_runners import CLIRunner
+from src.profiling import ProfilerBusy, TurnProfiler, classify, format_summary, run_in_turn
+
+
+def _busy_json():
+    data = {"results": [{"agent": "claude_code", "response": "x" * 50, "n": i} for i in range(500)]}
+    for _ in range(5):
+        json.dumps(data, indent=2)
+
+
+def test_profile_separates_python_from_agent_waits(tmp_path):
+    kept = []
+    with TurnProfiler(name="turn-1", output_dir=str(tmp_path), interval=0.002) as profiler:
+        _busy_json()
+        subprocess.run([sys.executable, "-c", "import time; time.sleep(0.4)"])
+        # A tool-pool task of this turn, and a thread serving another session
+        worker = threading.Thread(
+            target=contextvars.copy_context().run, args=(run_in_turn, _busy_json), name="pool-1"
+        )
+        other = threading.Thread(target=_busy_json, name="other-session")
+        worker.start()
+        other.start()
+        worker.join()
+        other.join()
+        kept.append(["allocated" * 10 for _ in range(5000)])
+
+    summary = profiler.summary
+    assert summary["seconds"]["agent_wait"] > 0.25
+    assert summary["seconds"]["python"] > 0.05
+    assert any("encoder" in entry["function"] for entry in summary["top_python"])
+    assert summary["top_allocations"]
+    assert summary["peak_memory_kib"] > 0
+
+    lines = (tmp_path / "turn-1.collapsed").read_text().splitlines()
+    assert any(line.startswith("pool-1;") for line in lines)
+    assert not any(line.startswith("other-session;") for line in lines)
+    stack, weight = lines[0].rsplit(" ", 1)
+    assert int(weight) > 0 and ";" in stack
+    assert "waiting on agents" in format_summary(summary)
+
+
+def test_classify():
+    assert classify([("orchestrator.py", "chat"), ("/usr/lib/python3.11/subprocess.py", "communicate")]) == "agent_wait"
+    assert classify([("tools.py", "run_discussion"), ("/usr/lib/python3.11/threading.py", "wait")]) == "idle"
+    assert classify([("tools.py", "call_agent"), ("json/encoder.py", "_iterencode")]) == "python"
+
+
+def test_one_profiled_turn_at_a_time_with_safe_file_name(tmp_path):
+    with TurnProfiler(name="../../etc/x", output_dir=str(tmp_path)) as profiler:
+        with pytest.raises(ProfilerBusy):
+            with TurnProfiler(output_dir=None):
+                pass
+
+    assert profiler.summary["flamegraph"] == str(tmp_path / ".._.._etc_x.collapsed")
+    with TurnProfiler(output_dir=None):
+        pass
+
+
+def test_cli_calls_count_as_agent_wait():
+    script = "import json, time; time.sleep(0.5); print(json.dumps({'text': 'done'}))"
+    runner = CLIRunner({"agents": {"fake": {"cli": sys.executable, "args": ["-c", script]}}})
+
+    with TurnProfiler(output_dir=None, interval=0.002) as profiler:
+        assert runner.run_cli("fake", "hi").text == "done"
+
+    seconds = profiler.summary["seconds"]
+    assert seconds["agent_wait"] > 0.4
+    assert seconds.get("idle", 0) < 0.1
+
+
+def test_classify_waits_inside_agent_calls():
+    event_wait = ("/usr/lib/python3.11/threading.py", "wait")
+    assert classify([("cli_runners.py", "run_cli"), ("src/cli_runners.py", "_monitor"), event_wait]) == "agent_wait"
+    assert classify([("workers.py", "run_cli"), ("src/state.py", "wait_job"), event_wait]) == "agent_wait"
@@ -0,0 +1,103 @@
+"""Tests for per-agent resource profiles of CLI processes"""
+
+import json
+import os
+import sys
+import time
+
+import pytest
+from src.cli_runners import CLIRunner
+from src.resources import resource_profile
+
+pytestmark = pytest.mark.skipif(os.name == "nt", reason="POSIX resource limits")
+
+REPORT_SCRIPT = (
+    "import json, os, resource; "
+    "print(json.dumps({'text': json.dumps({"
+    "'nice': os.getpriority(os.PRIO_PROCESS, 0), "
+    "'nofile': resource.getrlimit(resource.RLIMIT_NOFILE)[0]})}))"
+)
+
+
+def _runner(script, resources):
+    return CLIRunner({
+        "agents": {"fake": {"cli": sys.executable, "args": ["-c", script], "resources": resources}},
+        "resource_profiles": {"small": {"max_open_files": 64}},
+    })
+
+
+def test_profile_lookup():
+    config = {
+        "agents": {"a": {"cli": "x", "resources": "small"}, "b": {"cli": "x"}, "c": {"cli": "x", "resources": "nope"}},
+        "resource_profiles": {"small": {"nice": 5}, "default": {"max_output_kb": 10}},
+    }
+    assert resource_profile(config, "a") == {"nice": 5}
+    assert resource_profile(config, "b") == {"max_output_kb": 10}
+    with pytest.raises(ValueError):
+        resource_profile(config, "c")
+
+
+def test_limits_applied_and_usage_reported():
+    runner = _runner(REPORT_SCRIPT, {"nice": 7, "max_open_files": 64})
+
+    response = runner.run_cli("fake", "hi")
+
+    applied = json.loads(response.text)
+    # Set right after spawn; the child reads them once it has started Python
+    assert applied == {"nice": 7, "nofile": 64}
+    assert response.resources["peak_rss_kib"] > 1000
+    assert response.resources["cpu_seconds"] > 0
+
+
+def test_named_profile():
+    response = _runner(REPORT_SCRIPT, "small").run_cli("fake", "hi")
+    assert json.loads(response.text)["nofile"] == 64
+
+
+def test_memory_cap_kills_process():
+    script = "import time; data = bytearray(300 * 1024 * 1024); data[::4096] = b'x' * len(data[::4096]); time.sleep(30)"
+    runner = _runner(script, {"memory_mb": 100})
+
+    with pytest.raises(RuntimeError, match="memory exceeded 100 MB"):
+        runner.run_cli("fake", "hi", timeout=20)
+
+
+def test_output_cap_kills_process():
+    script = "import sys, time\nwhile True: sys.stdout.write('x' * 65536); sys.stdout.flush()"
+    runner = _runner(script, {"max_output_kb": 256})
+
+    with pytest.raises(RuntimeError, match="output exceeded 256 KB"):
+        runner.run_cli("fake", "hi", timeout=20)
+
+
+def test_max_wall_seconds_caps_timeout():
+    runner = _runner("import time; time.sleep(30)", {"max_wall_seconds": 0.5})
+
+    with pytest.raises(RuntimeError, match="timeout after 0.5s"):
+        runner.run_cli("fake", "hi", timeout=20)
+
+
+def test_failed_limits_kill_process(monkeypatch):
+    pids = []
+
+    def failing_limits(pid, profile):
+        pids.append(pid)
+        raise PermissionError("setpriority")
+
+    monkeypatch.setattr("src.cli_runners.apply_limits", failing_limits)
+    runner = _runner("import time; time.sleep(30)", {"nice": -5})
+
+    started = time.monotonic()
+    with pytest.raises(PermissionError):
+        runner.run_cli("fake", "hi", timeout=20)
+
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        try:
+            os.kill(pids[0], 0)
+        except ProcessLookupError:
+            break
+        time.sleep(0.05)
+    else:
+        pytest.fail("CLI process still running")
+    assert time.monotonic() - started < 5
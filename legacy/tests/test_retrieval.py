@@ -0,0 +1,92 @@
+"""Tests for the local retrieval index"""
+
+import json
+import time
+
+from src.retrieval import BM25Index, tokenize
+
+
+def test_tokenize_drops_stopwords():
+    assert tokenize("How is the Cache used in der Datenbank?") == ["cache", "used", "datenbank"]
+
+
+def test_ranking():
+    index = BM25Index()
+    index.add("Design a caching layer for the REST API", {"task": "cache"})
+    index.add("Write unit tests for the login form", {"task": "tests"})
+    index.add("Review the database schema for indexes", {"task": "schema"})
+
+    matches = index.search("API caching strategy")
+
+    assert matches[0]["task"] == "cache"
+    assert matches[0]["score"] > 0
+    assert index.search("kubernetes") == []
+
+
+def test_persistence(tmp_path):
+    """Added documents are replayed from the JSONL file"""
+    path = str(tmp_path / "index.jsonl")
+    index = BM25Index(path=path)
+    index.add("Plan the plugin system", {"task": "plugins"}, key="a")
+
+    reloaded = BM25Index(path=path)
+
+    assert len(reloaded) == 1
+    assert reloaded.search("plugin system")[0]["task"] == "plugins"
+    assert reloaded.add("Plan the plugin system", {"task": "plugins"}, key="a") is None
+
+
+def test_add_jobs_file(tmp_path):
+    jobs_file = tmp_path / "jobs.json"
+    jobs_file.write_text(json.dumps({"jobs": [
+        {"id": "1", "status": "complete", "topic": "REST API design", "result": "Use FastAPI."},
+        {"id": "2", "status": "error", "topic": "Broken", "result": ""},
+    ]}))
+    index = BM25Index()
+
+    assert index.add_jobs_file(str(jobs_file)) == 1
+    assert index.add_jobs_file(str(jobs_file)) == 0
+    assert index.search("REST API")[0]["response"] == "Use FastAPI."
+
+
+def test_query_latency_at_scale():
+    """Queries stay fast with tens of thousands of entries"""
+    index = BM25Index()
+    for i in range(20000):
+        index.add(f"task {i} about module{i % 500} and feature{i % 37} refactoring", {"i": i})
+
+    started = time.perf_counter()
+    matches = index.search("module42 feature7 refactoring")
+    elapsed = time.perf_counter() - started
+
+    assert matches[0]["i"] % 500 == 42
+    assert elapsed < 0.5
+
+
+def test_owner_scoping():
+    """Sessions only find their own entries and unowned ones"""
+    index = BM25Index()
+    index.add("Design the billing service", {"task": "alice"}, owner="alice")
+    index.add("Billing service rollout plan", {"task": "bob"}, owner="bob")
+    index.add("Billing FAQ from a discussion job", {"task": "shared"})
+
+    assert {m["task"] for m in index.search("billing", owner="alice")} == {"alice", "shared"}
+    assert {m["task"] for m in index.search("billing")} == {"shared"}
+    assert index.count(owner="bob") == 2
+
+
+def test_eviction_and_truncation(tmp_path):
+    path = str(tmp_path / "index.jsonl")
+    index = BM25Index(path=path, max_entries=3, max_chars=50)
+    for i in range(8):
+        index.add(f"release note {i} " + "details " * 100, {"i": i, "response": "x" * 500}, key=f"k{i}")
+
+    assert len(index) == 3
+    assert sorted(m["i"] for m in index.search("release note")) == [5, 6, 7]
+    assert len(index.search("release")[0]["response"]) == 50
+    # The file is compacted instead of growing with every entry
+    assert len(open(path).readlines()) <= 6
+
+    reloaded = BM25Index(path=path, max_entries=3)
+    assert sorted(m["i"] for m in reloaded.search("release note")) == [5, 6, 7]
+    assert len(open(path).readlines()) == 3
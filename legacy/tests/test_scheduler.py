@@ -0,0 +1,141 @@
+"""Tests for the agent scheduler"""
+
+import threading
+import time
+
+import pytest
+from src.scheduler import AgentScheduler, RateLimiter, SchedulerBusy
+
+
+def _hold(scheduler, agent_id, session_id, order, release, priority="normal"):
+    with scheduler.slot(agent_id, session_id=session_id, priority=priority):
+        order.append(session_id)
+        release.wait(1)
+
+
+def _released():
+    event = threading.Event()
+    event.set()
+    return event
+
+
+def _wait_queued(scheduler, count):
+    deadline = time.monotonic() + 2
+    while scheduler.get_stats()["queued"] < count and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_global_and_per_agent_caps():
+    """Slots beyond the caps wait until a running call finishes"""
+    scheduler = AgentScheduler(max_concurrent=2, per_agent={"claude_code": 1})
+    release = threading.Event()
+    order = []
+
+    threads = [
+        threading.Thread(target=_hold, args=(scheduler, agent, f"s{i}", order, release))
+        for i, agent in enumerate(["claude_code", "claude_code", "gemini"])
+    ]
+    for thread in threads:
+        thread.start()
+    _wait_queued(scheduler, 1)
+
+    stats = scheduler.get_stats()
+    assert stats["running"] == 2
+    assert stats["running_per_agent"]["claude_code"] == 1
+
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert sorted(order) == ["s0", "s1", "s2"]
+    assert scheduler.get_stats()["running"] == 0
+
+
+def test_fair_queuing_between_sessions():
+    """A session with many queued calls does not starve a newcomer"""
+    scheduler = AgentScheduler(max_concurrent=1)
+    gate = threading.Event()
+    order = []
+
+    blocker = threading.Thread(target=_hold, args=(scheduler, "a", "busy", order, gate))
+    blocker.start()
+    _wait_queued(scheduler, 0)
+
+    threads = []
+    for session in ["busy", "busy", "busy", "quiet"]:
+        thread = threading.Thread(
+            target=_hold, args=(scheduler, "a", session, order, _released())
+        )
+        thread.start()
+        threads.append(thread)
+        _wait_queued(scheduler, len(threads))
+
+    gate.set()
+    for thread in [blocker] + threads:
+        thread.join()
+
+    assert order.index("quiet") < 3
+
+
+def test_priority_classes():
+    """Interactive calls jump ahead of batch calls"""
+    scheduler = AgentScheduler(max_concurrent=1)
+    gate = threading.Event()
+    order = []
+
+    blocker = threading.Thread(target=_hold, args=(scheduler, "a", "first", order, gate))
+    blocker.start()
+    _wait_queued(scheduler, 0)
+
+    batch = threading.Thread(
+        target=_hold, args=(scheduler, "a", "batch", order, _released(), "batch")
+    )
+    batch.start()
+    _wait_queued(scheduler, 1)
+    interactive = threading.Thread(
+        target=_hold,
+        args=(scheduler, "a", "interactive", order, _released(), "interactive")
+    )
+    interactive.start()
+    _wait_queued(scheduler, 2)
+
+    gate.set()
+    for thread in [blocker, batch, interactive]:
+        thread.join()
+
+    assert order == ["first", "interactive", "batch"]
+
+
+def test_admission_control():
+    """Admission is refused with a retry hint when the estimated wait is too long"""
+    scheduler = AgentScheduler(max_concurrent=1, max_queue_wait=5, expected_call_seconds=10)
+    scheduler.admit()
+
+    with scheduler.slot("a"):
+        with pytest.raises(SchedulerBusy) as exc_info:
+            scheduler.admit()
+
+    assert exc_info.value.retry_after >= 5
+    assert scheduler.get_stats()["rejected"] == 1
+
+
+def test_slot_timeout():
+    """Waiting for a slot can time out"""
+    scheduler = AgentScheduler(max_concurrent=1)
+    with scheduler.slot("a"):
+        with pytest.raises(SchedulerBusy):
+            with scheduler.slot("a", timeout=0.05):
+                pass
+    assert scheduler.get_stats()["queued"] == 0
+
+
+def test_rate_limiter():
+    """security.rateLimit is enforced as a sliding window"""
+    limiter = RateLimiter.from_config({"security": {"rateLimit": {"maxRequests": 2, "windowSeconds": 60}}})
+
+    limiter.check()
+    limiter.check()
+    with pytest.raises(SchedulerBusy) as exc_info:
+        limiter.check()
+    assert 0 < exc_info.value.retry_after <= 60
+
+    assert RateLimiter.from_config({"security": {"enabled": False, "rateLimit": {}}}) is None
@@ -0,0 +1,95 @@
+"""Tests for single-flight coalescing"""
+
+import threading
+import time
+
+import pytest
+from src.cancellation import CancellationToken, OperationCancelled
+from src.singleflight import SingleFlight, request_key
+
+
+def test_request_key_ignores_whitespace():
+    assert request_key("a", None, "Sys", "Review  this\ncode ") == request_key("a", None, "Sys", "Review this code")
+    assert request_key("a", None, "Sys", "x") != request_key("a", "haiku", "Sys", "x")
+    assert request_key("a", None, "Sys", "x") != request_key("b", None, "Sys", "x")
+    assert request_key("a", None, "Sys", "x") != request_key("a", None, "Sys", "x", session="s1:None")
+
+
+def test_concurrent_duplicates_share_one_execution():
+    flight = SingleFlight()
+    calls = []
+
+    def work():
+        calls.append(1)
+        time.sleep(0.3)
+        return "result"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("k", work))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert sorted(coalesced for _, coalesced in results) == [False, True, True, True]
+    assert all(value == "result" for value, _ in results)
+    assert flight.get_stats()["coalesced_calls"] == 3
+    assert flight.get_stats()["in_flight"] == 0
+
+    # Finished calls are not cached
+    flight.do("k", work)
+    assert len(calls) == 2
+
+
+def test_errors_are_shared_but_cancellation_is_retried():
+    flight = SingleFlight()
+    started = threading.Event()
+
+    def fail():
+        started.set()
+        time.sleep(0.2)
+        raise RuntimeError("CLI failed")
+
+    thread = threading.Thread(target=lambda: pytest.raises(RuntimeError, flight.do, "k", fail))
+    thread.start()
+    started.wait()
+    with pytest.raises(RuntimeError, match="CLI failed"):
+        flight.do("k", lambda: "unused")
+    thread.join()
+
+    # The leader's caller cancels: the follower runs the call itself
+    started.clear()
+
+    def cancelled():
+        started.set()
+        time.sleep(0.2)
+        raise OperationCancelled("client disconnected")
+
+    thread = threading.Thread(target=lambda: pytest.raises(OperationCancelled, flight.do, "k", cancelled))
+    thread.start()
+    started.wait()
+    assert flight.do("k", lambda: "mine") == ("mine", False)
+    thread.join()
+
+
+def test_follower_cancellation_does_not_wait_for_leader():
+    flight = SingleFlight()
+    started = threading.Event()
+
+    def slow():
+        started.set()
+        time.sleep(1.0)
+        return "late"
+
+    thread = threading.Thread(target=flight.do, args=("k", slow))
+    thread.start()
+    started.wait()
+
+    token = CancellationToken()
+    threading.Timer(0.1, token.cancel).start()
+    begin = time.monotonic()
+    with pytest.raises(OperationCancelled):
+        flight.do("k", slow, token)
+    assert time.monotonic() - begin < 0.5
+    thread.join()
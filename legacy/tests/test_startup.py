@@ -0,0 +1,47 @@
+"""Import-time budget for worker processes and CLI one-shots"""
+
+import subprocess
+import sys
+from pathlib import Path
+
+LEGACY_DIR = Path(__file__).parent.parent
+
+# Cumulative import time of our own modules (excluding the interpreter itself)
+STARTUP_BUDGET_MS = 250
+
+HEAVY_MODULES = ["anthropic", "yaml", "dotenv", "fastapi", "uvicorn"]
+
+
+def _import_profile(statement: str):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c",
+         f"{statement}; import sys; print(sorted(set({HEAVY_MODULES!r}) & set(sys.modules)))"],
+        cwd=LEGACY_DIR,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+
+    total_us = 0
+    for line in result.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip().startswith("src") and not parts[2].startswith("   "):
+            total_us += int(parts[1])
+    return total_us / 1000, result.stdout.strip()
+
+
+def test_package_import_is_lazy():
+    """`import src` does not load the orchestrator or its SDKs"""
+    _, loaded = _import_profile("import src")
+    assert loaded == "[]"
+
+
+def test_startup_budget():
+    """Everything a worker needs imports within the budget, without heavy SDKs"""
+    elapsed_ms, loaded = _import_profile(
+        "import src.orchestrator, src.workers, src.state, src.config"
+    )
+
+    assert loaded == "[]"
+    assert elapsed_ms < STARTUP_BUDGET_MS, f"import took {elapsed_ms:.0f}ms"
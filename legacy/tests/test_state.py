@@ -0,0 +1,240 @@
+"""Tests for shared state backends and remote agent workers"""
+
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+import yaml
+from src.state import MemoryStateBackend, SQLiteStateBackend, StateBackend, create_state_backend
+from src.workers import AgentWorker, RemoteCLIRunner
+
+LEGACY_DIR = Path(__file__).parent.parent
+
+# Stand-in CLI: echoes the prompt as JSON
+ECHO_SCRIPT = (
+    "import json, sys; "
+    "print(json.dumps({'text': 'echo: ' + sys.argv[-1]}))"
+)
+
+
+@pytest.fixture
+def config(tmp_path):
+    return {
+        "agents": {
+            "echo": {"cli": sys.executable, "args": ["-c", ECHO_SCRIPT]}
+        },
+        "state": {
+            "backend": "sqlite",
+            "options": {"path": str(tmp_path / "state.db")},
+            "remote_agents": True,
+        }
+    }
+
+
+@pytest.mark.parametrize("backend_factory", [
+    lambda tmp_path: MemoryStateBackend(),
+    lambda tmp_path: SQLiteStateBackend(str(tmp_path / "state.db")),
+])
+def test_key_value(tmp_path, backend_factory):
+    """Values round-trip as JSON and can be listed and deleted"""
+    backend = backend_factory(tmp_path)
+
+    backend.put("sessions", "a", {"messages": [1, 2]})
+    backend.put("sessions", "b", {"messages": []})
+
+    assert backend.get("sessions", "a") == {"messages": [1, 2]}
+    assert sorted(backend.keys("sessions")) == ["a", "b"]
+
+    backend.delete("sessions", "a")
+    assert backend.get("sessions", "a") is None
+    assert backend.keys("sessions") == ["b"]
+
+
+def test_sqlite_shared_between_instances(tmp_path):
+    """Two API workers see the same session state"""
+    path = str(tmp_path / "state.db")
+    first = SQLiteStateBackend(path)
+    second = SQLiteStateBackend(path)
+
+    first.put("sessions", "s1", {"cli_sessions": {"echo": "abc"}})
+
+    assert second.get("sessions", "s1")["cli_sessions"]["echo"] == "abc"
+
+
+def test_session_lease_across_nodes(tmp_path):
+    """One node at a time holds a session; a lease that ran out can't be renewed once taken"""
+    path = str(tmp_path / "state.db")
+    first = SQLiteStateBackend(path)
+    second = SQLiteStateBackend(path)
+
+    assert first.acquire_lease("session:s1", "node-a", 60)
+    assert not second.acquire_lease("session:s1", "node-b", 60)
+    assert first.renew_lease("session:s1", "node-a", 60)
+
+    first.release_lease("session:s1", "node-b")  # not the holder: no-op
+    assert not second.acquire_lease("session:s1", "node-b", 60)
+    first.release_lease("session:s1", "node-a")
+    assert second.acquire_lease("session:s1", "node-b", 0)
+
+    # node-b stalled past its lease: node-a takes over and finishes first
+    assert first.acquire_lease("session:s1", "node-a", 60)
+    first.release_lease("session:s1", "node-a")
+    assert not second.renew_lease("session:s1", "node-b", 60)
+
+
+def test_memory_session_lease():
+    """The in-process backend follows the same lease rules"""
+    backend = MemoryStateBackend()
+
+    assert backend.acquire_lease("session:s1", "a", 60)
+    assert not backend.acquire_lease("session:s1", "b", 60)
+    backend.release_lease("session:s1", "a")
+    assert backend.acquire_lease("session:s1", "b", 0)
+    assert backend.acquire_lease("session:s1", "a", 60)
+    assert not backend.renew_lease("session:s1", "b", 60)
+
+
+def test_job_claimed_once(tmp_path):
+    """A job is only handed to one worker"""
+    backend = SQLiteStateBackend(str(tmp_path / "state.db"))
+    job_id = backend.enqueue_job("echo", {"prompt": "hi"})
+
+    claimed = backend.claim_job(["echo"], "w1")
+    assert claimed["id"] == job_id
+    assert backend.claim_job(["echo"], "w2") is None
+
+    backend.finish_job(job_id, result={"text": "done"})
+    assert backend.wait_job(job_id, timeout=1) == {"text": "done"}
+
+
+def test_create_state_backend(config):
+    assert create_state_backend({}).shared is False
+    assert isinstance(create_state_backend(config), SQLiteStateBackend)
+    with pytest.raises(ValueError):
+        create_state_backend({"state": {"backend": "nope"}})
+    with pytest.raises(TypeError):
+        StateBackend()
+
+    # A lease longer than the requester waits would re-run abandoned jobs
+    config["state"]["options"]["lease_seconds"] = 900
+    with pytest.raises(ValueError, match="lease_seconds"):
+        create_state_backend(config)
+
+
+def _job_count(backend):
+    return backend._conn().execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+
+
+def test_timed_out_job_is_withdrawn(config):
+    """A job nobody picked up before the timeout is not run later"""
+    backend = create_state_backend(config)
+    runner = RemoteCLIRunner(config, backend, job_timeout=0.2)
+
+    with pytest.raises(TimeoutError):
+        runner.run_cli("echo", "hello")
+
+    assert _job_count(backend) == 0
+    assert backend.claim_job(["echo"], "late-worker") is None
+
+
+def test_lease_is_renewed_while_running(tmp_path):
+    backend = SQLiteStateBackend(str(tmp_path / "state.db"), lease_seconds=0.1)
+    job_id = backend.enqueue_job("echo", {"prompt": "hi"})
+    backend.claim_job(["echo"], "w1")
+
+    backend.renew_job(job_id, "w1")
+    assert backend.claim_job(["echo"], "w2") is None
+
+    # An expired lease hands the job to the next worker
+    threading.Event().wait(0.2)
+    assert backend.claim_job(["echo"], "w2")["id"] == job_id
+
+
+def test_cancelled_job_leaves_no_fork_parent(config):
+    """A skipped job's fork parent must not leak into the next job for the agent"""
+    config["agents"]["argv"] = {
+        "cli": sys.executable,
+        "args": ["-c", "import json, sys; print(json.dumps({'text': ' '.join(sys.argv[1:])}))"],
+        "session_arg": "--session", "resume_arg": "--resume", "fork_arg": "--fork",
+    }
+    backend = create_state_backend(config)
+    worker = AgentWorker(config, backend, worker_id="w1")
+
+    cancelled = backend.enqueue_job("argv", {
+        "agent_id": "argv", "prompt": "secret", "session_id": "S1", "fork_from": "PARENT-OF-USER-A"
+    })
+    backend.put("cancelled_jobs", cancelled, "client disconnected")
+    assert worker.run_once()
+
+    job_id = backend.enqueue_job("argv", {"agent_id": "argv", "prompt": "hello", "session_id": "S2"})
+    assert worker.run_once()
+
+    text = backend.wait_job(job_id, timeout=5)["text"]
+    assert "PARENT-OF-USER-A" not in text
+    assert text == "--session S2 hello"
+
+    # A later session without a fork parent replaces a pending one
+    worker.runner.set_session("argv", "S3", "PARENT-OF-USER-A")
+    worker.runner.set_session("argv", "S3")
+    assert worker.runner.session_state("argv") == ("S3", None)
+
+
+def test_remote_runner_with_in_process_worker(config):
+    """RemoteCLIRunner calls are executed by an AgentWorker"""
+    backend = create_state_backend(config)
+    runner = RemoteCLIRunner(config, backend, job_timeout=10)
+    worker = AgentWorker(config, backend, worker_id="w1")
+
+    thread = threading.Thread(target=worker.run_forever, kwargs={"poll_interval": 0.01})
+    thread.start()
+    try:
+        response = runner.run_cli("echo", "hello")
+    finally:
+        worker.stop()
+        thread.join()
+
+    assert response.text == "echo: hello"
+    assert worker.completed == 1
+    assert worker.runner.sessions["echo"] == runner.sessions["echo"]
+    # Collected jobs are deleted
+    assert _job_count(backend) == 0
+
+
+def test_remote_runner_with_worker_processes(config, tmp_path):
+    """Several local processes stand in for agent-worker nodes"""
+    config_path = tmp_path / "config.yaml"
+    config_path.write_text(yaml.safe_dump(config))
+
+    workers = [
+        subprocess.Popen(
+            [
+                sys.executable, "agent_worker.py",
+                "--config", str(config_path),
+                "--worker-id", f"node-{i}",
+                "--poll-interval", "0.02",
+                "--exit-when-idle", "2",
+            ],
+            cwd=LEGACY_DIR,
+            stdout=subprocess.DEVNULL
+        )
+        for i in range(2)
+    ]
+
+    backend = create_state_backend(config)
+    runner = RemoteCLIRunner(config, backend, job_timeout=30)
+    results = {}
+
+    def call(i):
+        results[i] = runner.run_cli("echo", f"task {i}").text
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for worker in workers:
+        worker.wait(timeout=30)
+
+    assert results == {i: f"echo: task {i}" for i in range(4)}
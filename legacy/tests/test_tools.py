@@ -1,8 +1,13 @@
 """Tests for orchestrator tools"""
 
+import time
+
 import pytest
-from src.tools import OrchestratorTools
-from src.cli_runners import CLIRunner
+from src.cancellation import OperationCancelled
+from src.discussion import Transcript
+from src.estimator import RunEstimator
+from src.tools import OrchestratorTools, change_ratio
+from src.cli_runners import CLIRunner, CLIResponse
 
 
 @pytest.fixture
@@ -38,11 +43,13 @@ def test_get_tool_definitions(tools):
     """Test tool definitions"""
     definitions = tools.get_tool_definitions()
 
-    assert len(definitions) == 3
+    assert len(definitions) == 5
     tool_names = [t["name"] for t in definitions]
     assert "call_agent" in tool_names
     assert "create_consensus" in tool_names
     assert "run_workflow" in tool_names
+    assert "run_discussion" in tool_names
+    assert "search_past_work" in tool_names
 
 
 def test_build_role_prompt(tools):
@@ -59,3 +66,459 @@ def test_conversation_history(tools):
 
     # History should be populated after agent calls
     # (Would need mocking for full test)
+
+
+def test_change_ratio():
+    """Test output diff measurement"""
+    assert change_ratio("same text", "same text") == 0.0
+    assert change_ratio("one two three four", "five six seven eight") == 1.0
+    assert 0 < change_ratio("one two three four", "one two three five") < 0.5
+
+
+def test_fused_refinement_stops_on_convergence(config, tools, monkeypatch):
+    """Fused mode revises in one call per round and stops once output settles"""
+    config["workflows"]["test_workflow"]["steps"][0].update({
+        "max_iterations": 5,
+        "iteration_mode": "fused",
+        "convergence_threshold": 0.1
+    })
+    outputs = iter([
+        "first draft of the plan with several steps",
+        "second draft of the plan with many more detailed steps",
+        "second draft of the plan with many more detailed steps!",
+    ])
+    prompts = []
+
+    def fake_run_cli(agent_id, prompt, **kwargs):
+        prompts.append(prompt)
+        return CLIResponse(text=next(outputs))
+
+    monkeypatch.setattr(tools.cli, "run_cli", fake_run_cli)
+
+    result = tools.run_workflow("test_workflow", "Build a thing")
+
+    assert len(prompts) == 3
+    assert "Current output" in prompts[1]
+    assert result["steps_completed"] == 3
+    assert result["results"][-1]["change_ratio"] < 0.1
+    assert result["final_output"].endswith("steps!")
+
+
+def test_fused_refinement_stops_on_approval(config, tools, monkeypatch):
+    """Fused mode keeps the current output when the agent approves it"""
+    config["workflows"]["test_workflow"]["steps"][0].update({
+        "max_iterations": 3,
+        "iteration_mode": "fused"
+    })
+    outputs = iter(["a good plan", "APPROVED."])
+    monkeypatch.setattr(
+        tools.cli, "run_cli",
+        lambda agent_id, prompt, **kwargs: CLIResponse(text=next(outputs))
+    )
+
+    result = tools.run_workflow("test_workflow", "Build a thing")
+
+    assert result["steps_completed"] == 1
+    assert result["final_output"] == "a good plan"
+
+    # A remark after the approval is not a revision
+    outputs = iter(["a good plan", "**APPROVED** - looks good to me"])
+    result = tools.run_workflow("test_workflow", "Build a thing")
+    assert result["final_output"] == "a good plan"
+
+
+def test_feedback_loop_stops_when_feedback_repeats(config, tools, monkeypatch):
+    """Refinement ends once the reviewer keeps raising the same points"""
+    config["workflows"]["test_workflow"]["steps"][0]["max_iterations"] = 6
+    feedback = "Add error handling for the network calls and validate all inputs."
+    prompts = []
+
+    def fake_run_cli(agent_id, prompt, **kwargs):
+        prompts.append(prompt)
+        if prompt.startswith("Review this output"):
+            return CLIResponse(text=feedback)
+        return CLIResponse(text=f"draft {len(prompts)}")
+
+    monkeypatch.setattr(tools.cli, "run_cli", fake_run_cli)
+
+    result = tools.run_workflow("test_workflow", "Build a thing")
+
+    reviews = [p for p in prompts if p.startswith("Review this output")]
+    assert len(reviews) == 3
+    assert "Do not restate earlier arguments" in reviews[2]
+    assert result["results"][1]["novelty"] == 1.0
+    assert result["steps_completed"] == 3
+
+
+def test_search_past_work(config, tools, monkeypatch):
+    """Agent answers are indexed and can be found again"""
+    monkeypatch.setattr(
+        tools.cli, "run_cli",
+        lambda agent_id, prompt, **kwargs: CLIResponse(text="Use a Redis-backed token bucket.")
+    )
+    tools.call_agent("claude_code", "planner", "How do we throttle the webhook ingestion endpoint?")
+
+    result = tools.execute_tool("search_past_work", {"query": "webhook throttle"})
+
+    assert result["matches"][0]["agent"] == "claude_code"
+    assert result["matches"][0]["response"] == "Use a Redis-backed token bucket."
+
+    # Other sessions share the index but not each other's work
+    config["retrieval"] = None
+    other = OrchestratorTools(CLIRunner(config, session_id="other-user"), config)
+    assert other.execute_tool("search_past_work", {"query": "webhook throttle"})["matches"] == []
+
+
+def test_transcript_trims_oldest_entries():
+    transcript = Transcript(max_chars=120)
+    for i in range(5):
+        transcript.add("coder", i + 1, f"point number {i} " * 2)
+
+    assert transcript.chars <= 120
+    assert transcript.chars == sum(len(e) for e in transcript.entries)
+    assert transcript.dropped > 0
+    assert "point number 4" in transcript.render()
+    assert "point number 0" not in transcript.render()
+
+
+def test_discussion_rounds_run_in_parallel(config, tools, monkeypatch):
+    """A round takes as long as the slowest agent, not the sum"""
+    config["discussion"] = {
+        "maxRounds": 2,
+        "maxContext": 200,
+        "agents": [{"id": "planner", "agent": "claude_code", "role": "architect",
+                    "systemPrompt": "You plan."}],
+        "teams": [{"id": "duo", "agents": ["planner", "gemini"]}],
+    }
+    calls = []
+
+    def fake_run_cli(agent_id, prompt, system_prompt=None, **kwargs):
+        calls.append((agent_id, prompt, system_prompt))
+        time.sleep(0.3)
+        return CLIResponse(text=f"{agent_id} says something new {len(calls)} " * 10)
+
+    monkeypatch.setattr(tools.cli, "run_cli", fake_run_cli)
+
+    started = time.monotonic()
+    result = tools.execute_tool("run_discussion", {"topic": "Monorepo?", "team": "duo"})
+
+    assert time.monotonic() - started < 1.0
+    assert result["participants"] == ["planner", "gemini"]
+    assert result["rounds_completed"] == 2
+    assert calls[0][2] == "You plan."
+    # Round 2 sees round 1; the whole prompt stays within maxContext characters
+    assert "Discussion so far" in calls[2][1]
+    assert len(calls[2][1]) <= 200
+    assert len(result["transcript"]) < 260
+
+
+def test_discussion_round_timeout(config, tools, monkeypatch):
+    """Agents that miss the round timeout are cancelled and skipped"""
+    config["discussion"] = {"maxRounds": 1, "timeout": 0.3}
+
+    def fake_run_cli(agent_id, prompt, cancel_token=None, **kwargs):
+        if agent_id == "gemini":
+            cancel_token.wait(5)
+            raise OperationCancelled(cancel_token.reason)
+        return CLIResponse(text="quick answer")
+
+    monkeypatch.setattr(tools.cli, "run_cli", fake_run_cli)
+
+    started = time.monotonic()
+    result = tools.run_discussion("Ship it?")
+
+    assert time.monotonic() - started < 2
+    contributions = result["rounds"][0]["contributions"]
+    assert contributions[0]["response"] == "quick answer"
+    assert "no answer" in contributions[1]["error"]
+
+
+def test_discussion_sessions_released_when_round_fails(config, tools, monkeypatch):
+    config["discussion"] = {"maxRounds": 2}
+
+    def failing_run_cli(agent_id, prompt, **kwargs):
+        tools.cli._claim_session(agent_id)  # as the real CLI call does
+        raise RuntimeError("CLI failed")
+
+    monkeypatch.setattr(tools.cli, "run_cli", failing_run_cli)
+
+    with pytest.raises(RuntimeError, match="No participant answered"):
+        tools.run_discussion("Ship it?")
+
+    assert not [key for key in tools.cli.sessions if "discussion:" in key]
+
+
+def test_map_reduce_step(config, tools, monkeypatch):
+    """Large inputs are mapped over chunks in parallel and merged"""
+    config["workflows"]["test_workflow"]["steps"][0]["map_reduce"] = {
+        "chunk_tokens": 30,
+        "max_parallel": 2,
+        "agents": ["claude_code", "gemini"],
+    }
+    running = []
+    peak = []
+    prompts = []
+
+    def fake_run_cli(agent_id, prompt, **kwargs):
+        prompts.append(prompt)
+        running.append(agent_id)
+        peak.append(len(running))
+        time.sleep(0.05)
+        running.pop()
+        if prompt.startswith("Merge"):
+            return CLIResponse(text="merged findings")
+        return CLIResponse(text=f"finding from {agent_id}")
+
+    monkeypatch.setattr(tools.cli, "run_cli", fake_run_cli)
+    document = "".join(f"### File: f{i}.py\nprint({i})\n" * 4 for i in range(6))
+    events = []
+
+    result = tools.run_workflow("test_workflow", document, progress=events.append)
+
+    chunks = result["results"][0]["chunks"]
+    assert len(chunks) > 2
+    assert max(peak) == 2
+    assert sorted(e["chunk"] for e in events) == list(range(len(chunks)))
+    assert {c["agent"] for c in chunks} == {"claude_code", "gemini"}
+    assert result["final_output"] == "merged findings"
+    # Findings too large for one reduce call are merged in groups first
+    reduces = [p for p in prompts if p.startswith("Merge")]
+    assert len(reduces) > 1
+    assert "finding from gemini" in reduces[0]
+
+
+def test_map_reduce_failed_chunks_are_reported(config, tools, monkeypatch):
+    """Missing parts are called out to the reducer and in the result, or fail the step"""
+    step = config["workflows"]["test_workflow"]["steps"][0]
+    step["map_reduce"] = {"chunk_tokens": 30}
+    prompts = []
+
+    def fake_run_cli(agent_id, prompt, **kwargs):
+        prompts.append(prompt)
+        if "part 2 of" in prompt or "part 3 of" in prompt:
+            raise RuntimeError("CLI failed")
+        return CLIResponse(text="merged" if prompt.startswith("Merge") else "finding")
+
+    monkeypatch.setattr(tools.cli, "run_cli", fake_run_cli)
+    document = "".join(f"### File: f{i}.py\nprint({i})\n" * 4 for i in range(6))
+
+    result = tools.run_workflow("test_workflow", document)
+
+    note = result["results"][0]["note"]
+    assert note.startswith("Chunks 2..3 of ")
+    assert all(f"Note: {note}" in p for p in prompts if p.startswith("Merge"))
+
+    step["map_reduce"]["on_chunk_error"] = "fail"
+    with pytest.raises(RuntimeError, match="Chunks 2..3 of"):
+        tools.run_workflow("test_workflow", document)
+
+
+def test_map_reduce_refines_findings_not_input(config, tools, monkeypatch):
+    step = config["workflows"]["test_workflow"]["steps"][0]
+    step["map_reduce"] = {"chunk_tokens": 30}
+    step["max_iterations"] = 2
+    prompts = []
+
+    def fake_run_cli(agent_id, prompt, **kwargs):
+        prompts.append(prompt)
+        if prompt.startswith("Review this output"):
+            return CLIResponse(text="Mention the error handling.")
+        return CLIResponse(text="merged findings" if prompt.startswith("Merge") else "finding")
+
+    monkeypatch.setattr(tools.cli, "run_cli", fake_run_cli)
+    document = "".join(f"### File: f{i}.py\nprint({i})\n" * 4 for i in range(6))
+
+    tools.run_workflow("test_workflow", document)
+
+    improve = next(p for p in prompts if p.startswith("Improve"))
+    assert "Current findings:\nmerged findings" in improve
+    assert "print(0)" not in improve
+
+
+def test_map_reduce_skipped_for_small_input(config, tools, monkeypatch):
+    config["workflows"]["test_workflow"]["steps"][0]["map_reduce"] = {"chunk_tokens": 1000}
+    monkeypatch.setattr(
+        tools.cli, "run_cli", lambda agent_id, prompt, **kwargs: CLIResponse(text="plan")
+    )
+
+    result = tools.run_workflow("test_workflow", "small input")
+
+    assert "chunks" not in result["results"][0]
+
+
+def test_single_flight_roles_coalesce_duplicate_calls(config, tools, monkeypatch):
+    """Identical reviewer calls in flight at once run the CLI only once"""
+    config["single_flight"] = {"roles": ["reviewer"]}
+    calls = []
+
+    def fake_run_cli(agent_id, prompt, **kwargs):
+        calls.append(prompt)
+        time.sleep(0.3)
+        return CLIResponse(text="Looks good")
+
+    monkeypatch.setattr(tools.cli, "run_cli", fake_run_cli)
+
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(3) as pool:
+        results = list(pool.map(
+            lambda task: tools.call_agent("gemini", "reviewer", task),
+            ["Review the diff", "Review  the diff", "Review the diff"]
+        ))
+
+    assert len(calls) == 1
+    assert [r["response"] for r in results] == ["Looks good"] * 3
+    assert sum(1 for r in results if r.get("coalesced")) == 2
+
+    # Roles that are not listed always run
+    with ThreadPoolExecutor(2) as pool:
+        list(pool.map(lambda _: tools.call_agent("claude_code", "planner", "Plan"), range(2)))
+    assert len(calls) == 3
+
+
+def test_single_flight_keeps_cli_sessions_apart(config, monkeypatch):
+    """Only calls starting a fresh CLI session coalesce across sessions"""
+    config["single_flight"] = {"roles": ["reviewer"]}
+    config["agents"]["gemini"]["session_arg"] = "--session"
+    first = OrchestratorTools(CLIRunner(config, session_id="a"), config)
+    second = OrchestratorTools(CLIRunner(config, session_id="b"), config)
+    calls = []
+
+    def fake_run_cli(agent_id, prompt, **kwargs):
+        calls.append(prompt)
+        time.sleep(0.3)
+        return CLIResponse(text="Looks good")
+
+    def review_concurrently():
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(2) as pool:
+            return list(pool.map(lambda t: t.call_agent("gemini", "reviewer", "Review"), [first, second]))
+
+    for tools in (first, second):
+        monkeypatch.setattr(tools.cli, "run_cli", fake_run_cli)
+
+    review_concurrently()
+    assert len(calls) == 1
+
+    # The same prompt in an ongoing conversation is a different request
+    first.cli.set_session("gemini", "conversation-1")
+    review_concurrently()
+    assert len(calls) == 3
+
+
+def _speculative_workflow(config, feedback):
+    config["workflows"]["spec"] = {
+        "speculate": True,
+        "steps": [
+            {"agent": "claude_code", "role": "coder", "task": "Write code", "max_iterations": 2},
+            {"agent": "gemini", "role": "reviewer", "task": "Review code"},
+        ]
+    }
+    calls = []
+
+    def fake_run_cli(agent_id, prompt, cancel_token=None, **kwargs):
+        calls.append(prompt)
+        if prompt.startswith("Review this output"):
+            time.sleep(0.3)
+            return CLIResponse(text=feedback)
+        if "Review code" in prompt:
+            # Speculative next step: cancellable like a real CLI call
+            if cancel_token is not None and cancel_token.wait(0.3):
+                raise OperationCancelled("cancelled")
+            return CLIResponse(text="review done")
+        return CLIResponse(text=f"code v{len(calls)}")
+
+    return calls, fake_run_cli
+
+
+def test_speculative_step_kept_when_output_approved(config, tools, monkeypatch):
+    calls, fake_run_cli = _speculative_workflow(config, "APPROVED")
+    monkeypatch.setattr(tools.cli, "run_cli", fake_run_cli)
+    tools.estimator = RunEstimator(min_samples=1)
+
+    started = time.monotonic()
+    result = tools.run_workflow("spec", "input")
+
+    # The review overlapped the approval check instead of following it
+    assert time.monotonic() - started < 0.55
+    assert sum("Review code" in prompt for prompt in calls) == 1
+    assert result["final_output"] == "review done"
+    assert result["results"][-1]["speculative"] is True
+    assert result["speculation"]["hits"] == 1
+    assert result["speculation"]["saved_seconds"] > 0.2
+    assert [entry["role"] for entry in tools.conversation_history] == ["coder", "reviewer"]
+    # The kept step is timed by its speculative run, not the ~0s it took to collect
+    assert tools.estimator._samples_for("workflow:spec:1")[0][0] >= 0.25
+
+
+def test_speculative_step_discarded_when_output_revised(config, tools, monkeypatch):
+    calls, fake_run_cli = _speculative_workflow(config, "Add error handling")
+    monkeypatch.setattr(tools.cli, "run_cli", fake_run_cli)
+
+    result = tools.run_workflow("spec", "input")
+
+    # The stale review was cancelled and the step ran again on the revision
+    review_prompts = [prompt for prompt in calls if "Review code" in prompt]
+    assert len(review_prompts) == 2
+    assert "code v4" in review_prompts[1]
+    assert result["speculation"] == {"hits": 0, "misses": 1, "hit_rate": 0.0, "saved_seconds": 0.0}
+    assert "speculative" not in result["results"][-1]
+    assert len(tools.conversation_history) == 3
+
+
+def test_turn_priority_reaches_parallel_agent_calls(config, tools, monkeypatch):
+    """A turn's priority applies to calls made from tool thread pools"""
+    from contextlib import contextmanager
+
+    config["discussion"] = {"maxRounds": 1}
+    seen = []
+
+    class SpyScheduler:
+        @contextmanager
+        def slot(self, agent_id, session_id="default", priority="normal", cancel_token=None):
+            seen.append(priority)
+            yield
+
+    tools.cli.scheduler = SpyScheduler()
+    monkeypatch.setattr(tools.cli, "_execute", lambda *args: (0, "ok", "", None))
+    monkeypatch.setattr(tools.cli, "_parse_response", lambda stdout, agent_id: CLIResponse(text=stdout))
+
+    with tools.cli.call_priority("interactive"):
+        tools.run_discussion("Monorepo?", agents=["claude_code", "gemini"])
+    tools.run_discussion("Monorepo?", agents=["claude_code"])
+
+    assert seen == ["interactive", "interactive", "normal"]
+
+
+def test_discussion_teams_from_shipped_config(config, monkeypatch):
+    """Members of the shipped config map onto agents through their provider"""
+    import yaml
+    from pathlib import Path
+    from src.discussion import resolve_participants
+
+    shipped = yaml.safe_load((Path(__file__).parents[2] / "config.yaml").read_text(encoding="utf-8"))
+    config["discussion"] = shipped["discussion"]
+    config["agents"]["gemini"]["provider"] = "google"
+    config["agents"]["ollama"] = {"backend": "http", "api": "openai", "provider": "ollama"}
+
+    full = resolve_participants(config, team="full")
+    assert [(p["name"], p["agent_id"]) for p in full] == [
+        ("planner", "gemini"), ("coder", "ollama"), ("researcher", "ollama"), ("reviewer", "ollama")
+    ]
+    assert full[1]["model"] == "qwen3-coder:30b"
+    assert full[0]["system_prompt"].startswith("Du bist")
+
+    tools = OrchestratorTools(CLIRunner(config), config)
+    monkeypatch.setattr(
+        tools.cli, "run_cli",
+        lambda agent_id, prompt, model=None, **kwargs: CLIResponse(text=f"{agent_id}/{model} position")
+    )
+    result = tools.run_discussion("Monorepo?", team="quick", max_rounds=1)
+    assert [c["agent"] for c in result["rounds"][0]["contributions"]] == ["gemini", "ollama"]
+
+    # Members whose provider has no agent, and empty teams, are rejected up front
+    del config["agents"]["ollama"]
+    with pytest.raises(ValueError, match="provider: ollama"):
+        resolve_participants(config, team="full")
+    config["discussion"]["teams"].append({"id": "empty", "agents": []})
+    with pytest.raises(ValueError, match="at least one"):
+        tools.run_discussion("Monorepo?", team="empty")